@@ -0,0 +1,121 @@
+"""
+Throughput of the WSGI (sync) and ASGI (async) API under concurrent
+clients.
+
+The WSGI run drives flixapp.urls from a fixed pool of threads, like a
+threaded gunicorn worker. The ASGI run drives flixapp.async_urls from
+concurrent tasks on one event loop.
+
+    python -m benchmarks.async_load --clients 64 --wsgi-threads 4
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import time
+
+from benchmarks.utils import setup_django, test_database, upstream_server
+
+
+def seed(movies: int) -> str:
+    from decimal import Decimal
+    from flixapp.urls import AccessToken
+    from movies.models import Movie
+    from user.models import User
+
+    user = User.objects.create_user('bench@example.com', 'Testpassword!')
+    Movie.objects.bulk_create(
+        Movie(
+            user=user,
+            title=f'Movie {i}',
+            score=Decimal('7.5'),
+            description='description',
+            review='review',
+            is_private=False,
+        )
+        for i in range(movies)
+    )
+    return AccessToken.create(user)['access_token']
+
+
+def run_wsgi(path: str, requests: int, threads: int, headers: dict) -> float:
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    def call(_):
+        response = Client().get(path, **headers)
+        assert response.status_code == 200, response.status_code
+
+    with override_settings(ROOT_URLCONF='flixapp.urls'):
+        call(None)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(call, range(requests)))
+        return requests / (time.perf_counter() - start)
+
+
+def run_asgi(path: str, requests: int, clients: int, headers: dict) -> float:
+    from django.test import AsyncClient
+    from django.test.utils import override_settings
+
+    asgi_headers = {
+        key.removeprefix('HTTP_'): value for key, value in headers.items()
+    }
+
+    async def client(queue):
+        http = AsyncClient()
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            response = await http.get(path, **asgi_headers)
+            assert response.status_code == 200, response.status_code
+
+    async def main():
+        queue = asyncio.Queue()
+        for n in range(requests):
+            queue.put_nowait(n)
+        await asyncio.gather(*(client(queue) for _ in range(clients)))
+
+    with override_settings(ROOT_URLCONF='flixapp.async_urls'):
+        asyncio.run(AsyncClient().get(path, **asgi_headers))
+        start = time.perf_counter()
+        asyncio.run(main())
+        return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--wsgi-threads', type=int, default=4)
+    parser.add_argument('--movies', type=int, default=1000)
+    parser.add_argument(
+        '--upstream-delay', type=float, default=0.05,
+        help='seconds the stand-in /number/ upstream takes to answer')
+    args = parser.parse_args()
+
+    setup_django()
+    from flixapp.random_numbers import number_client
+
+    with test_database(), upstream_server(args.upstream_delay) as url:
+        number_client.url = url
+        token = seed(args.movies)
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+        routes = [
+            ('/api/number/', {}),
+            ('/api/list_all_movies', {}),
+            ('/api/list_user_movies?is_private=false', auth),
+        ]
+
+        print(f'{args.requests} requests, {args.clients} async clients, '
+              f'{args.wsgi_threads} WSGI threads')
+        print(f'{"route":<42}{"wsgi req/s":>12}{"asgi req/s":>12}')
+        for path, headers in routes:
+            wsgi = run_wsgi(path, args.requests, args.wsgi_threads, headers)
+            asgi = run_asgi(path, args.requests, args.clients, headers)
+            print(f'{path:<42}{wsgi:>12.1f}{asgi:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
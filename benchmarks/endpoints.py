@@ -0,0 +1,357 @@
+"""
+Latency percentiles, throughput and SQL queries per request for every
+route of the sync API, driven in-process against a seeded database.
+
+Results can be saved as a baseline JSON, and a later run compared
+against it: the comparison exits with status 1 if any route issues more
+queries than the baseline, or its p95 latency grew beyond --tolerance
+and by more than --min-delta milliseconds, or is missing from the
+baseline. A full run also fails if a route of the API has no scenario.
+
+    python -m benchmarks.endpoints --save benchmarks/baseline.json
+    python -m benchmarks.endpoints --compare benchmarks/baseline.json
+"""
+from io import StringIO
+from itertools import count
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.utils import setup_django, test_database, upstream_server
+
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'Testpassword!'
+MOVIE = {
+    'title': 'Benchmark',
+    'score': 7.5,
+    'description': 'A seeded movie',
+    'review': 'Seeded for the endpoint benchmark',
+    'is_private': False,
+}
+
+
+def seed(users: int, movies: int, pool: int) -> dict:
+    """
+    The benchmark user (a superuser, for the whole-table job routes),
+    `users` other users sharing the movies, `pool` spare users and
+    movies for the delete routes, a deleted user, a finished export job
+    and the similar movies index.
+    """
+    from decimal import Decimal
+    from django.contrib.auth.hashers import make_password
+    from django.core.management import call_command
+    from flixapp.urls import AccessToken
+    from jobs.registry import enqueue
+    from jobs.worker import run_job
+    from movies.models import Movie
+    from movies.similar import build_index
+    from user.deletion import request_deletion
+    from user.models import User
+
+    owner = User.objects.create_user(EMAIL, PASSWORD)
+    User.objects.filter(id=owner.id).update(is_superuser=True)
+    # One hash for everybody, hashing thousands of passwords is not
+    # what this is measuring
+    password = make_password(PASSWORD)
+    others = User.objects.bulk_create(
+        User(email=f'user{i}@example.com', password=password)
+        for i in range(users + pool)
+    )
+    owners = [owner, *others[:users]]
+    Movie.objects.bulk_create(
+        Movie(
+            user=owners[i % len(owners)],
+            title=f'Movie {i} {("night", "day", "dream")[i % 3]}',
+            score=Decimal(i % 100) / 10,
+            description=f'Description {i}',
+            review=f'Review {i}',
+            is_private=i % 4 == 0,
+        )
+        for i in range(movies)
+    )
+    spare_movies = Movie.objects.bulk_create(
+        Movie(user=owner, **MOVIE) for _ in range(pool))
+    call_command('reconcile_movie_stats', stdout=StringIO())
+    build_index()
+
+    deleted = User(email='deleted@example.com', password=password)
+    deleted.save()
+    request_deletion(deleted, deactivate=True)
+    export = enqueue('movies.export', {
+        'user_id': owner.id, 'format': 'ndjson', 'filename': 'seed.ndjson.gz',
+    }, user_id=owner.id)
+    run_job(export.id)
+
+    tokens = AccessToken.create(owner)
+    return {
+        'owner': owner,
+        'movie': Movie.objects.filter(user=owner).first(),
+        'deleted': deleted,
+        'export': export,
+        'spare_users': iter(others[users:]),
+        'spare_movies': iter(spare_movies),
+        'access': tokens['access_token'],
+        'refresh': tokens['refresh_token'],
+    }
+
+
+def scenarios(data: dict) -> list:
+    """(route, method, request kwargs factory, uses password hashing)"""
+    auth = {'HTTP_AUTHORIZATION': f'Bearer {data["access"]}'}
+    owner, movie, export = data['owner'], data['movie'], data['export']
+    emails = (f'new{n}@example.com' for n in count())
+
+    def post(body, **extra):
+        return {
+            'data': json.dumps(body),
+            'content_type': 'application/json',
+            **extra,
+        }
+
+    bulk_body = '\n'.join(json.dumps(MOVIE) for _ in range(20))
+
+    return [
+        ('POST /create-user', 'post', '/api/create-user',
+         lambda: post({'email': next(emails), 'password': PASSWORD}), True),
+        ('POST /login', 'post', '/api/login',
+         lambda: post({'email': EMAIL, 'password': PASSWORD}), True),
+        ('POST /token/refresh', 'post', '/api/token/refresh',
+         lambda: post({'refresh_token': data['refresh']}), False),
+        ('GET /users', 'get', '/api/users',
+         lambda: {'data': {'limit': 20}}, False),
+        ('GET /users/{id}', 'get', f'/api/users/{owner.id}',
+         lambda: {}, False),
+        ('PUT /users/{id}', 'put', f'/api/users/{owner.id}',
+         lambda: post({'email': EMAIL, 'password': PASSWORD}, **auth), True),
+        ('PATCH /users/{id}', 'patch', f'/api/users/{owner.id}',
+         lambda: post({'email': EMAIL}, **auth), False),
+        ('DELETE /users/{id}', 'delete', '/api/users/{id}',
+         lambda: {'id': next(data['spare_users']).id}, False),
+        ('GET /users/{id}/deletion', 'get',
+         f'/api/users/{data["deleted"].id}/deletion',
+         lambda: {}, False),
+        ('GET /auth/cache', 'get', '/api/auth/cache',
+         lambda: auth, False),
+        ('GET /users/{id}/stats', 'get', f'/api/users/{owner.id}/stats',
+         lambda: {}, False),
+        ('POST /movie', 'post', '/api/movie',
+         lambda: post(MOVIE, **auth), False),
+        ('POST /movies/bulk', 'post', '/api/movies/bulk',
+         lambda: {
+             'data': bulk_body,
+             'content_type': 'application/x-ndjson',
+             **auth,
+         }, False),
+        ('GET /movies/export', 'get', '/api/movies/export',
+         lambda: auth, False),
+        ('GET /list_all_movies', 'get', '/api/list_all_movies',
+         lambda: {'data': {'limit': 20}}, False),
+        ('GET /list_user_movies', 'get', '/api/list_user_movies',
+         lambda: {'data': {'is_private': False, 'limit': 20}, **auth}, False),
+        ('GET /movies/top', 'get', '/api/movies/top',
+         lambda: {'data': {'n': 10}}, False),
+        ('GET /movies/search', 'get', '/api/movies/search',
+         lambda: {'data': {'q': 'night', 'limit': 20}, **auth}, False),
+        ('GET /movie/{id}/similar', 'get', f'/api/movie/{movie.id}/similar',
+         lambda: auth, False),
+        ('GET /movie/{id}', 'get', f'/api/movie/{movie.id}',
+         lambda: auth, False),
+        ('PUT /movie/{id}', 'put', f'/api/movie/{movie.id}',
+         lambda: post(MOVIE, **auth), False),
+        ('PATCH /movie/{id}', 'patch', f'/api/movie/{movie.id}',
+         lambda: post({'score': MOVIE['score']}, **auth), False),
+        ('DELETE /movie/{id}', 'delete', '/api/movie/{id}',
+         lambda: {'id': next(data['spare_movies']).id, **auth}, False),
+        ('GET /number/', 'get', '/api/number/',
+         lambda: {}, False),
+        ('POST /movies/export/jobs', 'post', '/api/movies/export/jobs',
+         lambda: auth, False),
+        # Queued once, then answered with the pending job
+        ('POST /movies/search/rebuild', 'post', '/api/movies/search/rebuild',
+         lambda: auth, False),
+        ('POST /movies/similar/rebuild', 'post',
+         '/api/movies/similar/rebuild',
+         lambda: auth, False),
+        ('POST /users/stats/reconcile', 'post', '/api/users/stats/reconcile',
+         lambda: auth, False),
+        ('GET /jobs/{id}', 'get', f'/api/jobs/{export.id}',
+         lambda: auth, False),
+        ('GET /jobs/{id}/file', 'get', f'/api/jobs/{export.id}/file',
+         lambda: auth, False),
+        ('GET /metrics', 'get', '/api/metrics',
+         lambda: {}, False),
+    ]
+
+
+def api_routes() -> set:
+    """Every route of the sync API, named as the scenarios are"""
+    from flixapp.urls import api
+
+    routes = set()
+    for prefix, router in api._routers:
+        for path, path_view in router.path_operations.items():
+            path = re.sub(r'\{\w+\}', '{id}', prefix + path)
+            for operation in path_view.operations:
+                routes.update(
+                    f'{method} {path}' for method in operation.methods)
+    return routes
+
+
+def run(client, method: str, path: str, make_kwargs, requests: int) -> dict:
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    call = getattr(client, method)
+
+    def one():
+        kwargs = make_kwargs()
+        url = path.format(id=kwargs.pop('id', None))
+        # The log keeps the last 9000 queries; once full, a count taken
+        # from its length no longer grows
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = call(url, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        return elapsed, len(queries), response.status_code < 400
+
+    one()
+    timings, total_queries, errors = [], 0, 0
+    for _ in range(requests):
+        elapsed, queries, ok = one()
+        timings.append(elapsed)
+        total_queries += queries
+        errors += not ok
+
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'requests': requests,
+        'p50': cuts[49] * 1000,
+        'p95': cuts[94] * 1000,
+        'p99': cuts[98] * 1000,
+        'rps': requests / sum(timings),
+        'queries': total_queries / requests,
+        'errors': errors,
+    }
+
+
+def compare(
+    results: dict, baseline: dict, tolerance: float, min_delta: float,
+) -> list:
+    regressions = []
+    for route, result in results.items():
+        before = baseline['routes'].get(route)
+        if before is None:
+            regressions.append(f'{route}: not in the baseline')
+            continue
+        # Periodic checks (e.g. the auth cache stamp) add fractions of a
+        # query; one more query on every request moves the mean by 1
+        if result['queries'] > before['queries'] + 0.5:
+            regressions.append(
+                f'{route}: {result["queries"]:.2f} queries per request, '
+                f'baseline {before["queries"]:.2f}')
+        if result['errors'] > before['errors']:
+            regressions.append(
+                f'{route}: {result["errors"]} failed requests, '
+                f'baseline {before["errors"]}')
+        if (result['p95'] > before['p95'] * (1 + tolerance)
+                and result['p95'] - before['p95'] > min_delta):
+            regressions.append(
+                f'{route}: p95 {result["p95"]:.2f} ms, '
+                f'baseline {before["p95"]:.2f} ms')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Requests per route')
+    parser.add_argument('--hash-requests', type=int, default=10,
+                        help='Requests per route that hashes a password')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--movies', type=int, default=5000)
+    parser.add_argument('--route', action='append',
+                        help='Only run routes containing this text')
+    parser.add_argument('--save', metavar='PATH',
+                        help='Write the results as a baseline JSON')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='Fail if results regressed against a baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed p95 growth over the baseline')
+    parser.add_argument('--min-delta', type=float, default=2.0,
+                        help='p95 growth in ms always tolerated, as fast '
+                             'routes are noisy')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+    from django.test.utils import override_settings
+    from flixapp.random_numbers import number_client
+
+    results = {}
+    with test_database(), upstream_server() as url, \
+            tempfile.TemporaryDirectory() as files, override_settings(
+                JOB_FILES_DIR=files,
+                SIMILAR_INDEX_PATH=os.path.join(files, 'similar.idx')):
+        number_client.url = url
+        data = seed(args.users, args.movies, pool=args.requests + 1)
+        client = Client()
+        routes = scenarios(data)
+        missing = api_routes() - {route for route, *_ in routes}
+
+        print(f'{"route":<30}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+              f'{"req/s":>9}{"queries":>9}{"errors":>8}')
+        for route, method, path, make_kwargs, hashes in routes:
+            if args.route and not any(r in route for r in args.route):
+                continue
+            requests = args.hash_requests if hashes else args.requests
+            result = run(client, method, path, make_kwargs, requests)
+            results[route] = result
+            print(f'{route:<30}{result["p50"]:>9.2f}{result["p95"]:>9.2f}'
+                  f'{result["p99"]:>9.2f}{result["rps"]:>9.0f}'
+                  f'{result["queries"]:>9.2f}{result["errors"]:>8}')
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'movies': args.movies,
+                'users': args.users,
+                'routes': results,
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Baseline written to {args.save}')
+
+    failed = False
+    if not args.route:
+        for route in sorted(missing):
+            print(f'MISSING {route}: no benchmark scenario')
+            failed = True
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(
+                results, json.load(f), args.tolerance, args.min_delta)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            failed = True
+        else:
+            print('No regressions against the baseline')
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Logins per second for the previous login pipeline, the current one and
+/token/refresh.
+
+The previous pipeline is reproduced here: a full-row SELECT, the hash
+check, and a full-row UPDATE from AccessToken.create on every login.
+
+    python -m benchmarks.login --seconds 3
+"""
+from datetime import timedelta
+import argparse
+import time
+
+from benchmarks.utils import setup_django, test_database
+
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'Testpassword!'
+
+
+def measure(func, seconds: float):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    func()
+    calls = 0
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            func()
+            calls += 1
+        elapsed = time.perf_counter() - start
+    return calls / elapsed, len(queries) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.hashers import check_password
+    from flixapp import urls
+    from user.models import User
+
+    def previous_login():
+        user = User.objects.get(email=EMAIL)
+        if check_password(PASSWORD, user.password):
+            urls.AccessToken.create_token(
+                data={"sub": user.email},
+                expires_delta=timedelta(minutes=999999),
+            )
+            user.save()
+
+    def current_login():
+        urls.user_login(
+            None, urls.LoginSchema(email=EMAIL, password=PASSWORD))
+
+    with test_database():
+        User.objects.create_user(EMAIL, PASSWORD)
+        refresh = urls.AccessToken.create(
+            User.objects.get(email=EMAIL))['refresh_token']
+
+        def token_refresh():
+            urls.refresh_token(
+                None, urls.RefreshSchema(refresh_token=refresh))
+
+        print(f'{"pipeline":<20}{"per sec":>12}{"queries":>10}')
+        for name, func in [
+            ('previous login', previous_login),
+            ('current login', current_login),
+            ('token refresh', token_refresh),
+        ]:
+            rate, queries = measure(func, args.seconds)
+            print(f'{name:<20}{rate:>12.1f}{queries:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
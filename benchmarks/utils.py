@@ -0,0 +1,73 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Benchmarks run in-process against a throwaway test database, so they
+never touch flixdb.sqlite3.
+"""
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs, urlparse
+import json
+import os
+import time
+
+import django
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flixapp.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    # Measure the routes, not the auth throttles' 429s
+    os.environ.setdefault('AUTH_THROTTLE', 'false')
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Create the test database, yield, then destroy it"""
+    from django.db import connection
+    from django.test.utils import (
+        setup_test_environment, teardown_test_environment,
+    )
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def upstream_server(delay: float = 0.0):
+    """Local stand-in for the random number API, answering after `delay`"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            count = int(query.get('count', ['1'])[0])
+            body = json.dumps([42] * count).encode()
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}/'
+    finally:
+        server.shutdown()
+        server.server_close()
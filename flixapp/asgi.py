@@ -5,12 +5,20 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
+
+Served this way the API uses the async routes in flixapp/async_urls.py,
+through the handler in flixapp/streaming.py that streams async bodies.
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+
+from flixapp.streaming import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flixapp.settings')
+os.environ.setdefault('ROOT_URLCONF', 'flixapp.async_urls')
+
+django.setup(set_prefix=False)
 
-application = get_asgi_application()
+application = ASGIHandler()
@@ -0,0 +1,463 @@
+"""
+Async variant of the API routes, used as ROOT_URLCONF by flixapp/asgi.py.
+
+Async routes are mounted at /api/ ahead of the sync ones, so any path
+without an async version here still resolves to the sync view in
+flixapp/urls.py, run in a thread. That suits the bulk import and the
+job routes, but not every sync view: Django's ASGIHandler buffers the
+request body before the view runs, so a bulk import no longer streams
+in, and it iterates a streaming response on the event loop, so the
+export has an async route here (see flixapp/streaming.py).
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.utils import IntegrityError
+from django.http import Http404
+from django.urls import path
+from ninja import NinjaAPI
+from ninja.security import HttpBearer
+from jwt import PyJWTError, decode
+from asgiref.sync import sync_to_async
+from typing import List, Literal
+import json
+
+from flixapp import metrics, urls
+from flixapp.metrics import timed
+from flixapp.renderers import FastJSONRenderer
+from flixapp.fieldsets import fieldset, render
+from flixapp.page_cache import acache_pages, user_movie_pages
+from flixapp.pagination import CursorPagination, apaginate
+from flixapp.random_numbers import number_client
+from flixapp.urls import (
+    AccessToken, LoginSchema, MoviePatchSchema, MovieSchema,
+    UserPatchSchema, UserSchema, getMovieSchema, getUserSchema,
+)
+from movies import stats
+from movies.export import aexport_response
+from movies.models import Movie
+from movies.patch import patch_movie
+from movies.search import search_movies
+from user.cache import CachedUser, user_cache
+from user.hashing import acheck_password, amake_password, needs_rehash
+from user.deletion import request_deletion
+from user.models import User
+from user.throttle import acheck as athrottle, too_many_requests
+
+
+class AsyncAuthBearer(HttpBearer):
+    """
+    Validates the JWT without any I/O and leaves its subject on
+    request.auth; async views resolve it with `current_user`.
+
+    django-ninja runs authenticators synchronously even for async
+    operations, so the user lookup cannot happen here.
+    """
+
+    def authenticate(self, request, token: str) -> str | None:
+        try:
+            with timed('jwt'):
+                payload = decode(
+                    token,
+                    settings.SECRET_KEY,
+                    algorithms=['HS256'])
+
+        except PyJWTError:
+            return None
+        if payload.get('type', 'access') != 'access':
+            return None
+        return payload['sub']
+
+
+async def current_user(request) -> CachedUser:
+    """Authenticated user for the subject AsyncAuthBearer accepted"""
+    subject = request.auth
+    with timed('user'):
+        user = await user_cache.aget(subject)
+        if user is None:
+            row = await User.objects.only('id', 'email', 'is_active').filter(
+                email=subject, is_active=True).afirst()
+            if row is None:
+                raise Http404
+            user = CachedUser(row.id, row.email, row.is_active)
+            user_cache.set(subject, user)
+    return user
+
+
+@sync_to_async
+def atomic(func):
+    """Run `func` in a transaction; there are no async transactions yet"""
+    with transaction.atomic():
+        return func()
+
+
+async def aget_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404
+
+
+async_api = NinjaAPI(
+    auth=AsyncAuthBearer(),
+    title='FlixFix',
+    version="0.1.0",
+    urls_namespace='async_api',
+    docs_url='/async/docs',
+    openapi_url='/async/openapi.json',
+    renderer=FastJSONRenderer(),
+)
+
+
+# User routes ---------------------------------------------------------------
+
+# User creation
+@async_api.post('/create-user', auth=None)
+async def create_user_api(request, payload: UserSchema):
+    """
+        Create a new user using email and password.
+
+        Password constrains:
+
+            - At least 10 characters long.
+
+            - Should include one lowercase letter.
+
+            - Should include one UPPERCASE letter.
+
+            - Should include one of these special characters: ! @ # ? ]
+
+    """
+    wait = await athrottle(request, 'create-user', payload.email)
+    if wait:
+        return too_many_requests(async_api, request, wait)
+    try:
+        user = await User.objects.acreate_user(
+            payload.email,
+            payload.password,
+        )
+
+    except IntegrityError:
+        return async_api.create_response(
+            request,
+            {"error": "Email already exists"},
+            status=409,
+        )
+
+    return {
+        "id": user.id,
+        "email": user.email,
+        }
+
+
+# Login
+@async_api.post('/login', auth=None)
+async def user_login(request, payload: LoginSchema):
+    """Login using email and password"""
+    wait = await athrottle(request, 'login', payload.email)
+    if wait:
+        return too_many_requests(async_api, request, wait)
+    try:
+        user = await User.objects.only('id', 'email', 'password').aget(
+            email=payload.email, is_active=True)
+
+    except Exception:
+        return async_api.create_response(
+            request,
+            {"error": "User not found"},
+            status=404)
+
+    password = payload.password.get_secret_value()
+    if await acheck_password(password, user.password):
+        if needs_rehash(user.password):
+            await User.objects.filter(id=user.id).aupdate(
+                password=await amake_password(password))
+        return AccessToken.create(user)
+
+
+# List all users
+@async_api.get('/users', response=List[getUserSchema], auth=None)
+@apaginate(CursorPagination, count='cached', schema=getUserSchema)
+async def get_users(request):
+    """Lists all users"""
+    return User.objects.all()
+
+
+# List user by id
+@async_api.get('/users/{user_id}', response=getUserSchema, auth=None)
+async def get_user(request, user_id: int):
+    """List a single user by id"""
+    return await aget_or_404(User.objects, id=user_id)
+
+
+# Update User
+@async_api.put('/users/{user_id}')
+async def update_user(request, user_id: int, payload: UserSchema):
+    """Update user attributes"""
+    auth = await current_user(request)
+    user = await aget_or_404(User.objects, id=user_id)
+
+    if (auth.id == user_id):
+        await User.objects.filter(id=user_id).aupdate(
+            email=payload.email,
+            password=await amake_password(payload.password),
+        )
+        await user_cache.ainvalidate(user.email, payload.email)
+        return async_api.create_response(
+                request,
+                {"message": "Updated successfully"},
+                status=204)
+
+    else:
+        return async_api.create_response(
+            request,
+            {"error": "Unauthorized"},
+            status=401)
+
+
+# Partially update User
+@async_api.patch('/users/{user_id}')
+async def partial_update_user(request, user_id: int, payload: UserPatchSchema):
+    """Change your email and/or password; omitted fields are kept"""
+    auth = await current_user(request)
+    try:
+        changes = await User.objects.aprepare_changes(
+            **payload.dict(exclude_unset=True, exclude_none=True))
+    except ValueError as e:
+        return async_api.create_response(
+            request, {"error": str(e)}, status=400)
+
+    # Only the token's own user matches
+    users = User.objects.filter(id=auth.id, email=auth.email)
+    if user_id != auth.id:
+        users = users.none()
+    try:
+        if changes:
+            found = await users.aupdate(**changes)
+        else:
+            found = await users.aexists()
+    except IntegrityError:
+        return async_api.create_response(
+            request,
+            {"error": "Email already exists"},
+            status=409)
+
+    if not found:
+        return async_api.create_response(
+            request,
+            {"error": "Unauthorized"},
+            status=401)
+    if 'email' in changes:
+        await user_cache.ainvalidate(auth.email, changes['email'])
+    return async_api.create_response(
+            request,
+            {"message": "Updated successfully"},
+            status=204)
+
+
+# Delete user
+@async_api.delete('/users/{user_id}', auth=None)
+async def delete_user(request, user_id: int, deactivate: bool = True):
+    """
+        Delete a user by id.
+
+        The user's movies are removed in the background; follow the
+        returned status URL. With `deactivate` (the default) the user
+        can no longer log in from the moment the deletion is accepted.
+    """
+    user = await aget_or_404(User.objects.only('id', 'email'), id=user_id)
+    deletion = await sync_to_async(request_deletion)(user, deactivate)
+    return async_api.create_response(
+            request,
+            {
+                "state": deletion.state,
+                "status": f"/api/users/{user_id}/deletion",
+                "job": deletion.job_id,
+            },
+            status=202)
+
+
+# Auth cache counters
+@async_api.get('/auth/cache')
+async def auth_cache_stats(request):
+    """Hit and miss counters of the authenticated user cache"""
+    await current_user(request)
+    return user_cache.stats()
+
+
+# Movie routes --------------------------------------------------------------
+
+# Creates a Movie post
+@async_api.post('/movie')
+async def create_movie(request, payload: MovieSchema):
+    """Add a new movie"""
+    auth = await current_user(request)
+
+    def create():
+        movie = Movie.objects.create(user_id=auth.id, **payload.dict())
+        stats.record_created(movie.user_id, movie.score, movie.is_private)
+        return movie
+
+    movie = await atomic(create)
+    return async_api.create_response(
+            request,
+            {"title": movie.title},
+            status=201)
+
+
+# Export Movie posts
+@async_api.get('/movies/export')
+async def export_movies(request, format: Literal['ndjson', 'csv'] = 'ndjson'):
+    """
+        Download all of your movies as NDJSON or CSV.
+
+        Rows are streamed, gzip compressed if the client accepts it.
+    """
+    auth = await current_user(request)
+    return aexport_response(
+        request, auth.id, format, settings.EXPORT_CHUNK_SIZE)
+
+
+# List public Movie posts
+@async_api.get('/list_all_movies', response=List[getMovieSchema], auth=None)
+@apaginate(CursorPagination, count='cached', schema=getMovieSchema)
+async def get_public_movies(request):
+    """List all public movie posts"""
+    return Movie.objects.filter(is_private=False)
+
+
+# List User Movie posts
+@async_api.get('/list_user_movies', response=List[getMovieSchema])
+@acache_pages(user_movie_pages, current_user)
+@apaginate(CursorPagination, schema=getMovieSchema)
+async def get_user_movies(request, is_private: bool):
+    """List all private or public movies created by user"""
+    auth = await current_user(request)
+    return Movie.objects.filter(user_id=auth.id, is_private=is_private)
+
+
+# Search Movie posts
+@async_api.get('/movies/search', response=List[getMovieSchema])
+@apaginate(
+    CursorPagination,
+    ordering=('rank', 'id'),
+    count='none',
+    schema=getMovieSchema,
+)
+async def search_user_movies(request, q: str):
+    """Full-text search over public movies and your own private ones"""
+    auth = await current_user(request)
+    return search_movies(q, auth.id)
+
+
+# Get a Movie
+@async_api.get('/movie/{movie_id}', response=getMovieSchema)
+async def get_movie(request, movie_id: int, fields: str = None):
+    """A public movie or one of your own, with only `fields` if given"""
+    auth = await current_user(request)
+    schema = fieldset(getMovieSchema, fields)
+    movie = await Movie.objects.filter(
+        Q(is_private=False) | Q(user_id=auth.id), id=movie_id,
+    ).only(*schema.__fields__).afirst()
+    if movie is None:
+        raise Http404
+    return render(schema, movie)
+
+
+# Update a Movie
+@async_api.put('/movie/{movie_id}')
+async def update_movie(request, movie_id: int, payload: MovieSchema):
+    """Update a movie using id"""
+    auth = await current_user(request)
+    try:
+        movie = await Movie.objects.aget(id=movie_id, user_id=auth.id)
+        old = (movie.score, movie.is_private)
+        for attr, value in payload.dict().items():
+            setattr(movie, attr, value)
+
+        def save():
+            movie.save()
+            stats.record_updated(
+                movie.user_id, old, (movie.score, movie.is_private))
+
+        await atomic(save)
+        return async_api.create_response(
+            request,
+            {"message": "Updated successfully"},
+            status=204)
+
+    except Exception:
+        return async_api.create_response(
+            request,
+            {"error": "Unauthorized"},
+            status=401)
+
+
+# Partially update a Movie
+@async_api.patch('/movie/{movie_id}')
+async def partial_update_movie(
+    request, movie_id: int, payload: MoviePatchSchema,
+):
+    """Change only the given fields of a movie"""
+    auth = await current_user(request)
+    changes = payload.dict(exclude_unset=True, exclude_none=True)
+    found = await atomic(lambda: patch_movie(auth.id, movie_id, changes))
+
+    if not found:
+        return async_api.create_response(
+            request,
+            {"error": "Unauthorized"},
+            status=401)
+    return async_api.create_response(
+        request,
+        {"message": "Updated successfully"},
+        status=204)
+
+
+# Delete a Movie
+@async_api.delete('/movie/{movie_id}')
+async def delete_movie(request, movie_id: int):
+    """Delete a movie using id"""
+    auth = await current_user(request)
+    try:
+        movie = await Movie.objects.aget(id=movie_id, user_id=auth.id)
+
+        def delete():
+            movie.delete()
+            stats.record_deleted(
+                movie.user_id, movie.score, movie.is_private)
+
+        await atomic(delete)
+        return async_api.create_response(
+            request,
+            {"message": "Deleted successfully"},
+            status=204)
+
+    except Exception:
+        return async_api.create_response(
+            request,
+            {"error": "Unauthorized"},
+            status=401,)
+
+
+# Random number ------------------------------------------------------------
+
+@async_api.get('/number/', auth=None)
+async def random_number(request):
+    """Gets random number from public API"""
+    number = number_client.take()
+    if number is None:
+        number = await sync_to_async(
+            number_client.get_number, thread_sensitive=False)()
+    return {'number': json.dumps([number])}
+
+
+metrics.instrument(async_api)
+
+
+# Django routes ------------------------------------------------------------
+
+urlpatterns = [
+    path("api/", async_api.urls),
+    *urls.urlpatterns,
+]
@@ -0,0 +1,192 @@
+"""
+Read/write splitting across the primary database and read replicas.
+
+ReplicaRoutingMiddleware lets GET and HEAD requests read from a replica
+listed in settings.DATABASE_REPLICAS; everything else, and any code
+running outside a request, uses the primary. After a successful write
+the bearer token's subject is pinned to the primary for
+READ_YOUR_WRITES_SECONDS so the writer sees its own changes despite
+replica lag. Pins live in the READ_YOUR_WRITES_CACHE cache, which must
+be shared (file or Redis) by every worker: `check_pin_cache` fails the
+system checks when replicas are configured over a per-process cache.
+
+Rows that coordinate processes (version stamps, the job queue, account
+deletions) are always read from the primary, since a lagging copy of
+them would serve stale pages or hand out a job twice.
+
+Paths in RESPONSE_CACHE_PATHS read from the primary as well: their
+responses are cached under a version bumped when a write commits, and
+a replica that had not caught up yet would fill that version with the
+rows it replaced.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from jwt import PyJWTError, decode
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_ONLY = {'user.versionstamp', 'user.accountdeletion', 'jobs.job'}
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def bearer_subject(request) -> str | None:
+    """Token subject, without checking the user exists"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    try:
+        payload = decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+    except PyJWTError:
+        return None
+    return payload.get('sub')
+
+
+def _pins():
+    return caches[settings.READ_YOUR_WRITES_CACHE]
+
+
+def pin_to_primary(subject: str) -> None:
+    seconds = settings.READ_YOUR_WRITES_SECONDS
+    _pins().set(f'primary-pin:{subject}', time.time() + seconds, seconds)
+
+
+async def apin_to_primary(subject: str) -> None:
+    seconds = settings.READ_YOUR_WRITES_SECONDS
+    await _pins().aset(
+        f'primary-pin:{subject}', time.time() + seconds, seconds)
+
+
+def is_pinned(subject: str) -> bool:
+    until = _pins().get(f'primary-pin:{subject}')
+    return until is not None and until > time.time()
+
+
+async def ais_pinned(subject: str) -> bool:
+    until = await _pins().aget(f'primary-pin:{subject}')
+    return until is not None and until > time.time()
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read from the primary inside the block, as anything stored under a
+    version read from the primary must be built
+    """
+    token = _read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (replicas and _read_from_replica.get()
+                and model._meta.label_lower not in PRIMARY_ONLY):
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas are copies of the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def check_pin_cache(app_configs, **kwargs):
+    """Replicas need read-your-writes pins every worker can see"""
+    if not settings.DATABASE_REPLICAS:
+        return []
+    alias = settings.READ_YOUR_WRITES_CACHE
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [checks.Error(
+        f"READ_YOUR_WRITES_CACHE '{alias}' uses {backend}, which other "
+        "workers cannot see, so a write's pin would not hold.",
+        hint="Point READ_YOUR_WRITES_CACHE at a file or Redis cache, "
+             "or unset DATABASE_REPLICAS.",
+        id='flixapp.E001',
+    )]
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Runs in either mode, so async views under ASGI are not bounced
+    through a thread; the routing flag is a context variable, which
+    sync_to_async carries into the threads serving their queries.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        subject = bearer_subject(request)
+        safe = request.method in SAFE_METHODS
+        replica_ok = (
+            self.replicas_allowed(request)
+            and not (subject and is_pinned(subject))
+        )
+
+        token = _read_from_replica.set(replica_ok)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+
+        if self.pins(safe, subject, response):
+            pin_to_primary(subject)
+        return response
+
+    async def __acall__(self, request):
+        subject = bearer_subject(request)
+        safe = request.method in SAFE_METHODS
+        replica_ok = (
+            self.replicas_allowed(request)
+            and not (subject and await ais_pinned(subject))
+        )
+
+        token = _read_from_replica.set(replica_ok)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+
+        if self.pins(safe, subject, response):
+            await apin_to_primary(subject)
+        return response
+
+    @staticmethod
+    def replicas_allowed(request) -> bool:
+        return (
+            request.method in SAFE_METHODS
+            and bool(settings.DATABASE_REPLICAS)
+            and request.path_info not in settings.RESPONSE_CACHE_PATHS
+        )
+
+    @staticmethod
+    def pins(safe: bool, subject: str | None, response) -> bool:
+        return not safe and bool(subject) and response.status_code < 400
@@ -0,0 +1,73 @@
+"""
+Sparse fieldsets: ``?fields=id,title,score`` on the movie routes.
+
+`fieldset` narrows a route's item schema to the requested fields, in the
+schema's order. Routes then read only those columns, with `.values()`
+in CursorPagination or `.only()` for model instances, so the unbounded
+description and review columns are not read from SQLite unless asked
+for. The narrowed schemas are built once per combination and reused.
+"""
+from functools import lru_cache
+from typing import Type
+
+from django.http import HttpResponse
+from ninja import Schema
+from ninja.errors import HttpError
+from pydantic import create_model
+
+from flixapp.renderers import dumps
+
+
+def parse_fields(schema: Type[Schema], fields: str | None) -> tuple:
+    """Names in ``fields`` in the schema's order; all of them if empty"""
+    names = tuple(schema.__fields__)
+    requested = {name.strip() for name in (fields or '').split(',')} - {''}
+    if not requested:
+        return names
+    unknown = requested - set(names)
+    if unknown:
+        raise HttpError(400, f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in names if name in requested)
+
+
+@lru_cache(maxsize=None)
+def sparse_schema(schema: Type[Schema], names: tuple) -> Type[Schema]:
+    if names == tuple(schema.__fields__):
+        return schema
+    return create_model(
+        f"{schema.__name__}[{','.join(names)}]",
+        __base__=Schema,
+        **{
+            name: (schema.__fields__[name].outer_type_, ...)
+            for name in names
+        },
+    )
+
+
+def fieldset(schema: Type[Schema], fields: str | None) -> Type[Schema]:
+    """`schema` with only the fields of a ``?fields=`` value"""
+    return sparse_schema(schema, parse_fields(schema, fields))
+
+
+@lru_cache(maxsize=None)
+def projection(schema: Type[Schema]) -> tuple:
+    """The schema's field names, and those holding floats"""
+    fields = tuple(schema.__fields__)
+    floats = tuple(
+        name for name, field in schema.__fields__.items()
+        if field.outer_type_ is float
+    )
+    return fields, floats
+
+
+def render(schema: Type[Schema], data) -> HttpResponse:
+    """
+    A model instance, or a list of them, as JSON through `schema`. Only
+    the schema's attributes are read, so instances loaded with
+    `.only()` of its fields cost no further queries.
+    """
+    if isinstance(data, list):
+        content = [schema.from_orm(item).dict() for item in data]
+    else:
+        content = schema.from_orm(data).dict()
+    return HttpResponse(dumps(content), content_type='application/json')
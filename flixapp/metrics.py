@@ -0,0 +1,335 @@
+"""
+Per-request timings and Prometheus histograms.
+
+MetricsMiddleware times every request and counts its SQL queries.
+Code on the request path adds named phases with `timed()`:
+
+- ``jwt`` and ``user``: token decode and user lookup in the authenticators
+- ``view``: the route's function, including its queries
+- ``validation``: the rest of the django-ninja operation, mostly
+  pydantic input and output validation
+- ``render``: JSON encoding of the response
+- ``db``: all SQL, wherever it runs
+
+Phases overlap (``db`` is part of ``view`` and ``user``; async views
+look up the user, and paginated views render, inside ``view``), so the
+time of each phase spent inside the view is also kept apart, and only
+the rest is taken out of ``validation``. Phases are sent
+back in a Server-Timing header and aggregated into histograms served as
+Prometheus text from /api/metrics, with the counters of other request
+path code (e.g. the auth throttles). Metrics are per process, so scrape
+each worker.
+"""
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from threading import Lock
+import asyncio
+import time
+
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async,
+)
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+    2.5, 5,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+PHASES = ('jwt', 'user', 'view', 'validation', 'render', 'db')
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [
+                    [0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def clear(self) -> None:
+        with self._lock:
+            self.series.clear()
+
+    def expose(self) -> list:
+        lines = [
+            f'# HELP {self.name} {self.help}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self._lock:
+            series = [(k, list(v[0]), v[1]) for k, v in self.series.items()]
+        for label_values, counts, total in sorted(series):
+            labels = ','.join(
+                f'{name}="{value}"'
+                for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(
+                    (*self.buckets, '+Inf'), counts):
+                cumulative += bucket_count
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} '
+                    f'{cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+        self._lock = Lock()
+
+    def inc(self, *label_values) -> None:
+        with self._lock:
+            self.series[label_values] = self.series.get(label_values, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.series.clear()
+
+    def expose(self) -> list:
+        lines = [
+            f'# HELP {self.name} {self.help}',
+            f'# TYPE {self.name} counter',
+        ]
+        with self._lock:
+            series = sorted(self.series.items())
+        for label_values, value in series:
+            labels = ','.join(
+                f'{name}="{value}"'
+                for name, value in zip(self.labels, label_values))
+            lines.append(f'{self.name}{{{labels}}} {value}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    'flixfix_request_duration_seconds',
+    'Time spent serving a request',
+    ('route', 'method', 'status'), LATENCY_BUCKETS,
+)
+PHASE_SECONDS = Histogram(
+    'flixfix_request_phase_seconds',
+    'Time spent in each phase of a request',
+    ('route', 'method', 'phase'), LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'flixfix_db_queries',
+    'SQL queries issued per request',
+    ('route', 'method'), QUERY_BUCKETS,
+)
+THROTTLE_DECISIONS = Counter(
+    'flixfix_throttle_decisions_total',
+    'Token bucket checks in front of password hashing',
+    ('route', 'scope', 'outcome'),
+)
+METRICS = (REQUEST_SECONDS, PHASE_SECONDS, DB_QUERIES, THROTTLE_DECISIONS)
+
+
+class RequestTimings:
+    __slots__ = ('phases', 'in_view', 'queries', 'views')
+
+    def __init__(self):
+        self.phases = {}
+        # Seconds of each phase spent while the view was running
+        self.in_view = {}
+        self.queries = 0
+        self.views = 0
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', time.perf_counter() - start)
+            self.queries += 1
+
+
+_current = ContextVar('request_timings', default=None)
+
+
+@contextmanager
+def timed(phase: str):
+    """Add the time spent in the block to the current request's `phase`"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    nested = timings.views > 0
+    if phase == 'view':
+        timings.views += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        if phase == 'view':
+            timings.views -= 1
+        timings.add(phase, seconds)
+        if nested:
+            timings.in_view[phase] = (
+                timings.in_view.get(phase, 0.0) + seconds)
+
+
+def _timed_call(func, phase: str):
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with timed(phase):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with timed(phase):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def instrument(api) -> None:
+    """
+    Time the operations of a NinjaAPI. Call once all routes are added.
+
+    The whole operation is recorded as ``operation``, from which
+    MetricsMiddleware derives ``validation``.
+    """
+    routers = [api.default_router]
+    while routers:
+        router = routers.pop()
+        routers.extend(child for _, child in router._routers)
+        for path_view in router.path_operations.values():
+            for operation in path_view.operations:
+                operation.view_func = _timed_call(operation.view_func, 'view')
+                operation.run = _timed_call(operation.run, 'operation')
+
+
+@lru_cache(maxsize=1024)
+def _resolve_route(path: str) -> str:
+    try:
+        return resolve(path).route
+    except Resolver404:
+        return 'unmatched'
+
+
+def route_of(request) -> str:
+    match = request.resolver_match
+    if match is None:
+        # Answered by a middleware before URL resolution
+        return _resolve_route(request.path_info)
+    return match.route
+
+
+def server_timing(timings: RequestTimings, total: float) -> str:
+    entries = [
+        f'{phase};dur={timings.phases[phase] * 1000:.2f}'
+        for phase in PHASES if phase in timings.phases
+    ]
+    entries.append(f'queries;desc="{timings.queries}"')
+    entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
+
+
+def expose() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
+
+
+def reset() -> None:
+    for metric in METRICS:
+        metric.clear()
+
+
+class MetricsMiddleware:
+    """
+    Runs in either mode, so async views are awaited directly. Their
+    queries run in the request's sync_to_async thread, with connections
+    of its own, so the async path installs the query wrappers there.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = settings.METRICS_SERVER_TIMING
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with query_wrappers(timings):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        wrappers = ExitStack()
+        try:
+            await sync_to_async(wrappers.enter_context)(
+                query_wrappers(timings))
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrappers.close)()
+            _current.reset(token)
+        return self.record(request, response, timings, start)
+
+    def record(self, request, response, timings, start: float):
+        total = time.perf_counter() - start
+
+        phases = timings.phases
+        operation = phases.pop('operation', None)
+        if operation is not None:
+            phases['validation'] = max(operation - sum(
+                phases.get(phase, 0.0) - timings.in_view.get(phase, 0.0)
+                for phase in ('jwt', 'user', 'view', 'render')), 0.0)
+
+        route, method = route_of(request), request.method
+        REQUEST_SECONDS.observe(
+            total, route, method, str(response.status_code))
+        DB_QUERIES.observe(timings.queries, route, method)
+        for phase, seconds in phases.items():
+            PHASE_SECONDS.observe(seconds, route, method, phase)
+
+        if self.header:
+            response['Server-Timing'] = server_timing(timings, total)
+        return response
+
+
+@contextmanager
+def query_wrappers(timings):
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timings))
+        yield
@@ -0,0 +1,181 @@
+"""
+In-process cache of rendered list pages, per user.
+
+A page is keyed by the user, the route's arguments and the page asked
+for (cursor, limit, offset), and stored with the user's version, the
+VersionStamp `<name>:<user_id>`. Writers bump that version in the
+transaction that changes the user's rows, and every lookup reads it
+first (one query on a unique index), so no worker serves a page older
+than the last commit and no shared cache server is needed. The version
+lives on the primary, so pages are built from the primary too: rows
+from a lagging replica would otherwise be kept under a version they
+predate.
+
+Memory is bounded by the number of pages and by the bytes of their
+rendered JSON; the least recently used pages go first.
+"""
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+
+from django.conf import settings
+from django.http import HttpResponse
+from ninja import Schema
+
+from flixapp.db_router import primary_reads
+from user.models import VersionStamp
+
+
+class UserPageCache:
+    def __init__(self, name: str, max_entries: int, max_bytes: int):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def stamp(self, user_id: int) -> str:
+        return f'{self.name}:{user_id}'
+
+    def version(self, user_id: int) -> int:
+        return VersionStamp.current(self.stamp(user_id))
+
+    async def aversion(self, user_id: int) -> int:
+        return await VersionStamp.acurrent(self.stamp(user_id))
+
+    def bump(self, user_id: int) -> None:
+        """Retire the user's pages; call in the transaction of the write"""
+        VersionStamp.bump(self.stamp(user_id))
+
+    def get(self, key: tuple, version: int) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self._pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: tuple, version: int, content: bytes) -> None:
+        if not self.enabled or len(content) > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (version, content)
+            self._bytes += len(content)
+            while (len(self._entries) > self.max_entries
+                   or self._bytes > self.max_bytes):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _pop(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def page_key(user_id: int, kwargs: dict) -> tuple:
+    """The user and the view's arguments, pagination input included"""
+    params = []
+    for name, value in sorted(kwargs.items()):
+        if isinstance(value, Schema):
+            value = tuple(sorted(value.dict().items()))
+        params.append((name, value))
+    return (user_id, *params)
+
+
+def cached(pages: UserPageCache, key: tuple, version: int, response):
+    if isinstance(response, HttpResponse) and response.status_code == 200:
+        pages.set(key, version, response.content)
+    return response
+
+
+def cache_pages(pages: UserPageCache):
+    """
+    Serve a paginated view of request.auth's rows from `pages`. Only
+    pages rendered by `paginate` (a paginator with a ``schema``) are
+    kept.
+
+    @api.get(..., response=List[SomeSchema])
+    @cache_pages(user_movie_pages)
+    @paginate(CursorPagination, schema=SomeSchema)
+    def my_view(request):
+    """
+    def wrapper(func):
+        @wraps(func)
+        def view_with_cache(request, **kwargs):
+            if not pages.enabled:
+                return func(request, **kwargs)
+            user_id = request.auth.id
+            # Read before the rows: a page built from rows written after
+            # this read is only ever stored under an older version
+            version = pages.version(user_id)
+            key = page_key(user_id, kwargs)
+            content = pages.get(key, version)
+            if content is not None:
+                return HttpResponse(content, content_type='application/json')
+            with primary_reads():
+                response = func(request, **kwargs)
+            return cached(pages, key, version, response)
+
+        return view_with_cache
+
+    return wrapper
+
+
+def acache_pages(pages: UserPageCache, user):
+    """
+    `cache_pages` for async views; `user` is the coroutine function
+    returning the request's user.
+    """
+    def wrapper(func):
+        @wraps(func)
+        async def view_with_cache(request, **kwargs):
+            if not pages.enabled:
+                return await func(request, **kwargs)
+            user_id = (await user(request)).id
+            version = await pages.aversion(user_id)
+            key = page_key(user_id, kwargs)
+            content = pages.get(key, version)
+            if content is not None:
+                return HttpResponse(content, content_type='application/json')
+            with primary_reads():
+                response = await func(request, **kwargs)
+            return cached(pages, key, version, response)
+
+        return view_with_cache
+
+    return wrapper
+
+
+user_movie_pages = UserPageCache(
+    'user_movies',
+    max_entries=getattr(settings, 'USER_MOVIES_CACHE_ENTRIES', 1024),
+    max_bytes=getattr(settings, 'USER_MOVIES_CACHE_BYTES', 16 * 1024 ** 2),
+)
@@ -0,0 +1,337 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from decimal import Decimal
+from functools import partial, wraps
+from hashlib import sha1
+from typing import Any, List, Optional, Type
+import json
+
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.core.exceptions import (
+    EmptyResultSet, FieldDoesNotExist, ValidationError,
+)
+from django.db.models import Q
+from django.http import HttpResponse
+from ninja import Field, Schema
+from ninja.conf import settings
+from ninja.errors import ConfigError, HttpError
+from ninja.pagination import PaginationBase, make_response_paginated
+
+from flixapp.fieldsets import fieldset, projection
+from flixapp.renderers import dumps
+
+
+COUNT_TTL = getattr(django_settings, 'PAGINATION_COUNT_TTL', 60)
+
+
+class CursorPagination(PaginationBase):
+    """
+    Keyset pagination over an ordered set of columns.
+
+    Pages are fetched with ``WHERE (cols) > (last row)`` instead of
+    OFFSET, so deep pages cost the same as the first one and no
+    ``COUNT(*)`` is issued. The ``next`` value is an opaque cursor to
+    pass back as ``?cursor=``.
+
+    Clients that still send ``?offset=`` get the old limit/offset page.
+    Its ``count`` depends on the route's ``count`` mode:
+
+    - ``exact``: a ``COUNT(*)`` per page.
+    - ``cached``: the ``COUNT(*)`` is cached per filter for
+      ``PAGINATION_COUNT_TTL`` seconds.
+    - ``none``: no count; ``limit + 1`` rows are fetched to tell
+      ``has_next``.
+
+    With a ``schema``, rows are fetched with ``.values()`` of its fields
+    and the page is rendered straight to JSON by `paginate`/`apaginate`,
+    without building model instances or validating each row: the rows
+    come from our own database, and floats are the only conversion the
+    item schemas need. ``?fields=`` narrows the schema, and the columns
+    read, to a comma-separated subset of its fields.
+    """
+
+    class Input(Schema):
+        cursor: Optional[str] = None
+        limit: int = Field(settings.PAGINATION_PER_PAGE, ge=1)
+        offset: Optional[int] = Field(None, ge=0)
+        fields: Optional[str] = None
+
+    class Output(Schema):
+        items: List[Any]
+        next: Optional[str]
+        count: Optional[int]
+        has_next: bool
+
+    COUNT_MODES = ('exact', 'cached', 'none')
+
+    def __init__(
+        self,
+        ordering: tuple = ('id',),
+        count: str = 'exact',
+        schema: Type[Schema] = None,
+        **kwargs: Any,
+    ) -> None:
+        if count not in self.COUNT_MODES:
+            raise ConfigError(f'count must be one of {self.COUNT_MODES}')
+        self.count = count
+        if ordering[-1].lstrip('-') != 'id':
+            # The last column must be unique for the keyset to be stable
+            ordering = (*ordering, '-id' if ordering[-1][0] == '-' else 'id')
+        self.ordering = ordering
+        self.schema = schema
+        self.fields = self.floats = None
+        if schema is not None:
+            self.fields, self.floats = projection(schema)
+        super().__init__(**kwargs)
+
+    def paginate_queryset(self, queryset, pagination: Input, **params):
+        return self._project(self._paginate(queryset, pagination), pagination)
+
+    def _paginate(self, queryset, pagination: Input) -> dict:
+        queryset = self._ordered(queryset, pagination)
+        limit = pagination.limit
+
+        if self._offset_mode(pagination):
+            offset = pagination.offset
+            if self.count == 'none':
+                items = list(queryset[offset:offset + limit + 1])
+                return self._offset_page(items, limit)
+
+            key = self._count_key(queryset)
+            count = cache.get(key) if key else None
+            if count is None:
+                count = self._items_count(queryset)
+                if key:
+                    cache.set(key, count, COUNT_TTL)
+            return self._offset_page(
+                queryset[offset:offset + limit], limit, count, offset)
+
+        return self._cursor_page(list(queryset[:limit + 1]), limit)
+
+    async def apaginate_queryset(self, queryset, pagination: Input, **params):
+        page = await self._apaginate(queryset, pagination)
+        return self._project(page, pagination)
+
+    async def _apaginate(self, queryset, pagination: Input) -> dict:
+        queryset = self._ordered(queryset, pagination)
+        limit = pagination.limit
+
+        if self._offset_mode(pagination):
+            offset = pagination.offset
+            if self.count == 'none':
+                items = queryset[offset:offset + limit + 1]
+                return self._offset_page(
+                    [item async for item in items], limit)
+
+            key = self._count_key(queryset)
+            count = await cache.aget(key) if key else None
+            if count is None:
+                count = await queryset.acount()
+                if key:
+                    await cache.aset(key, count, COUNT_TTL)
+            return self._offset_page(
+                [item async for item in queryset[offset:offset + limit]],
+                limit, count, offset,
+            )
+
+        items = [item async for item in queryset[:limit + 1]]
+        return self._cursor_page(items, limit)
+
+    def _projection(self, pagination: Input) -> tuple:
+        """(fields, floats) of the schema narrowed by ``?fields=``"""
+        if self.schema is None:
+            return None, None
+        return projection(fieldset(self.schema, pagination.fields))
+
+    def _project(self, page: dict, pagination: Input) -> dict:
+        """Trim values() rows to the schema's fields"""
+        fields, floats = self._projection(pagination)
+        if fields is None:
+            return page
+        items = []
+        for row in page['items']:
+            item = {field: row[field] for field in fields}
+            for field in floats:
+                if item[field] is not None:
+                    item[field] = float(item[field])
+            items.append(item)
+        page['items'] = items
+        return page
+
+    def _count_key(self, queryset) -> str | None:
+        """Cache key of the filter's count, in `cached` mode"""
+        if self.count != 'cached':
+            return None
+        try:
+            sql, sql_params = queryset.order_by().query.sql_with_params()
+        except EmptyResultSet:
+            return None
+        digest = sha1(f'{sql}{sql_params}'.encode()).hexdigest()
+        return f'pagination-count:{digest}'
+
+    @staticmethod
+    def _offset_mode(pagination: Input) -> bool:
+        return pagination.offset is not None and pagination.cursor is None
+
+    def _ordered(self, queryset, pagination: Input):
+        queryset = queryset.order_by(*self.ordering)
+        fields, _ = self._projection(pagination)
+        if fields is not None:
+            columns = [column.lstrip('-') for column in self.ordering]
+            # Ordering columns are kept for the next cursor
+            queryset = queryset.values(*dict.fromkeys((*fields, *columns)))
+        if pagination.cursor and not self._offset_mode(pagination):
+            queryset = queryset.filter(self._after(
+                queryset, self.decode_cursor(pagination.cursor)))
+        return queryset
+
+    @staticmethod
+    def _offset_page(items, limit, count=None, offset=None) -> dict:
+        if count is None:
+            # `items` holds one extra row if there is a next page
+            items = list(items)
+            has_next = len(items) > limit
+            items = items[:limit]
+        else:
+            has_next = offset + limit < count
+        return {
+            "items": items,
+            "next": None,
+            "count": count,
+            "has_next": has_next,
+        }
+
+    def _cursor_page(self, items: list, limit: int) -> dict:
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = self.encode_cursor(self._position(items[-1]))
+
+        return {
+            "items": items,
+            "next": next_cursor,
+            "count": None,
+            "has_next": next_cursor is not None,
+        }
+
+    def _position(self, item) -> list:
+        """Ordering column values of a model instance or values() dict"""
+        fields = [column.lstrip('-') for column in self.ordering]
+        if isinstance(item, dict):
+            return [item[field] for field in fields]
+        return [getattr(item, field) for field in fields]
+
+    def _after(self, queryset, position: list) -> Q:
+        """Row-value comparison `(a, b, id) > (x, y, z)` spelled out in Q"""
+        if len(position) != len(self.ordering):
+            raise HttpError(400, "Invalid cursor")
+
+        condition = Q()
+        equal = {}
+        for column, value in zip(self.ordering, position):
+            field = column.lstrip('-')
+            value = self._cursor_value(queryset, field, value)
+            lookup = 'lt' if column.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    @staticmethod
+    def _cursor_value(queryset, name: str, value):
+        """`value` as the Python type of the `name` column, or a 400"""
+        if value is None or isinstance(value, (list, dict)):
+            raise HttpError(400, "Invalid cursor")
+        try:
+            field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            field = queryset.query.annotations[name].output_field
+        try:
+            return field.to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise HttpError(400, "Invalid cursor")
+
+    @staticmethod
+    def encode_cursor(position: list) -> str:
+        values = [str(v) if isinstance(v, Decimal) else v for v in position]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> list:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            position = json.loads(urlsafe_b64decode(padded.encode()))
+        except (Base64Error, ValueError):
+            raise HttpError(400, "Invalid cursor")
+        if not isinstance(position, list):
+            raise HttpError(400, "Invalid cursor")
+        return position
+
+
+def rendered(paginator, page: dict):
+    """The page itself, or its JSON response if it needs no validation"""
+    if getattr(paginator, 'fields', None) is None:
+        return page
+    return HttpResponse(dumps(page), content_type='application/json')
+
+
+def paginate(paginator_class=CursorPagination, **paginator_params):
+    """
+    `ninja.pagination.paginate`, returning pages of a paginator with a
+    ``schema`` as already rendered responses.
+
+    @api.get(..., response=List[SomeSchema])
+    @paginate(CursorPagination, schema=SomeSchema)
+    def my_view(request):
+    """
+    paginator = paginator_class(**paginator_params)
+
+    def wrapper(func):
+        @wraps(func)
+        def view_with_pagination(request, **kwargs):
+            pagination_params = kwargs.pop('ninja_pagination')
+            items = func(request, **kwargs)
+            page = paginator.paginate_queryset(
+                items, pagination=pagination_params, **kwargs)
+            page['items'] = list(page['items'])
+            return rendered(paginator, page)
+
+        view_with_pagination._ninja_contribute_args = [
+            ('ninja_pagination', paginator.Input, paginator.InputSource),
+        ]
+        view_with_pagination._ninja_contribute_to_operation = partial(
+            make_response_paginated, paginator)
+        return view_with_pagination
+
+    return wrapper
+
+
+def apaginate(paginator_class=CursorPagination, **paginator_params):
+    """
+    `paginate` for async views; the paginator must provide
+    `apaginate_queryset`.
+
+    @api.get(..., response=List[SomeSchema])
+    @apaginate(CursorPagination)
+    async def my_view(request):
+    """
+    paginator = paginator_class(**paginator_params)
+
+    def wrapper(func):
+        @wraps(func)
+        async def view_with_pagination(request, **kwargs):
+            pagination_params = kwargs.pop('ninja_pagination')
+            items = await func(request, **kwargs)
+            page = await paginator.apaginate_queryset(
+                items, pagination=pagination_params, **kwargs)
+            return rendered(paginator, page)
+
+        view_with_pagination._ninja_contribute_args = [
+            ('ninja_pagination', paginator.Input, paginator.InputSource),
+        ]
+        view_with_pagination._ninja_contribute_to_operation = partial(
+            make_response_paginated, paginator)
+        return view_with_pagination
+
+    return wrapper
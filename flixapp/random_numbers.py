@@ -0,0 +1,188 @@
+"""
+Client for the public random number API behind GET /api/number/.
+
+Numbers are prefetched in batches into an in-process buffer by a
+background thread, so most requests never leave the process. Upstream
+calls share one pooled session with strict timeouts, and a circuit
+breaker switches to a local generator while the upstream is failing.
+"""
+from collections import deque
+from threading import Event, Lock, Thread
+import random
+import time
+
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+import requests
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive errors. Once `reset_after`
+    seconds have passed a single trial call is let through; success
+    closes the circuit again.
+    """
+
+    def __init__(self, failures: int, reset_after: float):
+        self.threshold = failures
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._lock = Lock()
+
+    @property
+    def state(self) -> str:
+        return 'closed' if self.opened_at is None else 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_after:
+                # Half open: re-arm so only this caller gets the trial
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class RandomNumberClient:
+    LOW = 0
+    HIGH = 100
+
+    def __init__(
+        self,
+        url: str,
+        timeout: tuple,
+        buffer_size: int,
+        refill_at: int,
+        breaker: CircuitBreaker,
+        pool_size: int = 4,
+        background: bool = True,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.refill_at = refill_at
+        self.breaker = breaker
+        self.background = background
+        self.buffer = deque(maxlen=buffer_size)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.buffered = 0
+        self.fetched = 0
+        self.fallbacks = 0
+        self._wake = Event()
+        self._thread = None
+        self._thread_lock = Lock()
+
+    def get_number(self) -> int:
+        """A buffered number, else one fetched now, else a local one"""
+        number = self.take()
+        if number is not None:
+            return number
+        try:
+            return self.fetch(1)[0]
+        except (CircuitOpen, requests.RequestException, ValueError):
+            return self.fallback()
+
+    def take(self) -> int | None:
+        """Pop a prefetched number without any I/O"""
+        try:
+            number = self.buffer.popleft()
+            self.buffered += 1
+        except IndexError:
+            number = None
+        if len(self.buffer) < self.refill_at:
+            self._request_refill()
+        return number
+
+    def fallback(self) -> int:
+        self.fallbacks += 1
+        return random.randint(self.LOW, self.HIGH)
+
+    def fetch(self, count: int) -> list:
+        if not self.breaker.allow():
+            raise CircuitOpen
+        try:
+            r = self.session.get(
+                self.url, params={'count': count}, timeout=self.timeout)
+            r.raise_for_status()
+            numbers = r.json()
+            if not (isinstance(numbers, list) and numbers
+                    and all(isinstance(n, int) for n in numbers)):
+                raise ValueError(f'Unexpected upstream body: {r.text!r}')
+        except (requests.RequestException, ValueError):
+            self.breaker.failure()
+            raise
+        self.breaker.success()
+        self.fetched += len(numbers)
+        return numbers
+
+    def refill(self) -> None:
+        """Top the buffer up with one upstream call"""
+        missing = self.buffer.maxlen - len(self.buffer)
+        if missing <= 0:
+            return
+        try:
+            self.buffer.extend(self.fetch(missing))
+        except (CircuitOpen, requests.RequestException, ValueError):
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "buffered": self.buffered,
+            "fetched": self.fetched,
+            "fallbacks": self.fallbacks,
+            "buffer_size": len(self.buffer),
+            "circuit": self.breaker.state,
+        }
+
+    def _request_refill(self) -> None:
+        if not self.background:
+            return
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    # Started on first use so forked workers get their own
+                    self._thread = Thread(
+                        target=self._run, name='random-number-refill',
+                        daemon=True)
+                    self._thread.start()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            self.refill()
+
+
+number_client = RandomNumberClient(
+    url=settings.RANDOM_NUMBER_URL,
+    timeout=(
+        settings.RANDOM_NUMBER_CONNECT_TIMEOUT,
+        settings.RANDOM_NUMBER_READ_TIMEOUT,
+    ),
+    buffer_size=settings.RANDOM_NUMBER_BUFFER_SIZE,
+    refill_at=settings.RANDOM_NUMBER_REFILL_AT,
+    breaker=CircuitBreaker(
+        failures=settings.RANDOM_NUMBER_BREAKER_FAILURES,
+        reset_after=settings.RANDOM_NUMBER_BREAKER_RESET,
+    ),
+)
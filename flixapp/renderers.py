@@ -0,0 +1,40 @@
+"""
+JSON rendering for the APIs, through orjson when it is installed.
+
+orjson is several times faster than the stdlib encoder on large pages.
+Anything it cannot encode natively (Decimal, pydantic models, and
+datetimes, to keep Django's format) goes through NinjaJSONEncoder, so
+the output matches ninja's default renderer.
+"""
+import json
+
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+from flixapp.metrics import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+_encoder = NinjaJSONEncoder()
+
+
+def dumps(data) -> bytes:
+    with timed('render'):
+        if orjson is None:
+            return json.dumps(data, cls=NinjaJSONEncoder).encode()
+        return orjson.dumps(
+            data,
+            default=_encoder.default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+
+
+class FastJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+
+    def render(self, request, data, *, response_status):
+        return dumps(data)
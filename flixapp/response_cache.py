@@ -0,0 +1,142 @@
+"""
+Versioned response cache for anonymous GET endpoints.
+
+Each cached path belongs to a named version counter kept in the
+`responses` cache. Writers bump the counter, which retires every cached
+page and ETag for that path at once. Revalidation (If-None-Match) and
+hits only read the cache, never the database.
+
+Use the file or Redis backend (RESPONSE_CACHE_BACKEND) when running
+several workers; with locmem each process has its own counters.
+"""
+from hashlib import sha1
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+
+def response_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def get_version(name: str) -> int:
+    cache = response_cache()
+    key = f'version:{name}'
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a lost counter never reuses old ETags
+        cache.add(key, time.time_ns())
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(name: str) -> int:
+    cache = response_cache()
+    key = f'version:{name}'
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns())
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(name: str) -> None:
+    cache = response_cache()
+    key = f'version:{name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns())
+
+
+class ResponseCacheMiddleware:
+    """
+    Serve GETs to settings.RESPONSE_CACHE_PATHS from the cache, with a
+    strong ETag derived from the path's version and query string. Runs
+    in either mode, so async views are awaited directly.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.paths = settings.RESPONSE_CACHE_PATHS
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        name = self.paths.get(request.path_info)
+        if name is None or request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+
+        etag, key = self.keys(request, name, get_version(name))
+        if etag in request.headers.get('If-None-Match', ''):
+            return not_modified(etag)
+
+        cache = response_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            response = HttpResponse(cached[0], content_type=cached[1])
+        else:
+            response = self.get_response(request)
+            if not cacheable(response):
+                return response
+            cache.set(key, entry(response), settings.RESPONSE_CACHE_TTL)
+        return tagged(response, etag)
+
+    async def __acall__(self, request):
+        name = self.paths.get(request.path_info)
+        if name is None or request.method not in ('GET', 'HEAD'):
+            return await self.get_response(request)
+
+        etag, key = self.keys(request, name, await aget_version(name))
+        if etag in request.headers.get('If-None-Match', ''):
+            return not_modified(etag)
+
+        cache = response_cache()
+        cached = await cache.aget(key)
+        if cached is not None:
+            response = HttpResponse(cached[0], content_type=cached[1])
+        else:
+            response = await self.get_response(request)
+            if not cacheable(response):
+                return response
+            await cache.aset(
+                key, entry(response), settings.RESPONSE_CACHE_TTL)
+        return tagged(response, etag)
+
+    @staticmethod
+    def keys(request, name: str, version: int) -> tuple:
+        """The ETag and the cache key of this request's response"""
+        query = sorted(request.GET.lists())
+        digest = sha1(repr(query).encode()).hexdigest()[:16]
+        return (
+            f'"{name}-{version}-{digest}"',
+            f'response:{request.path_info}:{version}:{digest}',
+        )
+
+
+def not_modified(etag: str) -> HttpResponse:
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
+
+
+def cacheable(response) -> bool:
+    return response.status_code == 200 and not response.streaming
+
+
+def entry(response) -> tuple:
+    return response.content, response['Content-Type']
+
+
+def tagged(response, etag: str):
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept',))
+    return response
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'user',
     'movies',
+    'jobs',
     'rest_framework',
     'rest_framework_simplejwt',
 ]
@@ -59,8 +60,68 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Lifetime of the tokens issued by /api/login and /api/token/refresh
+ACCESS_TOKEN_LIFETIME = timedelta(
+    minutes=int(os.environ.get('ACCESS_TOKEN_MINUTES', 20)))
+REFRESH_TOKEN_LIFETIME = timedelta(
+    days=int(os.environ.get('REFRESH_TOKEN_DAYS', 1)))
+
+# Seconds a `count='cached'` paginated route reuses its COUNT(*)
+PAGINATION_COUNT_TTL = int(os.environ.get('PAGINATION_COUNT_TTL', 60))
+
+# In-process cache of authenticated users (see user/cache.py)
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', 1024))
+AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL', 300))
+AUTH_CACHE_STAMP_INTERVAL = float(
+    os.environ.get('AUTH_CACHE_STAMP_INTERVAL', 1))
+
+# In-process cache of /api/list_user_movies pages (see flixapp/page_cache.py);
+# either limit at 0 turns it off
+USER_MOVIES_CACHE_ENTRIES = int(
+    os.environ.get('USER_MOVIES_CACHE_ENTRIES', 1024))
+USER_MOVIES_CACHE_BYTES = int(
+    os.environ.get('USER_MOVIES_CACHE_BYTES', 16 * 1024 ** 2))
+
+# Rows per INSERT for POST /api/movies/bulk
+BULK_IMPORT_BATCH_SIZE = int(os.environ.get('BULK_IMPORT_BATCH_SIZE', 500))
+# Largest ?batch_size= a client may ask for; a batch is held in memory
+BULK_IMPORT_MAX_BATCH_SIZE = int(
+    os.environ.get('BULK_IMPORT_MAX_BATCH_SIZE', 1000))
+# Longest NDJSON line (in bytes) or JSON array item (in characters)
+# accepted by a bulk import
+BULK_IMPORT_MAX_ITEM_SIZE = int(
+    os.environ.get('BULK_IMPORT_MAX_ITEM_SIZE', 1024 * 1024))
+
+# Rows fetched per query by GET /api/movies/export
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# Threads that run password hashing for the async API
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+
+# Upstream behind GET /api/number/
+RANDOM_NUMBER_URL = os.environ.get(
+    'RANDOM_NUMBER_URL',
+    'http://www.randomnumberapi.com/api/v1.0/randomnumber',
+)
+RANDOM_NUMBER_CONNECT_TIMEOUT = float(
+    os.environ.get('RANDOM_NUMBER_CONNECT_TIMEOUT', 0.5))
+RANDOM_NUMBER_READ_TIMEOUT = float(
+    os.environ.get('RANDOM_NUMBER_READ_TIMEOUT', 1))
+# Prefetched numbers kept in memory, refilled when fewer than REFILL_AT
+RANDOM_NUMBER_BUFFER_SIZE = int(
+    os.environ.get('RANDOM_NUMBER_BUFFER_SIZE', 100))
+RANDOM_NUMBER_REFILL_AT = int(os.environ.get('RANDOM_NUMBER_REFILL_AT', 20))
+# Consecutive failures before serving local numbers, and for how long
+RANDOM_NUMBER_BREAKER_FAILURES = int(
+    os.environ.get('RANDOM_NUMBER_BREAKER_FAILURES', 3))
+RANDOM_NUMBER_BREAKER_RESET = float(
+    os.environ.get('RANDOM_NUMBER_BREAKER_RESET', 30))
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'flixapp.metrics.MetricsMiddleware',
+    'flixapp.response_cache.ResponseCacheMiddleware',
+    'flixapp.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -69,7 +130,65 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'flixapp.urls'
+# Deleted users' movies are removed in batches of this size, pausing
+# between batches so other writers get the SQLite lock
+USER_PURGE_BATCH_SIZE = int(os.environ.get('USER_PURGE_BATCH_SIZE', 500))
+USER_PURGE_PAUSE = float(os.environ.get('USER_PURGE_PAUSE', 0.01))
+
+# Trigram similarity from which a movie title joins an existing catalog
+# Title
+TITLE_MATCH_THRESHOLD = float(os.environ.get('TITLE_MATCH_THRESHOLD', 0.75))
+
+# Public movies kept in the /movies/top leaderboard, the largest `n`
+LEADERBOARD_SIZE = int(os.environ.get('LEADERBOARD_SIZE', 100))
+
+# Token buckets in front of password hashing on /login and /create-user,
+# per client IP and per email, as "burst,tokens per second". Buckets are
+# database rows, so the limits hold across worker processes.
+AUTH_THROTTLE = os.environ.get('AUTH_THROTTLE', 'true').lower() in (
+    '1', 'true', 'yes')
+AUTH_THROTTLE_PER_IP = tuple(
+    float(n) for n in os.environ.get('AUTH_THROTTLE_PER_IP', '20,0.5')
+    .split(','))
+AUTH_THROTTLE_PER_EMAIL = tuple(
+    float(n) for n in os.environ.get('AUTH_THROTTLE_PER_EMAIL', '5,0.05')
+    .split(','))
+# Reverse proxies (addresses or networks) whose X-Forwarded-For names the
+# client, e.g. "127.0.0.1" for nginx on the same host
+THROTTLE_TRUSTED_PROXIES = tuple(filter(None, (
+    proxy.strip() for proxy in
+    os.environ.get('THROTTLE_TRUSTED_PROXIES', '').split(','))))
+
+# Background jobs, run by `manage.py runworker`. JOBS_EAGER runs them
+# in-process after the enqueueing transaction commits instead.
+JOBS_EAGER = os.environ.get('JOBS_EAGER', 'false').lower() in (
+    '1', 'true', 'yes')
+JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', 2))
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', 1))
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 3))
+# Seconds before the first retry, doubled on each later one
+JOBS_RETRY_BACKOFF = float(os.environ.get('JOBS_RETRY_BACKOFF', 5))
+# A job running longer than this is assumed lost with its worker
+JOBS_LEASE_SECONDS = int(os.environ.get('JOBS_LEASE_SECONDS', 3600))
+# Lets non-superusers start the whole-table jobs (index rebuilds, stats
+# reconciliation) by sending it as X-Jobs-Token; unset, only superusers can
+JOBS_ADMIN_TOKEN = os.environ.get('JOBS_ADMIN_TOKEN', '')
+JOB_FILES_DIR = os.environ.get('JOB_FILES_DIR', BASE_DIR / '.cache' / 'jobs')
+
+# TF-IDF index behind /movie/{id}/similar, memory-mapped by every worker
+SIMILAR_INDEX_PATH = os.environ.get(
+    'SIMILAR_INDEX_PATH', BASE_DIR / '.cache' / 'similar.idx')
+# Words in more than this share of the movies are not indexed
+SIMILAR_MAX_DF = float(os.environ.get('SIMILAR_MAX_DF', 0.5))
+# Postings one /movie/{id}/similar query may read
+SIMILAR_MAX_POSTINGS = int(os.environ.get('SIMILAR_MAX_POSTINGS', 100000))
+
+# Send per-phase timings back in a Server-Timing header
+METRICS_SERVER_TIMING = os.environ.get(
+    'METRICS_SERVER_TIMING', 'true').lower() in ('1', 'true', 'yes')
+
+# flixapp/asgi.py switches this to flixapp.async_urls
+ROOT_URLCONF = os.environ.get('ROOT_URLCONF', 'flixapp.urls')
 
 TEMPLATES = [
     {
@@ -100,6 +219,63 @@ DATABASES = {
     }
 }
 
+# Read replicas, as comma separated SQLite paths. `manage.py sync_replicas`
+# copies the primary onto them.
+DATABASE_REPLICAS = []
+for n, name in enumerate(
+        filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{n}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{n}')
+
+DATABASE_ROUTERS = ['flixapp.db_router.ReplicaRouter']
+
+# After a write, a user's reads stay on the primary this long
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+# Must be shared by every worker (file or Redis) when replicas are used;
+# e.g. 'responses' with RESPONSE_CACHE_BACKEND=file
+READ_YOUR_WRITES_CACHE = os.environ.get('READ_YOUR_WRITES_CACHE', 'default')
+
+
+# Caches
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+RESPONSE_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'RESPONSE_CACHE_DIR', BASE_DIR / '.cache' / 'responses'),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': RESPONSE_CACHE_BACKENDS[
+        os.environ.get('RESPONSE_CACHE_BACKEND', 'locmem')],
+}
+
+# Anonymous GET endpoints served by ResponseCacheMiddleware, mapped to
+# the version counter that invalidates them
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+RESPONSE_CACHE_PATHS = {
+    '/api/list_all_movies': 'public_movies',
+    '/api/movies/top': 'public_movies',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
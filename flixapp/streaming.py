@@ -0,0 +1,76 @@
+"""
+Streaming responses over async iterators, as Django 4.2 has them.
+
+Django 4.1 iterates StreamingHttpResponse synchronously, and under ASGI
+it does so on the event loop, where a generator reading the database
+raises SynchronousOnlyOperation. `StreamingHttpResponse` here also
+accepts an async iterator (one of QuerySet.aiterator(), say), and
+`ASGIHandler` sends it with ``async for``, so each chunk's query runs
+in sync_to_async while the loop keeps serving other requests.
+"""
+from asgiref.sync import async_to_sync
+from django.core.handlers.asgi import ASGIHandler as BaseASGIHandler
+from django.http import StreamingHttpResponse as BaseStreamingHttpResponse
+
+
+class StreamingHttpResponse(BaseStreamingHttpResponse):
+    is_async = False
+
+    @property
+    def streaming_content(self):
+        if self.is_async:
+            return self._amap(self._iterator)
+        return map(self.make_bytes, self._iterator)
+
+    @streaming_content.setter
+    def streaming_content(self, value):
+        self._set_streaming_content(value)
+
+    def _set_streaming_content(self, value):
+        self.is_async = hasattr(value, '__aiter__')
+        if not self.is_async:
+            return super()._set_streaming_content(value)
+        self._iterator = aiter(value)
+
+    async def _amap(self, parts):
+        async for part in parts:
+            yield self.make_bytes(part)
+
+    def __iter__(self):
+        if not self.is_async:
+            return self.streaming_content
+        return self._consume()
+
+    def _consume(self):
+        """Sync fallback (WSGI): fetch each part on a new event loop"""
+        parts = self.streaming_content
+        while True:
+            try:
+                yield async_to_sync(parts.__anext__)()
+            except StopAsyncIteration:
+                return
+
+
+class ASGIHandler(BaseASGIHandler):
+    """Sends async streaming responses without blocking the loop"""
+
+    async def send_response(self, response, send):
+        if not getattr(response, 'is_async', False):
+            return await super().send_response(response, send)
+        parts = response.streaming_content
+        # The base class sends the headers and the closing message
+        response.streaming_content = ()
+
+        async def send_parts(message):
+            if (message['type'] == 'http.response.body'
+                    and not message.get('more_body')):
+                async for part in parts:
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        })
+            await send(message)
+
+        await super().send_response(response, send_parts)
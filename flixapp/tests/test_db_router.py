@@ -0,0 +1,251 @@
+"""
+Tests for read replica routing.
+"""
+from io import StringIO
+import sqlite3
+import tempfile
+
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, TestCase, TransactionTestCase, override_settings,
+)
+
+from flixapp.db_router import (
+    ReplicaRouter, ReplicaRoutingMiddleware, check_pin_cache,
+)
+from flixapp.page_cache import user_movie_pages
+from flixapp.urls import AccessToken
+from jobs.models import Job
+from movies import titles
+from movies.models import Movie
+from user.cache import user_cache
+from user.models import AccountDeletion, User, VersionStamp
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+router = ReplicaRouter()
+FILE_CACHE = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+def routed_view(status=200):
+    """A view recording where a read would be routed."""
+    def view(request):
+        response = HttpResponse(status=status)
+        response.read_db = router.db_for_read(Movie)
+        return response
+    return view
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(TestCase):
+    """Test reads and writes pick the right database."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        user = User.objects.create_user('user@example.com', 'Testpassword!')
+        token = AccessToken.create(user)['access_token']
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def request(self, method, status=200, **headers):
+        middleware = ReplicaRoutingMiddleware(routed_view(status))
+        return middleware(getattr(self.factory, method)('/api/x', **headers))
+
+    def test_get_reads_from_replica(self):
+        """Test GET requests read from a replica."""
+        self.assertEqual(self.request('get').read_db, 'replica1')
+
+    def test_writes_use_primary(self):
+        """Test unsafe methods read and write on the primary."""
+        self.assertEqual(self.request('post').read_db, 'default')
+        self.assertEqual(router.db_for_write(Movie), 'default')
+
+    def test_outside_request_uses_primary(self):
+        """Test reads outside a request stay on the primary."""
+        self.assertEqual(router.db_for_read(Movie), 'default')
+
+    def test_read_your_writes(self):
+        """Test a writer's reads stick to the primary after a write."""
+        self.assertEqual(self.request('get', **self.auth).read_db, 'replica1')
+
+        self.request('put', **self.auth)
+
+        self.assertEqual(self.request('get', **self.auth).read_db, 'default')
+        self.assertEqual(self.request('get').read_db, 'replica1')
+
+    def test_failed_write_does_not_pin(self):
+        """Test a rejected write keeps reads on the replica."""
+        self.request('put', status=401, **self.auth)
+
+        self.assertEqual(self.request('get', **self.auth).read_db, 'replica1')
+
+    @override_settings(READ_YOUR_WRITES_SECONDS=0)
+    def test_pin_expires(self):
+        """Test the window closes after READ_YOUR_WRITES_SECONDS."""
+        self.request('put', **self.auth)
+
+        self.assertEqual(self.request('get', **self.auth).read_db, 'replica1')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test everything uses the primary without replicas."""
+        self.assertEqual(self.request('get').read_db, 'default')
+
+    async def test_async_views(self):
+        """Test async views are awaited directly and routed the same."""
+        async def view(request):
+            response = HttpResponse()
+            response.read_db = router.db_for_read(Movie)
+            return response
+
+        middleware = ReplicaRoutingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+
+        res = await middleware(self.factory.get('/api/x', **self.auth))
+        self.assertEqual(res.read_db, 'replica1')
+        await middleware(self.factory.put('/api/x', **self.auth))
+        res = await middleware(self.factory.get('/api/x', **self.auth))
+        self.assertEqual(res.read_db, 'default')
+
+    def test_cached_paths_use_primary(self):
+        """Test responses kept under a version are built from the primary."""
+        middleware = ReplicaRoutingMiddleware(routed_view())
+
+        res = middleware(self.factory.get('/api/list_all_movies'))
+
+        self.assertEqual(res.read_db, 'default')
+
+    def test_coordination_rows_use_primary(self):
+        """Test stamps, jobs and deletions are never read from a copy."""
+        middleware = ReplicaRoutingMiddleware(
+            lambda request: HttpResponse(content=' '.join(
+                router.db_for_read(model)
+                for model in (VersionStamp, Job, AccountDeletion))))
+
+        res = middleware(self.factory.get('/api/x'))
+
+        self.assertEqual(res.content, b'default default default')
+
+    def test_local_pin_cache_fails_check(self):
+        """Test replicas over a per-process pin cache fail the checks."""
+        errors = check_pin_cache(None)
+        self.assertEqual([e.id for e in errors], ['flixapp.E001'])
+
+        with override_settings(READ_YOUR_WRITES_CACHE='files', CACHES={
+                'files': {'BACKEND': FILE_CACHE, 'LOCATION': '/tmp'}}):
+            self.assertEqual(check_pin_cache(None), [])
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(check_pin_cache(None), [])
+
+    def test_replicas_are_not_migrated(self):
+        """Test migrations only run on the primary."""
+        self.assertTrue(router.allow_migrate('default', 'movies'))
+        self.assertFalse(router.allow_migrate('replica1', 'movies'))
+
+
+class SyncReplicasTests(TransactionTestCase):
+    """
+    Test copying the primary onto a local SQLite replica.
+
+    The backup API waits for open write transactions, so this cannot
+    run inside TestCase's per-test transaction.
+    """
+
+    def test_sync_replicas(self):
+        """Test the replica file holds the primary's tables and rows."""
+        User.objects.create_user('user@example.com', 'Testpassword!')
+        with tempfile.NamedTemporaryFile(suffix='.sqlite3') as replica:
+            settings_dict = {
+                **connections['default'].settings_dict, 'NAME': replica.name}
+            connections.settings['replica1'] = settings_dict
+            try:
+                with override_settings(DATABASE_REPLICAS=['replica1']):
+                    call_command('sync_replicas', stdout=StringIO())
+            finally:
+                del connections.settings['replica1']
+
+            copy = sqlite3.connect(replica.name)
+            try:
+                emails = copy.execute('SELECT email FROM user_user').fetchall()
+            finally:
+                copy.close()
+
+        self.assertEqual(emails, [('user@example.com',)])
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica1'], READ_YOUR_WRITES_SECONDS=0)
+class ReplicaLagTests(TransactionTestCase):
+    """
+    Test cached pages are not built from a replica behind the primary.
+
+    The replica is a real SQLite file, synced once and then left behind
+    while the primary moves on.
+    """
+
+    def setUp(self):
+        cache.clear()
+        caches['responses'].clear()
+        user_cache.clear()
+        user_movie_pages.clear()
+        self.addCleanup(titles.index.clear)
+
+        replica = tempfile.NamedTemporaryFile(suffix='.sqlite3')
+        self.addCleanup(replica.close)
+        connections.settings['replica1'] = {
+            **connections['default'].settings_dict, 'NAME': replica.name}
+        self.addCleanup(connections.settings.pop, 'replica1')
+        self.addCleanup(connections.__delitem__, 'replica1')
+        self.addCleanup(connections['replica1'].close)
+
+        self.user = User.objects.create_user(
+            'user@example.com', 'Testpassword!')
+        Movie.objects.create(
+            user=self.user, title='Jaws', score=8, is_private=False)
+        call_command('sync_replicas', stdout=StringIO())
+
+        self.client = APIClient()
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def add_movie(self, title):
+        res = self.client.post('/api/movie', {
+            'title': title, 'score': 7.5, 'description': '', 'review': '',
+            'is_private': False,
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Movie.objects.using('replica1').count(), 1)
+
+    def titles(self, url, **params):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [movie['title'] for movie in res.json()['items']]
+
+    def test_user_pages_from_primary(self):
+        """Test a user's cached page holds rows the replica lacks."""
+        url = '/api/list_user_movies'
+        self.assertEqual(self.titles(url, is_private=False), ['Jaws'])
+
+        self.add_movie('Alien')
+
+        self.assertEqual(
+            self.titles(url, is_private=False), ['Jaws', 'Alien'])
+        self.assertEqual(
+            self.titles(url, is_private=False), ['Jaws', 'Alien'])
+
+    def test_public_pages_from_primary(self):
+        """Test a cached public listing holds rows the replica lacks."""
+        url = '/api/list_all_movies'
+        self.assertEqual(self.titles(url), ['Jaws'])
+
+        self.add_movie('Alien')
+        self.client.credentials()
+
+        self.assertEqual(self.titles(url), ['Jaws', 'Alien'])
+        self.assertEqual(self.titles(url), ['Jaws', 'Alien'])
@@ -0,0 +1,150 @@
+"""
+Tests for request instrumentation and the metrics endpoint.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.test import (
+    AsyncClient, RequestFactory, TestCase, override_settings,
+)
+
+from flixapp import metrics
+from flixapp.metrics import Histogram, MetricsMiddleware, timed
+from flixapp.page_cache import user_movie_pages
+from flixapp.urls import AccessToken
+from movies.models import Movie
+from user.cache import user_cache
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+USER_MOVIES_URL = '/api/list_user_movies'
+METRICS_URL = '/api/metrics'
+
+
+def phases(response) -> dict:
+    """Server-Timing entries by name."""
+    entries = {}
+    for entry in response['Server-Timing'].split(', '):
+        name, _, value = entry.partition(';')
+        entries[name] = value
+    return entries
+
+
+class MetricsTests(TestCase):
+    """Test timings are reported per request and aggregated."""
+
+    def setUp(self):
+        cache.clear()
+        caches['responses'].clear()
+        user_cache.clear()
+        user_movie_pages.clear()
+        metrics.reset()
+        self.client = APIClient()
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'Testpassword!')
+        Movie.objects.create(
+            user=user, title='Avatar', score=8.3,
+            description='Sample description', review='Sample review',
+            is_private=False,
+        )
+        token = AccessToken.create(user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_server_timing(self):
+        """Test each phase of an authenticated request is reported."""
+        res = self.client.get(USER_MOVIES_URL, {'is_private': False})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        entries = phases(res)
+        for phase in ('jwt', 'user', 'view', 'validation', 'render', 'db',
+                      'total'):
+            self.assertIn(phase, entries)
+        # User lookup, page version, count and page
+        self.assertEqual(entries['queries'], 'desc="4"')
+
+    def test_metrics_endpoint(self):
+        """Test histograms are exposed in the Prometheus text format."""
+        self.client.get(USER_MOVIES_URL, {'is_private': False})
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        labels = 'route="api/list_user_movies",method="GET"'
+        self.assertIn(
+            f'flixfix_request_duration_seconds_count{{{labels},status="200"}}'
+            ' 1', body)
+        self.assertIn(f'flixfix_db_queries_sum{{{labels}}} 4', body)
+        self.assertIn(
+            f'flixfix_request_phase_seconds_count{{{labels},phase="jwt"}} 1',
+            body)
+
+    def test_cached_response_keeps_route(self):
+        """Test responses served by a middleware are labelled by route."""
+        self.client.get('/api/list_all_movies')
+        self.client.get('/api/list_all_movies')
+
+        body = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn(
+            'flixfix_request_duration_seconds_count{route="api/list_all_'
+            'movies",method="GET",status="200"} 2', body)
+
+    @override_settings(ROOT_URLCONF='flixapp.async_urls')
+    async def test_async_route(self):
+        """Test queries run in sync_to_async are counted too."""
+        res = await AsyncClient().get(
+            USER_MOVIES_URL, {'is_private': False},
+            AUTHORIZATION=self.client._credentials['HTTP_AUTHORIZATION'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        entries = phases(res)
+        self.assertIn('user', entries)
+        # User lookup, page version, count and page
+        self.assertEqual(entries['queries'], 'desc="4"')
+
+    def test_render_inside_view(self):
+        """Test rendering inside the view is not taken out twice."""
+        def operation(request):
+            with timed('operation'):
+                time.sleep(0.02)
+                with timed('view'), timed('render'):
+                    time.sleep(0.03)
+            return HttpResponse()
+
+        res = MetricsMiddleware(operation)(RequestFactory().get('/api/x'))
+
+        validation = float(phases(res)['validation'].split('=')[1])
+        self.assertGreaterEqual(validation, 15)
+
+    @override_settings(METRICS_SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        """Test the header can be turned off."""
+        res = self.client.get(USER_MOVIES_URL, {'is_private': False})
+
+        self.assertNotIn('Server-Timing', res)
+
+
+class HistogramTests(TestCase):
+    """Test the histogram exposition."""
+
+    def test_cumulative_buckets(self):
+        """Test bucket counts are cumulative and end with +Inf."""
+        histogram = Histogram('latency', 'Latency', ('route',), (0.1, 1))
+        for value in (0.05, 0.5, 0.7, 3):
+            histogram.observe(value, 'a')
+
+        lines = histogram.expose()
+
+        self.assertEqual(lines[2:], [
+            'latency_bucket{route="a",le="0.1"} 1',
+            'latency_bucket{route="a",le="1"} 3',
+            'latency_bucket{route="a",le="+Inf"} 4',
+            'latency_sum{route="a"} 4.25',
+            'latency_count{route="a"} 4',
+        ])
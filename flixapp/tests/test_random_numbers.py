@@ -0,0 +1,212 @@
+"""
+Tests for the random number client.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+import json
+import time
+
+from django.test import AsyncClient, SimpleTestCase, override_settings
+
+from flixapp.random_numbers import (
+    CircuitBreaker, RandomNumberClient, number_client,
+)
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+NUMBER_URL = '/api/number/'
+
+
+class StandInUpstream:
+    """Local HTTP server playing randomnumberapi.com."""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.delay = 0.0
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                upstream.calls += 1
+                time.sleep(upstream.delay)
+                query = parse_qs(urlparse(self.path).query)
+                count = int(query.get('count', ['1'])[0])
+                if upstream.fail:
+                    status, body = 500, b'oops'
+                else:
+                    status, body = 200, json.dumps([7] * count).encode()
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                # Clients that timed out have hung up (BrokenPipeError)
+                pass
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/'
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RandomNumberClientTests(SimpleTestCase):
+    """Test buffering, timeouts and the circuit breaker."""
+
+    def setUp(self):
+        self.upstream = StandInUpstream()
+        self.addCleanup(self.upstream.close)
+
+    def make_client(self, **params):
+        defaults = {
+            'url': self.upstream.url,
+            'timeout': (0.5, 0.2),
+            'buffer_size': 10,
+            'refill_at': 3,
+            'breaker': CircuitBreaker(failures=2, reset_after=60),
+            'background': False,
+        }
+        defaults.update(params)
+        return RandomNumberClient(**defaults)
+
+    def test_buffer_serves_without_upstream_calls(self):
+        """Test one refill serves many numbers locally."""
+        client = self.make_client()
+        client.refill()
+
+        numbers = [client.get_number() for _ in range(10)]
+
+        self.assertEqual(numbers, [7] * 10)
+        self.assertEqual(self.upstream.calls, 1)
+
+    def test_background_refill(self):
+        """Test taking from a low buffer wakes the refill thread."""
+        client = self.make_client(background=True)
+
+        self.assertEqual(client.get_number(), 7)
+        deadline = time.monotonic() + 2
+        while len(client.buffer) < 10 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(len(client.buffer), 10)
+
+    def test_breaker_opens_and_falls_back(self):
+        """Test failures trip the breaker and stop upstream calls."""
+        self.upstream.fail = True
+        client = self.make_client()
+
+        numbers = [client.get_number() for _ in range(5)]
+
+        self.assertTrue(all(0 <= n <= 100 for n in numbers))
+        self.assertEqual(self.upstream.calls, 2)
+        self.assertEqual(client.stats()['circuit'], 'open')
+        self.assertEqual(client.stats()['fallbacks'], 5)
+
+    def test_slow_upstream_times_out(self):
+        """Test a slow upstream is abandoned after the read timeout."""
+        self.upstream.delay = 1
+        client = self.make_client()
+
+        start = time.monotonic()
+        client.get_number()
+
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertEqual(client.fallbacks, 1)
+
+    def test_breaker_half_open_recovers(self):
+        """Test a successful trial call closes the breaker."""
+        breaker = CircuitBreaker(failures=1, reset_after=0)
+        client = self.make_client(breaker=breaker)
+        self.upstream.fail = True
+        client.get_number()
+        self.assertEqual(breaker.state, 'open')
+
+        self.upstream.fail = False
+
+        self.assertEqual(client.get_number(), 7)
+        self.assertEqual(breaker.state, 'closed')
+
+
+class RandomNumberRouteTests(SimpleTestCase):
+    """Test GET /number/ through the shared client, sync and async."""
+
+    def setUp(self):
+        self.upstream = StandInUpstream()
+        self.addCleanup(self.upstream.close)
+        # Nothing here may reach the real randomnumberapi.com
+        client = RandomNumberClient(
+            url=self.upstream.url,
+            timeout=(0.5, 0.2),
+            buffer_size=10,
+            refill_at=0,
+            breaker=CircuitBreaker(failures=2, reset_after=60),
+            background=False,
+        )
+        patcher = mock.patch.multiple(number_client, **{
+            name: getattr(client, name)
+            for name in ('url', 'timeout', 'buffer', 'refill_at',
+                         'breaker', 'background', 'session')
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def number(self, res):
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.json()['number']
+
+    def test_empty_buffer_fetches_one(self):
+        """Test the sync route fetches a single number inline."""
+        self.assertEqual(self.number(APIClient().get(NUMBER_URL)), '[7]')
+        self.assertEqual(self.upstream.calls, 1)
+        self.assertEqual(len(number_client.buffer), 0)
+
+    def test_buffered_number(self):
+        """Test a prefetched number is served without an upstream call."""
+        number_client.buffer.append(42)
+
+        self.assertEqual(self.number(APIClient().get(NUMBER_URL)), '[42]')
+        self.assertEqual(self.upstream.calls, 0)
+
+    def test_upstream_down(self):
+        """Test a local number is served while the upstream fails."""
+        self.upstream.fail = True
+
+        number = json.loads(self.number(APIClient().get(NUMBER_URL)))[0]
+
+        self.assertTrue(0 <= number <= 100)
+        self.assertEqual(self.upstream.calls, 1)
+
+    @override_settings(ROOT_URLCONF='flixapp.async_urls')
+    async def test_async_buffered_number(self):
+        """Test the async route takes a buffered number directly."""
+        number_client.buffer.append(42)
+
+        self.assertEqual(
+            self.number(await AsyncClient().get(NUMBER_URL)), '[42]')
+        self.assertEqual(self.upstream.calls, 0)
+
+    @override_settings(ROOT_URLCONF='flixapp.async_urls')
+    async def test_async_empty_buffer_fetches_in_thread(self):
+        """Test the async route falls back to a fetch off the loop."""
+        with mock.patch.object(
+            number_client, 'get_number', wraps=number_client.get_number,
+        ) as get_number:
+            res = await AsyncClient().get(NUMBER_URL)
+
+        self.assertEqual(self.number(res), '[7]')
+        get_number.assert_called_once_with()
+        self.assertEqual(self.upstream.calls, 1)
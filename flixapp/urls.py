@@ -1,19 +1,41 @@
 from django.contrib import admin
 from django.urls import path
-from ninja import NinjaAPI, Schema
+from ninja import NinjaAPI, Query, Schema
 from ninja.security import HttpBearer
 from pydantic import SecretStr
-from django.contrib.auth.hashers import check_password
-from user.models import User
-from movies.models import Movie
+from user.deletion import request_deletion
+from user.models import AccountDeletion, User
+from user.cache import CachedUser, user_cache
+from user.throttle import check as throttle, too_many_requests
+from movies.models import Movie, UserMovieStats
+from movies import leaderboard, stats
+from movies.search import search_movies
+from movies.similar import get_index, similar_movies
+from movies.bulk import import_movies, iter_json_array, iter_ndjson
+from movies.export import export_response
+from movies.patch import patch_movie
+from jobs.models import Job
+from jobs.registry import enqueue
 from datetime import timedelta, datetime
 from jwt import encode, PyJWTError, decode
 from django.shortcuts import get_object_or_404
 from django.conf import settings
-from ninja.pagination import paginate
-from typing import List
+from flixapp.fieldsets import fieldset, render
+from flixapp.page_cache import cache_pages, user_movie_pages
+from flixapp.pagination import CursorPagination, paginate
+from flixapp.random_numbers import number_client
+from flixapp import metrics
+from flixapp.metrics import timed
+from flixapp.renderers import FastJSONRenderer
+from typing import Any, Dict, List, Literal, Optional
+from django.db import transaction
+from django.db.models import Q
 from django.db.utils import IntegrityError
-import requests
+from django.http import FileResponse, Http404, HttpResponse
+from uuid import uuid4
+import hmac
+import json
+import os
 
 
 class TokenPayload(Schema):
@@ -21,23 +43,37 @@ class TokenPayload(Schema):
 
 
 class AuthBearer(HttpBearer):
-    def authenticate(self, request, token: str) -> User:
+    def authenticate(self, request, token: str) -> CachedUser:
         user = self.get_current_user(token)
         if user:
             return user
 
     @staticmethod
-    def get_current_user(token: str) -> User | None:
+    def get_current_user(token: str) -> CachedUser | None:
         """Check auth user"""
         try:
-            payload = decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=['HS256'])
+            with timed('jwt'):
+                payload = decode(
+                    token,
+                    settings.SECRET_KEY,
+                    algorithms=['HS256'])
 
         except PyJWTError:
             return None
-        user = get_object_or_404(User, email=payload['sub'])
+        if payload.get('type', 'access') != 'access':
+            return None
+
+        with timed('user'):
+            user = user_cache.get(payload['sub'])
+            if user is None:
+                # Users being deleted are inactive: treat them as gone
+                row = get_object_or_404(
+                    User.objects.only('id', 'email', 'is_active'),
+                    email=payload['sub'],
+                    is_active=True,
+                )
+                user = CachedUser(row.id, row.email, row.is_active)
+                user_cache.set(payload['sub'], user)
         return user
 
 
@@ -45,6 +81,7 @@ api = NinjaAPI(
     auth=AuthBearer(),
     title='FlixFix',
     version="0.1.0",
+    renderer=FastJSONRenderer(),
 )
 
 # Django Ninja schemas ------------------------------------------------------
@@ -55,16 +92,46 @@ class UserSchema(Schema):
     password: str
 
 
+class UserPatchSchema(Schema):
+    email: Optional[str]
+    password: Optional[str]
+
+
 class getUserSchema(Schema):
     id: int
     email: str
 
 
+class DeletionSchema(Schema):
+    user_id: int
+    state: str
+    movies_deleted: int
+    error: str
+    requested_at: datetime
+    finished_at: datetime = None
+
+
+class JobSchema(Schema):
+    id: int
+    name: str
+    state: str
+    attempts: int
+    max_attempts: int
+    result: Any = None
+    error: str
+    created_at: datetime
+    finished_at: datetime = None
+
+
 class LoginSchema(Schema):
     email: str
     password: SecretStr
 
 
+class RefreshSchema(Schema):
+    refresh_token: str
+
+
 class MovieSchema(Schema):
     title: str
     score: float
@@ -73,6 +140,14 @@ class MovieSchema(Schema):
     is_private: bool
 
 
+class MoviePatchSchema(Schema):
+    title: Optional[str]
+    score: Optional[float]
+    description: Optional[str]
+    review: Optional[str]
+    is_private: Optional[bool]
+
+
 class getMovieSchema(Schema):
     id: int
     title: str
@@ -82,21 +157,61 @@ class getMovieSchema(Schema):
     is_private: bool
 
 
+class UserStatsSchema(Schema):
+    user_id: int
+    movie_count: int
+    public_count: int
+    private_count: int
+    average_score: float = None
+    histogram: Dict[str, int]
+
+
 # Django Ninja AccessToken --------------------------------------------------
 
 class AccessToken:
     @staticmethod
     def create(user: User) -> dict:
         email = user.email
-        access_token_expires = timedelta(minutes=999999)
+        access_token_expires = settings.ACCESS_TOKEN_LIFETIME
         token = AccessToken.create_token(
-            data={"sub": email},
+            data={"sub": email, "type": "access"},
             expires_delta=access_token_expires,
         )
-        user.save()
+        refresh_token = AccessToken.create_token(
+            data={"sub": email, "type": "refresh"},
+            expires_delta=settings.REFRESH_TOKEN_LIFETIME,
+        )
         return {
             "email": email,
             "access_token": token,
+            "refresh_token": refresh_token,
+            "token_type": "bearer",
+            "expires_in": int(access_token_expires.total_seconds()),
+        }
+
+    @staticmethod
+    def refresh(refresh_token: str) -> dict | None:
+        """New access token for a valid refresh token, no DB involved"""
+        try:
+            payload = decode(
+                refresh_token,
+                settings.SECRET_KEY,
+                algorithms=['HS256'])
+
+        except PyJWTError:
+            return None
+        if payload.get('type') != 'refresh':
+            return None
+
+        access_token_expires = settings.ACCESS_TOKEN_LIFETIME
+        return {
+            "email": payload['sub'],
+            "access_token": AccessToken.create_token(
+                data={"sub": payload['sub'], "type": "access"},
+                expires_delta=access_token_expires,
+            ),
+            "token_type": "bearer",
+            "expires_in": int(access_token_expires.total_seconds()),
         }
 
     @staticmethod
@@ -129,6 +244,9 @@ def create_user_api(request, payload: UserSchema):
             - Should include one of these special characters: ! @ # ? ]
 
     """
+    wait = throttle(request, 'create-user', payload.email)
+    if wait:
+        return too_many_requests(api, request, wait)
     try:
         user = User.objects.create_user(
             payload.email,
@@ -152,8 +270,12 @@ def create_user_api(request, payload: UserSchema):
 @api.post('/login', auth=None)
 def user_login(request, payload: LoginSchema):
     """Login using email and password"""
+    wait = throttle(request, 'login', payload.email)
+    if wait:
+        return too_many_requests(api, request, wait)
     try:
-        user = User.objects.get(email=payload.email)
+        user = User.objects.only('id', 'email', 'password').get(
+            email=payload.email, is_active=True)
 
     except Exception:
         return api.create_response(
@@ -161,13 +283,27 @@ def user_login(request, payload: LoginSchema):
             {"error": "User not found"},
             status=404)
 
-    if check_password(payload.password.get_secret_value(), user.password):
+    # Only writes if the stored hash needs upgrading
+    if user.check_password(payload.password.get_secret_value()):
         return AccessToken.create(user)
 
 
+# Refresh access token
+@api.post('/token/refresh', auth=None)
+def refresh_token(request, payload: RefreshSchema):
+    """Trade a refresh token from /login for a new access token"""
+    token = AccessToken.refresh(payload.refresh_token)
+    if token is None:
+        return api.create_response(
+            request,
+            {"error": "Invalid refresh token"},
+            status=401)
+    return token
+
+
 # List all users
 @api.get('/users', response=List[getUserSchema], auth=None)
-@paginate
+@paginate(CursorPagination, count='cached', schema=getUserSchema)
 def get_users(request):
     """Lists all users"""
     all_users = User.objects.all()
@@ -189,11 +325,13 @@ def update_user(request, user_id: int, payload: UserSchema):
     user = get_object_or_404(User, id=user_id)
 
     if (request.auth.id == user_id):
+        old_email = user.email
         for attr, value in payload.dict().items():
             setattr(user, attr, value)
             if payload.password:
                 user.set_password(payload.password)
         user.save()
+        user_cache.invalidate(old_email, user.email)
         return api.create_response(
                 request,
                 {"message": "Updated successfully"},
@@ -205,16 +343,85 @@ def update_user(request, user_id: int, payload: UserSchema):
             {"error": "Unauthorized"},
             status=401)
 
+
+# Partially update User
+@api.patch('/users/{user_id}')
+def partial_update_user(request, user_id: int, payload: UserPatchSchema):
+    """Change your email and/or password; omitted fields are kept"""
+    try:
+        changes = User.objects.prepare_changes(
+            **payload.dict(exclude_unset=True, exclude_none=True))
+    except ValueError as e:
+        return api.create_response(request, {"error": str(e)}, status=400)
+
+    # Only the token's own user matches
+    users = User.objects.filter(id=user_id, email=request.auth.email)
+    try:
+        found = users.update(**changes) if changes else users.exists()
+    except IntegrityError:
+        return api.create_response(
+            request,
+            {"error": "Email already exists"},
+            status=409)
+
+    if not found:
+        return api.create_response(
+            request,
+            {"error": "Unauthorized"},
+            status=401)
+    if 'email' in changes:
+        user_cache.invalidate(request.auth.email, changes['email'])
+    return api.create_response(
+            request,
+            {"message": "Updated successfully"},
+            status=204)
+
+
 # Delete user
 @api.delete('/users/{user_id}', auth=None)
-def delete_user(request, user_id: int):
-    """Delete a user by id"""
-    user = get_object_or_404(User, id=user_id)
-    user.delete()
+def delete_user(request, user_id: int, deactivate: bool = True):
+    """
+        Delete a user by id.
+
+        The user's movies are removed in the background; follow the
+        returned status URL. With `deactivate` (the default) the user
+        can no longer log in from the moment the deletion is accepted.
+    """
+    user = get_object_or_404(User.objects.only('id', 'email'), id=user_id)
+    deletion = request_deletion(user, deactivate)
     return api.create_response(
             request,
-            {"message": "Deleted successfully"},
-            status=204)
+            {
+                "state": deletion.state,
+                "status": f"/api/users/{user_id}/deletion",
+                "job": deletion.job_id,
+            },
+            status=202)
+
+
+# User deletion status
+@api.get(
+    '/users/{user_id}/deletion', response=DeletionSchema, auth=None)
+def get_user_deletion(request, user_id: int):
+    """Progress of a user deletion"""
+    return get_object_or_404(AccountDeletion, user_id=user_id)
+
+
+# Auth cache counters
+@api.get('/auth/cache')
+def auth_cache_stats(request):
+    """Hit and miss counters of the authenticated user cache"""
+    return user_cache.stats()
+
+
+# User movie statistics
+@api.get('/users/{user_id}/stats', response=UserStatsSchema, auth=None)
+def get_user_stats(request, user_id: int):
+    """Movie count, public/private split and score histogram of a user"""
+    user_stats = UserMovieStats.objects.filter(user_id=user_id).first()
+    if user_stats is None:
+        get_object_or_404(User, id=user_id)
+    return stats.stats_payload(user_stats, user_id)
 
 
 # Movie routes --------------------------------------------------------------
@@ -224,23 +431,72 @@ def delete_user(request, user_id: int):
 def create_movie(request, payload: MovieSchema):
     """Add a new movie"""
     movie_form = {
-        'user': request.auth,
+        'user_id': request.auth.id,
         'title': payload.title,
         'score': payload.score,
         'description': payload.description,
         'review': payload.review,
         'is_private': payload.is_private,
     }
-    movie = Movie.objects.create(**movie_form)
+    with transaction.atomic():
+        movie = Movie.objects.create(**movie_form)
+        stats.record_created(movie.user_id, movie.score, movie.is_private)
     return api.create_response(
             request,
             {"title": movie.title},
             status=201)
 
 
+# Bulk import Movie posts
+@api.post('/movies/bulk')
+def bulk_create_movies(
+    request,
+    batch_size: int = Query(
+        None, ge=1, le=settings.BULK_IMPORT_MAX_BATCH_SIZE),
+):
+    """
+        Add many movies at once.
+
+        Send either NDJSON (one MovieSchema object per line, with
+        Content-Type: application/x-ndjson) or a JSON array of them.
+        The body is validated as it streams in; invalid entries are
+        reported by line and the rest are inserted. A body from which
+        nothing could be inserted is answered with 400.
+    """
+    if request.content_type == 'application/x-ndjson':
+        records = iter_ndjson(
+            request, max_item_size=settings.BULK_IMPORT_MAX_ITEM_SIZE)
+    else:
+        records = iter_json_array(
+            request, max_item_size=settings.BULK_IMPORT_MAX_ITEM_SIZE)
+
+    result = import_movies(
+        request.auth.id,
+        records,
+        MovieSchema,
+        min(batch_size or settings.BULK_IMPORT_BATCH_SIZE,
+            settings.BULK_IMPORT_MAX_BATCH_SIZE),
+    )
+    if result["errors"] and not result["inserted"]:
+        return api.create_response(request, result, status=400)
+    return api.create_response(request, result, status=201)
+
+
+# Export Movie posts
+@api.get('/movies/export')
+def export_movies(request, format: Literal['ndjson', 'csv'] = 'ndjson'):
+    """
+        Download all of your movies as NDJSON or CSV.
+
+        Rows are streamed, gzip compressed if the client accepts it.
+    """
+    return export_response(
+        request, request.auth.id, format, settings.EXPORT_CHUNK_SIZE)
+
+
 # List public Movie posts
 @api.get('/list_all_movies', response=List[getMovieSchema], auth=None)
-@paginate
+@paginate(CursorPagination, count='cached', schema=getMovieSchema)
 def get_public_movies(request):
     """List all public movie posts"""
     public_movies = Movie.objects.filter(is_private=False)
@@ -249,26 +505,95 @@ def get_public_movies(request):
 
 # List User Movie posts
 @api.get('/list_user_movies', response=List[getMovieSchema])
-@paginate
+@cache_pages(user_movie_pages)
+@paginate(CursorPagination, schema=getMovieSchema)
 def get_user_movies(request, is_private: bool):
     """List all private or public movies created by user"""
+    user_id = request.auth.id
     if is_private is True:
-        movies = Movie.objects.filter(user=request.auth, is_private=True)
+        movies = Movie.objects.filter(user_id=user_id, is_private=True)
     else:
-        movies = Movie.objects.filter(user=request.auth, is_private=False)
+        movies = Movie.objects.filter(user_id=user_id, is_private=False)
 
     return movies
 
 
+# Top rated public Movie posts
+@api.get('/movies/top', response=List[getMovieSchema], auth=None)
+def top_movies(
+    request,
+    n: int = Query(10, ge=1, le=settings.LEADERBOARD_SIZE),
+    fields: str = None,
+):
+    """The `n` highest scored public movies"""
+    schema = fieldset(getMovieSchema, fields)
+    return render(schema, leaderboard.top(n, tuple(schema.__fields__)))
+
+
+# Search Movie posts
+@api.get('/movies/search', response=List[getMovieSchema])
+@paginate(
+    CursorPagination,
+    ordering=('rank', 'id'),
+    count='none',
+    schema=getMovieSchema,
+)
+def search_user_movies(request, q: str):
+    """Full-text search over public movies and your own private ones"""
+    return search_movies(q, request.auth.id)
+
+
+# Similar Movie posts
+@api.get('/movie/{movie_id}/similar', response=List[getMovieSchema])
+def get_similar_movies(
+    request,
+    movie_id: int,
+    n: int = Query(10, ge=1, le=50),
+    fields: str = None,
+):
+    """Public movies whose text is closest to a public or own movie"""
+    movie = get_object_or_404(
+        Movie.objects.filter(Q(is_private=False) | Q(user_id=request.auth.id)),
+        id=movie_id,
+    )
+    index = get_index()
+    if index is None:
+        return api.create_response(
+            request,
+            {"error": "Similar movies index not built"},
+            status=503)
+    schema = fieldset(getMovieSchema, fields)
+    return render(
+        schema, similar_movies(movie, n, index, tuple(schema.__fields__)))
+
+
+# Get a Movie
+@api.get('/movie/{movie_id}', response=getMovieSchema)
+def get_movie(request, movie_id: int, fields: str = None):
+    """A public movie or one of your own, with only `fields` if given"""
+    schema = fieldset(getMovieSchema, fields)
+    movie = get_object_or_404(
+        Movie.objects.filter(
+            Q(is_private=False) | Q(user_id=request.auth.id),
+        ).only(*schema.__fields__),
+        id=movie_id,
+    )
+    return render(schema, movie)
+
+
 # Update a Movie
 @api.put('/movie/{movie_id}')
 def update_movie(request, movie_id: int, payload: MovieSchema):
     """Update a movie using id"""
     try:
-        movie = Movie.objects.get(id=movie_id, user=request.auth)
+        movie = Movie.objects.get(id=movie_id, user_id=request.auth.id)
+        old = (movie.score, movie.is_private)
         for attr, value in payload.dict().items():
             setattr(movie, attr, value)
-        movie.save()
+        with transaction.atomic():
+            movie.save()
+            stats.record_updated(
+                movie.user_id, old, (movie.score, movie.is_private))
         return api.create_response(
             request,
             {"message": "Updated successfully"},
@@ -281,13 +606,35 @@ def update_movie(request, movie_id: int, payload: MovieSchema):
             status=401)
 
 
+# Partially update a Movie
+@api.patch('/movie/{movie_id}')
+def partial_update_movie(request, movie_id: int, payload: MoviePatchSchema):
+    """Change only the given fields of a movie"""
+    changes = payload.dict(exclude_unset=True, exclude_none=True)
+    with transaction.atomic():
+        found = patch_movie(request.auth.id, movie_id, changes)
+
+    if not found:
+        return api.create_response(
+            request,
+            {"error": "Unauthorized"},
+            status=401)
+    return api.create_response(
+        request,
+        {"message": "Updated successfully"},
+        status=204)
+
+
 # Delete a Movie
 @api.delete('/movie/{movie_id}')
 def delete_movie(request, movie_id: int):
     """Delete a movie using id"""
     try:
-        movie = Movie.objects.get(id=movie_id, user=request.auth)
-        movie.delete()
+        movie = Movie.objects.get(id=movie_id, user_id=request.auth.id)
+        with transaction.atomic():
+            movie.delete()
+            stats.record_deleted(
+                movie.user_id, movie.score, movie.is_private)
         return api.create_response(
             request,
             {"message": "Deleted successfully"},
@@ -305,9 +652,123 @@ def delete_movie(request, movie_id: int):
 @api.get('/number/', auth=None)
 def random_number(request):
     """Gets random number from public API"""
-    url = 'http://www.randomnumberapi.com/api/v1.0/randomnumber'
-    r = requests.get(url)
-    return {'number': r.text}
+    # Same text the upstream answers with, e.g. "[42]"
+    return {'number': json.dumps([number_client.get_number()])}
+
+
+# Background jobs ----------------------------------------------------------
+
+def job_accepted(request, job: Job):
+    return api.create_response(
+        request,
+        {"job": job.id, "status": f"/api/jobs/{job.id}"},
+        status=202)
+
+
+def is_operator(request) -> bool:
+    """Superusers, or requests with the X-Jobs-Token of JOBS_ADMIN_TOKEN"""
+    token = settings.JOBS_ADMIN_TOKEN
+    given = request.headers.get('X-Jobs-Token', '')
+    if token and hmac.compare_digest(given.encode(), token.encode()):
+        return True
+    return User.objects.filter(id=request.auth.id, is_superuser=True).exists()
+
+
+def operator_job(request, name: str):
+    """Enqueue a whole-table job, once, for operators only"""
+    if not is_operator(request):
+        return api.create_response(
+            request, {"error": "Forbidden"}, status=403)
+    return job_accepted(request, enqueue(name, unique=True))
+
+
+def get_own_job(request, job_id: int) -> Job:
+    job = get_object_or_404(Job, id=job_id)
+    if job.user_id not in (None, request.auth.id):
+        raise Http404
+    return job
+
+
+# Export Movie posts in the background
+@api.post('/movies/export/jobs')
+def export_movies_job(
+    request, format: Literal['ndjson', 'csv'] = 'ndjson',
+):
+    """
+        Export all of your movies to a gzipped file in the background.
+
+        Poll the returned job; once done, download the file from
+        /jobs/{job_id}/file.
+    """
+    job = enqueue(
+        'movies.export',
+        {
+            'user_id': request.auth.id,
+            'format': format,
+            'filename': f'{uuid4().hex}.{format}.gz',
+        },
+        user_id=request.auth.id,
+    )
+    return job_accepted(request, job)
+
+
+# Rebuild the search index
+@api.post('/movies/search/rebuild')
+def rebuild_search_index_job(request):
+    """Rebuild the full-text search index in the background"""
+    return operator_job(request, 'movies.rebuild_search_index')
+
+
+# Rebuild the similar movies index
+@api.post('/movies/similar/rebuild')
+def rebuild_similar_index_job(request):
+    """Rebuild the similar movies index in the background"""
+    return operator_job(request, 'movies.rebuild_similar_index')
+
+
+# Reconcile movie stats
+@api.post('/users/stats/reconcile')
+def reconcile_stats_job(request):
+    """Recompute every user's movie statistics in the background"""
+    return operator_job(request, 'movies.reconcile_stats')
+
+
+# Job status
+@api.get('/jobs/{job_id}', response=JobSchema)
+def get_job(request, job_id: int):
+    """State, attempts and result of a background job"""
+    return get_own_job(request, job_id)
+
+
+# Job output file
+@api.get('/jobs/{job_id}/file')
+def get_job_file(request, job_id: int):
+    """Download the file a finished export job wrote"""
+    job = get_own_job(request, job_id)
+    if job.state != Job.DONE or not (job.result or {}).get('file'):
+        raise Http404
+    path = os.path.join(settings.JOB_FILES_DIR, job.result['file'])
+    if not os.path.exists(path):
+        raise Http404
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=job.result['file'],
+        content_type='application/gzip',
+    )
+
+
+# Metrics ------------------------------------------------------------------
+
+@api.get('/metrics', auth=None, include_in_schema=False)
+def get_metrics(request):
+    """Request timing histograms in the Prometheus text format"""
+    return HttpResponse(
+        metrics.expose(),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+metrics.instrument(api)
 
 
 # Django routes ------------------------------------------------------------
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.JOBS_WORKERS,
+            help='Jobs run at the same time',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help='Seconds between checks of an empty queue',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no job is due',
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(options['workers'], options['poll_interval'])
+        self.stdout.write(
+            f'Worker {worker.name} running {options["workers"]} jobs at a '
+            'time')
+        worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
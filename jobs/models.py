@@ -0,0 +1,32 @@
+from django.db import models
+
+
+class Job(models.Model):
+    """A unit of background work, claimed and run by `manage.py runworker`"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATES = [(s, s) for s in (QUEUED, RUNNING, DONE, FAILED)]
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict)
+    user_id = models.PositiveBigIntegerField(null=True)
+    state = models.CharField(max_length=10, choices=STATES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True)
+    result = models.JSONField(null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'run_at'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name}#{self.id}: {self.state}'
@@ -0,0 +1,74 @@
+"""
+Task registry and enqueueing.
+
+    @task('movies.rebuild_search_index')
+    def rebuild(): ...
+
+    job = enqueue('movies.rebuild_search_index')
+
+Tasks live in each app's tasks.py and take JSON-serializable keyword
+arguments; their return value is stored on the job. The job row is
+written in the caller's transaction, so workers only see it once that
+commits. With JOBS_EAGER the job runs in-process right after commit
+instead, which is what the tests use.
+
+Jobs enqueued with ``unique=True`` (whole-table rebuilds, say) are not
+queued again while one of the same name is queued or running; the
+pending job is returned instead.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job
+
+
+@dataclass(frozen=True)
+class Task:
+    name: str
+    func: Callable
+    max_attempts: int
+
+
+tasks = {}
+
+
+def task(name: str, max_attempts: int = None):
+    def register(func):
+        tasks[name] = Task(
+            name, func, max_attempts or settings.JOBS_MAX_ATTEMPTS)
+        return func
+    return register
+
+
+def enqueue(
+    name: str,
+    kwargs: dict = None,
+    *,
+    user_id: int = None,
+    delay: float = 0,
+    unique: bool = False,
+) -> Job:
+    if name not in tasks:
+        raise KeyError(f'Unknown task {name!r}')
+    if unique:
+        pending = Job.objects.filter(
+            name=name, state__in=(Job.QUEUED, Job.RUNNING),
+        ).order_by('id').first()
+        if pending is not None:
+            return pending
+    job = Job.objects.create(
+        name=name,
+        kwargs=kwargs or {},
+        user_id=user_id,
+        max_attempts=tasks[name].max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if settings.JOBS_EAGER:
+        from .worker import run_job
+        transaction.on_commit(lambda: run_job(job.id))
+    return job
@@ -0,0 +1,236 @@
+"""
+Tests for the background job runner.
+"""
+from datetime import timedelta
+import gzip
+import json
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from flixapp.urls import AccessToken
+from jobs.models import Job
+from jobs.registry import enqueue, task
+from jobs.worker import Worker, claim_next, execute, requeue_expired
+from movies.models import Movie
+from user.cache import user_cache
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+calls = []
+
+
+@task('tests.add')
+def add(a, b):
+    calls.append((a, b))
+    return a + b
+
+
+@task('tests.broken', max_attempts=2)
+def broken():
+    raise RuntimeError('boom')
+
+
+class JobRunnerTests(TestCase):
+    """Test enqueueing, claiming, retries and leases."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_job(self):
+        """Test a claimed job runs and stores its result."""
+        job = enqueue('tests.add', {'a': 1, 'b': 2})
+
+        execute(claim_next('test'))
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, Job.DONE)
+        self.assertEqual(job.result, 3)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(claim_next('test'))
+
+    def test_job_claimed_once(self):
+        """Test a claimed job is not handed to a second worker."""
+        enqueue('tests.add', {'a': 1, 'b': 2})
+
+        self.assertIsNotNone(claim_next('first'))
+        self.assertIsNone(claim_next('second'))
+
+    def test_delayed_job_waits(self):
+        """Test jobs are not claimed before run_at."""
+        enqueue('tests.add', {'a': 1, 'b': 2}, delay=60)
+
+        self.assertIsNone(claim_next('test'))
+
+    @override_settings(JOBS_RETRY_BACKOFF=10)
+    def test_retry_with_backoff(self):
+        """Test a failure is retried later, then marked failed."""
+        job = enqueue('tests.broken')
+        before = timezone.now()
+
+        with self.assertLogs('jobs.worker', 'ERROR'):
+            execute(claim_next('test'))
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, Job.QUEUED)
+        self.assertIn('boom', job.error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=10))
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        with self.assertLogs('jobs.worker', 'ERROR'):
+            execute(claim_next('test'))
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    @override_settings(JOBS_LEASE_SECONDS=60)
+    def test_lost_job_requeued(self):
+        """Test a job whose worker died runs again."""
+        job = enqueue('tests.add', {'a': 1, 'b': 2})
+        claim_next('dead')
+        Job.objects.filter(id=job.id).update(
+            locked_at=timezone.now() - timedelta(seconds=61))
+
+        self.assertEqual(requeue_expired(), 1)
+
+        self.assertEqual(claim_next('alive').id, job.id)
+
+    def test_lost_lease_not_finished(self):
+        """Test a worker that lost its lease leaves the job to the next."""
+        job = enqueue('tests.add', {'a': 1, 'b': 2})
+        stale = claim_next('dead')
+        Job.objects.filter(id=job.id).update(state=Job.QUEUED, locked_by='')
+        claim_next('alive')
+
+        with self.assertLogs('jobs.worker', 'WARNING'):
+            execute(stale)
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, Job.RUNNING)
+        self.assertEqual(job.locked_by, 'alive')
+
+    def test_unique_job(self):
+        """Test a unique job is not queued twice while pending."""
+        first = enqueue('tests.add', {'a': 1, 'b': 2}, unique=True)
+        again = enqueue('tests.add', {'a': 1, 'b': 2}, unique=True)
+        claim_next('test')
+        running = enqueue('tests.add', {'a': 1, 'b': 2}, unique=True)
+
+        self.assertEqual(again.id, first.id)
+        self.assertEqual(running.id, first.id)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_unknown_task(self):
+        """Test only registered tasks can be enqueued."""
+        with self.assertRaises(KeyError):
+            enqueue('tests.missing')
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_runs_after_commit(self):
+        """Test eager jobs run in-process once the transaction commits."""
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue('tests.add', {'a': 2, 'b': 2})
+            self.assertEqual(calls, [])
+
+        job.refresh_from_db()
+        self.assertEqual(job.result, 4)
+
+
+class WorkerTests(TransactionTestCase):
+    """Test the threaded worker drains the queue."""
+
+    def test_burst(self):
+        """Test every due job is run once across worker threads."""
+        calls.clear()
+        for n in range(6):
+            enqueue('tests.add', {'a': n, 'b': 0})
+
+        Worker(concurrency=3, poll_interval=0.01).run(burst=True)
+
+        self.assertEqual(sorted(a for a, _ in calls), list(range(6)))
+        self.assertEqual(Job.objects.filter(state=Job.DONE).count(), 6)
+
+
+@override_settings(JOBS_EAGER=True)
+class JobApiTests(TestCase):
+    """Test routes that enqueue jobs and the job status resource."""
+
+    def setUp(self):
+        user_cache.clear()
+        files = tempfile.TemporaryDirectory()
+        self.addCleanup(files.cleanup)
+        self.settings_override = override_settings(JOB_FILES_DIR=files.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'Testpassword!')
+        Movie.objects.create(user=self.user, title='Jaws', score=8)
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_export_job(self):
+        """Test an export job can be polled and its file downloaded."""
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post('/api/movies/export/jobs')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        res = self.client.get(res.json()['status'])
+        self.assertEqual(res.json()['state'], 'done')
+        self.assertEqual(res.json()['result']['rows'], 1)
+
+        res = self.client.get(f"/api/jobs/{res.json()['id']}/file")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        lines = gzip.decompress(b''.join(res.streaming_content)).splitlines()
+        self.assertEqual(json.loads(lines[0])['title'], 'Jaws')
+
+    def test_other_users_job_hidden(self):
+        """Test a user cannot see another user's job."""
+        job = enqueue('tests.add', {'a': 1, 'b': 1}, user_id=self.user.id + 1)
+
+        res = self.client.get(f'/api/jobs/{job.id}')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rebuild_search_index_job(self):
+        """Test the index rebuild is queued and run."""
+        get_user_model().objects.filter(id=self.user.id).update(
+            is_superuser=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post('/api/movies/search/rebuild')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        job = Job.objects.get(id=res.json()['job'])
+        self.assertEqual(job.state, Job.DONE)
+
+    def test_operator_jobs_forbidden(self):
+        """Test other users cannot start whole-table jobs."""
+        for url in ['/api/movies/search/rebuild',
+                    '/api/movies/similar/rebuild',
+                    '/api/users/stats/reconcile']:
+            res = self.client.post(url)
+            self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_ADMIN_TOKEN='s3cret', JOBS_EAGER=False)
+    def test_operator_token(self):
+        """Test the jobs token starts one job, however often it is sent."""
+        res = self.client.post(
+            '/api/users/stats/reconcile', HTTP_X_JOBS_TOKEN='wrong')
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        first = self.client.post(
+            '/api/users/stats/reconcile', HTTP_X_JOBS_TOKEN='s3cret')
+        again = self.client.post(
+            '/api/users/stats/reconcile', HTTP_X_JOBS_TOKEN='s3cret')
+
+        self.assertEqual(again.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(again.json()['job'], first.json()['job'])
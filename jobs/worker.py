@@ -0,0 +1,186 @@
+"""
+Claiming and running jobs.
+
+SQLite has no SKIP LOCKED, so a job is claimed with a conditional
+UPDATE (`WHERE id = ? AND state = 'queued'`): of several workers racing
+for the same row exactly one updates it. A job left running for longer
+than JOBS_LEASE_SECONDS (its worker died) is queued again. A worker
+renews its lease every third of that while the job runs, and only
+records the outcome while it still holds the lease, so a job that was
+queued again is not also finished by the worker that lost it.
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+from threading import Event, Thread
+import logging
+import os
+import socket
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .registry import tasks
+
+
+logger = logging.getLogger(__name__)
+
+
+def claim(job_id: int, worker: str) -> Job | None:
+    claimed = Job.objects.filter(id=job_id, state=Job.QUEUED).update(
+        state=Job.RUNNING,
+        locked_by=worker,
+        locked_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+    return Job.objects.get(id=job_id) if claimed else None
+
+
+def claim_next(worker: str) -> Job | None:
+    due = Job.objects.filter(
+        state=Job.QUEUED, run_at__lte=timezone.now(),
+    ).order_by('run_at', 'id').values_list('id', flat=True)
+    # Lost races move on to the next due job
+    for job_id in due[:10]:
+        job = claim(job_id, worker)
+        if job is not None:
+            return job
+    return None
+
+
+def leased(job: Job):
+    """The job's row, while `job`'s worker still holds it"""
+    return Job.objects.filter(
+        id=job.id, state=Job.RUNNING, locked_by=job.locked_by)
+
+
+def renew_lease(job: Job, stopped: Event) -> None:
+    interval = settings.JOBS_LEASE_SECONDS / 3
+    try:
+        while not stopped.wait(interval):
+            if not leased(job).update(locked_at=timezone.now()):
+                return
+    finally:
+        connection.close()
+
+
+@contextmanager
+def heartbeat(job: Job):
+    """Keep the job's lease while the block runs"""
+    stopped = Event()
+    thread = Thread(
+        target=renew_lease, args=(job, stopped),
+        name=f'job-heartbeat-{job.id}', daemon=True,
+    )
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def execute(job: Job) -> None:
+    try:
+        task = tasks[job.name]
+        with heartbeat(job):
+            result = task.func(**job.kwargs)
+    except Exception:
+        logger.exception('Job %s failed (attempt %s)', job, job.attempts)
+        fail(job, traceback.format_exc())
+        return
+    finished = leased(job).update(
+        state=Job.DONE,
+        result=result,
+        error='',
+        finished_at=timezone.now(),
+    )
+    if not finished:
+        logger.warning('Job %s finished after its lease was lost', job)
+
+
+def fail(job: Job, error: str) -> None:
+    now = timezone.now()
+    if job.attempts < job.max_attempts:
+        backoff = settings.JOBS_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+        leased(job).update(
+            state=Job.QUEUED,
+            run_at=now + timedelta(seconds=backoff),
+            locked_by='',
+            error=error,
+        )
+    else:
+        leased(job).update(state=Job.FAILED, error=error, finished_at=now)
+
+
+def run_job(job_id: int, worker: str = 'eager') -> None:
+    """Claim and run one job now, if it is still queued"""
+    job = claim(job_id, worker)
+    if job is not None:
+        execute(job)
+
+
+def requeue_expired() -> int:
+    """Queue again the jobs whose worker stopped answering"""
+    now = timezone.now()
+    expired = Job.objects.filter(
+        state=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOBS_LEASE_SECONDS),
+    )
+    failed = expired.filter(attempts__gte=F('max_attempts')).update(
+        state=Job.FAILED, error='Worker lost', finished_at=now)
+    queued = expired.update(state=Job.QUEUED, locked_by='', run_at=now)
+    return failed + queued
+
+
+class Worker:
+    """`concurrency` threads, each claiming and running one job at a time"""
+
+    def __init__(self, concurrency: int, poll_interval: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = Event()
+
+    def run(self, burst: bool = False) -> None:
+        """Work until stopped; with `burst`, until the queue is empty"""
+        requeue_expired()
+        threads = [
+            Thread(
+                target=self._loop, args=(f'{self.name}:{n}', burst),
+                name=f'job-worker-{n}',
+            )
+            for n in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            # Running jobs finish, no new ones are claimed
+            self.stop()
+            for thread in threads:
+                thread.join()
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+    def _loop(self, name: str, burst: bool) -> None:
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                job = claim_next(name)
+                if job is not None:
+                    execute(job)
+                    continue
+                if burst:
+                    return
+                requeue_expired()
+                self.stopping.wait(self.poll_interval)
+        finally:
+            connection.close()
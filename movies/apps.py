@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class MoviesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'movies'
+
+    def ready(self):
+        from django.core import checks
+
+        from flixapp.db_router import check_pin_cache
+        from . import signals  # noqa: F401
+
+        checks.register(check_pin_cache, checks.Tags.caches)
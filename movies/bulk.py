@@ -0,0 +1,182 @@
+from collections import Counter
+from json import JSONDecodeError, JSONDecoder
+from typing import Iterable, Iterator, Tuple
+import codecs
+import json
+
+from django.db import transaction
+from pydantic import BaseModel, ValidationError
+
+from flixapp.page_cache import user_movie_pages
+
+from .models import Movie
+from . import leaderboard, titles
+from .signals import bump_public_movies
+from .stats import apply_delta, contribution
+
+
+CHUNK_SIZE = 64 * 1024
+# Largest item, in characters, a JSON array body may hold
+MAX_ITEM_SIZE = 1024 * 1024
+# Decode errors this close to the end of the buffer may only mean the
+# item continues in the next chunk; "-Infinity" is the longest token
+PARTIAL_TOKEN = len('-Infinity')
+
+
+def iter_ndjson(
+    stream, max_item_size: int = MAX_ITEM_SIZE,
+) -> Iterator[Tuple[int, object]]:
+    """
+    Yield (line number, decoded value) one line at a time. Raises
+    ValueError at a line longer than `max_item_size` bytes.
+    """
+    lines = iter(lambda: stream.readline(max_item_size + 1), b'')
+    for number, line in enumerate(lines, 1):
+        if len(line) > max_item_size:
+            raise ValueError(
+                f'Line {number} is longer than {max_item_size} bytes')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, e
+
+
+def truncated(error: JSONDecodeError) -> bool:
+    """Whether decoding failed only because the document was cut short"""
+    return (error.msg.startswith('Unterminated string')
+            or len(error.doc) - error.pos <= PARTIAL_TOKEN)
+
+
+def iter_json_array(
+    stream,
+    chunk_size: int = CHUNK_SIZE,
+    max_item_size: int = MAX_ITEM_SIZE,
+):
+    """
+    Yield (item number, value) from a top level JSON array, reading the
+    stream in chunks so only one item is held in memory at a time.
+    Raises ValueError at the first item that is invalid, or that is
+    still incomplete after `max_item_size` characters.
+    """
+    decoder = JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    started = expect_value = False
+    number = 0
+
+    def fill():
+        nonlocal buffer
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return False
+        buffer += utf8.decode(chunk)
+        return True
+
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            if not fill():
+                raise ValueError('Unexpected end of JSON array')
+            continue
+
+        if not started:
+            if buffer[0] != '[':
+                raise ValueError('Expected a JSON array')
+            buffer = buffer[1:]
+            started = expect_value = True
+            continue
+
+        if buffer[0] == ']' and (not expect_value or number == 0):
+            return
+
+        if not expect_value:
+            if buffer[0] != ',':
+                raise ValueError(f'Expected "," after item {number}')
+            buffer = buffer[1:]
+            expect_value = True
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except JSONDecodeError as e:
+            if not truncated(e):
+                raise ValueError(f'Item {number + 1}: {e}') from None
+            if len(buffer) > max_item_size:
+                raise ValueError(
+                    f'Item {number + 1} is longer than {max_item_size} '
+                    'characters') from None
+            if fill():
+                continue
+            raise ValueError(f'Item {number + 1}: {e}') from None
+        if end == len(buffer) and fill():
+            # A scalar may have been cut at the chunk boundary
+            continue
+
+        number += 1
+        yield number, value
+        buffer = buffer[end:]
+        expect_value = False
+
+
+def import_movies(
+    user_id: int,
+    records: Iterable[Tuple[int, object]],
+    schema: BaseModel,
+    batch_size: int,
+) -> dict:
+    """
+    Validate records against `schema` and insert the valid ones with
+    bulk_create in batches of `batch_size`, all in one transaction.
+    """
+    inserted = []
+    errors = []
+    batch = []
+    # Titles this import created, before they reach titles.index
+    pending = titles.TitleIndex()
+
+    def flush():
+        # bulk_create sends no pre_save either
+        title_ids = titles.resolve_many(
+            [movie.title for movie in batch], pending)
+        for movie, title_id in zip(batch, title_ids):
+            movie.canonical_title_id = title_id
+        created = Movie.objects.bulk_create(batch)
+        inserted.extend(movie.id for movie in created)
+        delta = Counter()
+        for movie in created:
+            delta.update(contribution(movie.score, movie.is_private))
+        apply_delta(user_id, delta)
+        leaderboard.add(
+            (movie.id, movie.score) for movie in created
+            if not movie.is_private
+        )
+        batch.clear()
+
+    with transaction.atomic():
+        try:
+            for number, value in records:
+                if isinstance(value, Exception):
+                    errors.append({"line": number, "error": str(value)})
+                    continue
+                try:
+                    movie = schema.parse_obj(value)
+                except ValidationError as e:
+                    errors.append({"line": number, "error": e.errors()})
+                    continue
+                batch.append(Movie(user_id=user_id, **movie.dict()))
+                if len(batch) >= batch_size:
+                    flush()
+        except ValueError as e:
+            errors.append({"line": None, "error": str(e)})
+        if batch:
+            flush()
+        if inserted:
+            user_movie_pages.bump(user_id)
+
+    if inserted:
+        # bulk_create sends no post_save
+        bump_public_movies()
+    return {"inserted": inserted, "errors": errors}
@@ -0,0 +1,128 @@
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+import csv
+import json
+import re
+import zlib
+
+from django.utils.cache import patch_vary_headers
+
+from flixapp.streaming import StreamingHttpResponse
+
+from .models import Movie
+
+
+EXPORT_FIELDS = ('id', 'title', 'score', 'description', 'review', 'is_private')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class Echo:
+    """File-like object that hands back what csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def movies(user_id: int):
+    return Movie.objects.filter(user_id=user_id).order_by('id').values(
+        *EXPORT_FIELDS)
+
+
+def movie_rows(user_id: int, chunk_size: int) -> Iterator[dict]:
+    """A user's movies as dicts, fetched from SQLite chunk by chunk"""
+    return movies(user_id).iterator(chunk_size=chunk_size)
+
+
+def amovie_rows(user_id: int, chunk_size: int) -> AsyncIterator[dict]:
+    """`movie_rows`, each chunk fetched in sync_to_async"""
+    return movies(user_id).aiterator(chunk_size=chunk_size)
+
+
+def ndjson_line(row: dict) -> str:
+    row['score'] = float(row['score'])
+    return json.dumps(row) + '\n'
+
+
+def csv_values(row: dict) -> list:
+    return [row[field] for field in EXPORT_FIELDS]
+
+
+def render_ndjson(rows: Iterable[dict]) -> Iterator[str]:
+    for row in rows:
+        yield ndjson_line(row)
+
+
+def render_csv(rows: Iterable[dict]) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(csv_values(row))
+
+
+async def arender_ndjson(rows: AsyncIterable[dict]) -> AsyncIterator[str]:
+    async for row in rows:
+        yield ndjson_line(row)
+
+
+async def arender_csv(rows: AsyncIterable[dict]) -> AsyncIterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    async for row in rows:
+        yield writer.writerow(csv_values(row))
+
+
+def compressor():
+    return zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+
+
+def gzip_stream(chunks: Iterable[str]) -> Iterator[bytes]:
+    gzip = compressor()
+    for chunk in chunks:
+        data = gzip.compress(chunk.encode())
+        if data:
+            yield data
+    yield gzip.flush()
+
+
+async def agzip_stream(chunks: AsyncIterable[str]) -> AsyncIterator[bytes]:
+    gzip = compressor()
+    async for chunk in chunks:
+        data = gzip.compress(chunk.encode())
+        if data:
+            yield data
+    yield gzip.flush()
+
+
+def accepts_gzip(request) -> bool:
+    accept = request.headers.get('Accept-Encoding', '')
+    return re.search(r'\bgzip\b', accept) is not None
+
+
+def stream(request, format: str, chunks, compress) -> StreamingHttpResponse:
+    if accepts_gzip(request):
+        response = StreamingHttpResponse(
+            compress(chunks), content_type=CONTENT_TYPES[format])
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(
+            chunks, content_type=CONTENT_TYPES[format])
+    patch_vary_headers(response, ('Accept-Encoding',))
+    response['Content-Disposition'] = (
+        f'attachment; filename="movies.{format}"')
+    return response
+
+
+def export_response(request, user_id: int, format: str, chunk_size: int):
+    """StreamingHttpResponse of every movie `user_id` owns"""
+    render = render_csv if format == 'csv' else render_ndjson
+    chunks = render(movie_rows(user_id, chunk_size))
+    return stream(request, format, chunks, gzip_stream)
+
+
+def aexport_response(request, user_id: int, format: str, chunk_size: int):
+    """`export_response` over an async iterator, for ASGI"""
+    render = arender_csv if format == 'csv' else arender_ndjson
+    chunks = render(amovie_rows(user_id, chunk_size))
+    return stream(request, format, chunks, agzip_stream)
@@ -0,0 +1,127 @@
+"""
+Top rated public movies.
+
+TopMovie holds exactly the LEADERBOARD_SIZE best public movies (highest
+score first, older movies first on ties), or all of them if there are
+fewer, so /movies/top reads a few rows in index order instead of
+sorting the movies table.
+
+Writers keep the board exact inside their own transaction: new public
+movies are merged in, a rescored board movie is updated in place unless
+the best movie outside the board now ranks before it, and a movie
+leaving it (deleted or made private) is dropped and the board refilled
+from the movies ranked after its last entry. Movies outside the board
+are read best first from movie_public_score_idx, never sorted.
+`manage.py rebuild_leaderboard` recomputes it from scratch.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Movie, TopMovie
+
+
+def quantize(score) -> Decimal:
+    return Decimal(str(score)).quantize(Decimal('0.1'))
+
+
+def rank(movie_id: int, score) -> tuple:
+    return -score, movie_id
+
+
+def add(movies) -> None:
+    """Merge (movie_id, score) pairs of new public movies into the board"""
+    scores = {movie_id: quantize(score) for movie_id, score in movies}
+    if not scores:
+        return
+    board = dict(TopMovie.objects.values_list('movie_id', 'score'))
+    scores.update(board)
+    keep = set(sorted(
+        scores, key=lambda movie_id: (-scores[movie_id], movie_id),
+    )[:settings.LEADERBOARD_SIZE])
+
+    dropped = [movie_id for movie_id in board if movie_id not in keep]
+    if dropped:
+        TopMovie.objects.filter(movie_id__in=dropped).delete()
+    TopMovie.objects.bulk_create(
+        TopMovie(movie_id=movie_id, score=scores[movie_id])
+        for movie_id in keep if movie_id not in board
+    )
+
+
+def remove(movie_ids) -> None:
+    """Drop movies from the board and refill it"""
+    if TopMovie.objects.filter(movie_id__in=movie_ids).delete()[0]:
+        refill()
+
+
+def update(movie_id: int, score, is_private: bool) -> None:
+    """A movie was rescored, made public or made private"""
+    if is_private:
+        remove([movie_id])
+        return
+    score = quantize(score)
+    last = TopMovie.objects.order_by('score', '-movie_id').first()
+    if not TopMovie.objects.filter(movie_id=movie_id).update(score=score):
+        add([(movie_id, score)])
+        return
+    # Still on the board, unless it fell behind the best movie outside
+    best = ranked_after(last).exclude(id=movie_id).values_list(
+        'id', 'score').first()
+    if best is not None and rank(*best) < rank(movie_id, score):
+        TopMovie.objects.filter(movie_id=movie_id).delete()
+        TopMovie.objects.create(movie_id=best[0], score=best[1])
+
+
+def prune() -> None:
+    """Drop the entries of movies deleted with raw SQL"""
+    gone = TopMovie.objects.filter(
+        ~Exists(Movie.objects.filter(id=OuterRef('movie_id'))))
+    if gone.delete()[0]:
+        refill()
+
+
+def refill() -> None:
+    """Top the board up with the best public movies ranked after it"""
+    missing = settings.LEADERBOARD_SIZE - TopMovie.objects.count()
+    if missing <= 0:
+        return
+    last = TopMovie.objects.order_by('score', '-movie_id').first()
+    TopMovie.objects.bulk_create(
+        TopMovie(movie_id=movie_id, score=score)
+        for movie_id, score in ranked_after(last).values_list(
+            'id', 'score')[:missing]
+    )
+
+
+def ranked_after(last: TopMovie | None):
+    """Public movies ranked after the board's `last` entry, best first"""
+    movies = Movie.objects.filter(is_private=False)
+    if last is not None:
+        # Nothing outside the board ranks before its last entry
+        movies = movies.filter(
+            Q(score__lt=last.score)
+            | Q(score=last.score, id__gt=last.movie_id),
+            score__lte=last.score,
+        )
+    return movies.order_by('-score', 'id')
+
+
+def rebuild() -> int:
+    """Recompute the board. Call inside a transaction."""
+    TopMovie.objects.all().delete()
+    refill()
+    return TopMovie.objects.count()
+
+
+def top(n: int, fields: tuple = None) -> list:
+    """
+    The `n` best public movies, n <= LEADERBOARD_SIZE, with only `fields`
+    loaded if given
+    """
+    entries = TopMovie.objects.select_related('movie')
+    if fields is not None:
+        entries = entries.only(*(f'movie__{name}' for name in fields))
+    entries = entries.order_by('-score', 'movie_id')[:n]
+    return [entry.movie for entry in entries]
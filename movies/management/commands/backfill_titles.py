@@ -0,0 +1,56 @@
+from collections import defaultdict
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movies.models import Movie
+from movies.titles import resolve_many
+
+
+class Command(BaseCommand):
+    help = (
+        'Link movies without a canonical title to the title catalog, '
+        'a batch at a time'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Movies resolved and updated per transaction',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help='Seconds to sleep between batches, to let other '
+                 'writers take the SQLite lock',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = Movie.objects.filter(
+            canonical_title__isnull=True).order_by('id')
+        last_id = linked = 0
+        while True:
+            rows = list(pending.filter(id__gt=last_id).values_list(
+                'id', 'title')[:batch_size])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            with transaction.atomic():
+                movies = defaultdict(list)
+                title_ids = resolve_many([title for _, title in rows])
+                for (movie_id, _), title_id in zip(rows, title_ids):
+                    if title_id is not None:
+                        movies[title_id].append(movie_id)
+                for title_id, movie_ids in movies.items():
+                    # Only rows still unlinked, a concurrent edit wins
+                    linked += pending.filter(id__in=movie_ids).update(
+                        canonical_title_id=title_id)
+
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  up to movie {last_id}: {linked}')
+            time.sleep(options['pause'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'{linked} movies linked to catalog titles'))
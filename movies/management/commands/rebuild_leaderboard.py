@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movies import leaderboard
+from movies.signals import bump_public_movies
+
+
+class Command(BaseCommand):
+    help = 'Recompute the top rated public movies from the movies table'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            size = leaderboard.rebuild()
+            bump_public_movies()
+        self.stdout.write(
+            self.style.SUCCESS(f'Leaderboard rebuilt with {size} movies'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from movies.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index over movies'
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from movies.similar import build_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the TF-IDF index behind the similar movies route'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=settings.SIMILAR_INDEX_PATH,
+            help='Where to write the index',
+        )
+
+    def handle(self, *args, **options):
+        count = build_index(options['path'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Similar movies index rebuilt with {count} movies'))
@@ -0,0 +1,84 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movies.models import Movie, UserMovieStats
+from movies.stats import FIELDS, aggregate_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute per-user movie statistics from the movies table and '
+        'report rows that drifted'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report drift, do not fix it',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Rows per bulk write',
+        )
+
+    def handle(self, *args, **options):
+        expected = {
+            user_id: normalize(values)
+            for user_id, values in aggregate_stats(Movie.objects).items()
+        }
+        stored = {
+            row.pop('user_id'): normalize(row)
+            for row in UserMovieStats.objects.values('user_id', *FIELDS)
+        }
+
+        missing = [u for u in expected if u not in stored]
+        stale = [u for u in stored if u not in expected]
+        changed = [
+            u for u in expected
+            if u in stored and stored[u] != expected[u]
+        ]
+        fields = Counter(
+            field
+            for u in changed
+            for field in FIELDS
+            if stored[u][field] != expected[u][field]
+        )
+
+        self.stdout.write(
+            f'{len(expected)} users with movies, {len(missing)} missing, '
+            f'{len(changed)} drifted, {len(stale)} stale rows'
+        )
+        for field, count in fields.most_common():
+            self.stdout.write(f'  {field}: {count} users')
+        if options['verbosity'] > 1:
+            for user_id in changed:
+                self.stdout.write(
+                    f'  user {user_id}: {stored[user_id]} '
+                    f'-> {expected[user_id]}')
+
+        if options['dry_run'] or not (missing or changed or stale):
+            return
+
+        batch_size = options['batch_size']
+        with transaction.atomic():
+            UserMovieStats.objects.bulk_create(
+                [UserMovieStats(user_id=u, **expected[u]) for u in missing],
+                batch_size=batch_size,
+            )
+            UserMovieStats.objects.bulk_update(
+                [UserMovieStats(user_id=u, **expected[u]) for u in changed],
+                FIELDS,
+                batch_size=batch_size,
+            )
+            UserMovieStats.objects.filter(user_id__in=stale).delete()
+        self.stdout.write(self.style.SUCCESS('Movie stats reconciled'))
+
+
+def normalize(values: dict) -> dict:
+    values = {field: values[field] or 0 for field in FIELDS}
+    values['score_total'] = Decimal(values['score_total']).quantize(
+        Decimal('0.1'))
+    return values
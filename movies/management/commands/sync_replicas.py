@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+import sqlite3
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database onto every configured read '
+        'replica with the online backup API'
+    )
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Only SQLite replicas can be synced this way')
+
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            name = connections[alias].settings_dict['NAME']
+            connections[alias].close()
+            target = sqlite3.connect(name)
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: copied to {name}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(settings.DATABASE_REPLICAS)} replicas synced'))
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+
+FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE movies_movie_fts USING fts5(
+        title, description, review,
+        content='movies_movie', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER movies_movie_fts_ai AFTER INSERT ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(rowid, title, description, review)
+        VALUES (new.id, new.title, new.description, new.review);
+    END
+    """,
+    """
+    CREATE TRIGGER movies_movie_fts_ad AFTER DELETE ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(
+            movies_movie_fts, rowid, title, description, review)
+        VALUES ('delete', old.id, old.title, old.description, old.review);
+    END
+    """,
+    """
+    CREATE TRIGGER movies_movie_fts_au AFTER UPDATE OF
+        title, description, review ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(
+            movies_movie_fts, rowid, title, description, review)
+        VALUES ('delete', old.id, old.title, old.description, old.review);
+        INSERT INTO movies_movie_fts(rowid, title, description, review)
+        VALUES (new.id, new.title, new.description, new.review);
+    END
+    """,
+    "INSERT INTO movies_movie_fts(movies_movie_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS movies_movie_fts_au",
+    "DROP TRIGGER IF EXISTS movies_movie_fts_ad",
+    "DROP TRIGGER IF EXISTS movies_movie_fts_ai",
+    "DROP TABLE IF EXISTS movies_movie_fts",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FTS_SQL), run(DROP_SQL)),
+    ]
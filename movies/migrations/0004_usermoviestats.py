@@ -0,0 +1,48 @@
+# Generated by Django 4.1.5 on 2026-10-18 07:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill(apps, schema_editor):
+    from movies.stats import aggregate_stats
+
+    Movie = apps.get_model('movies', 'Movie')
+    UserMovieStats = apps.get_model('movies', 'UserMovieStats')
+    UserMovieStats.objects.bulk_create(
+        UserMovieStats(user_id=user_id, **values)
+        for user_id, values in aggregate_stats(Movie.objects.all()).items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_versionstamp'),
+        ('movies', '0003_movie_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserMovieStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='movie_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('movie_count', models.PositiveIntegerField(default=0)),
+                ('public_count', models.PositiveIntegerField(default=0)),
+                ('private_count', models.PositiveIntegerField(default=0)),
+                ('score_total', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('bucket_0', models.PositiveIntegerField(default=0)),
+                ('bucket_1', models.PositiveIntegerField(default=0)),
+                ('bucket_2', models.PositiveIntegerField(default=0)),
+                ('bucket_3', models.PositiveIntegerField(default=0)),
+                ('bucket_4', models.PositiveIntegerField(default=0)),
+                ('bucket_5', models.PositiveIntegerField(default=0)),
+                ('bucket_6', models.PositiveIntegerField(default=0)),
+                ('bucket_7', models.PositiveIntegerField(default=0)),
+                ('bucket_8', models.PositiveIntegerField(default=0)),
+                ('bucket_9', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.1.5 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_usermoviestats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('is_private', False)), fields=['id'], name='movie_public_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('is_private', False)), fields=['user', 'id'], name='movie_user_public_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('is_private', True)), fields=['user', 'id'], name='movie_user_private_idx'),
+        ),
+    ]
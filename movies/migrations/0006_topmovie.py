@@ -0,0 +1,38 @@
+# Generated by Django 4.1.5 on 2026-10-18 07:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    TopMovie = apps.get_model('movies', 'TopMovie')
+    best = Movie.objects.filter(is_private=False).order_by('-score', 'id')
+    TopMovie.objects.bulk_create(
+        TopMovie(movie_id=movie_id, score=score)
+        for movie_id, score in best.values_list(
+            'id', 'score')[:settings.LEADERBOARD_SIZE]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_movie_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopMovie',
+            fields=[
+                ('movie', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='movies.movie')),
+                ('score', models.DecimalField(decimal_places=1, max_digits=2)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='topmovie',
+            index=models.Index(fields=['-score', 'movie'], name='top_movie_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
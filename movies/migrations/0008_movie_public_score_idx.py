@@ -0,0 +1,17 @@
+# Generated by Django 4.1.5 on 2026-10-18 08:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_title_catalog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('is_private', False)), fields=['-score', 'id'], name='movie_public_score_idx'),
+        ),
+    ]
@@ -12,6 +12,17 @@ from django.conf import settings
 #     return os.path.join('uploads', 'recipe', filename)
 
 
+class Title(models.Model):
+    """A film in the catalog, shared by every movie post about it."""
+    # movies.titles.normalize() of the title
+    key = models.CharField(max_length=255, unique=True)
+    # As first written
+    name = models.CharField(max_length=255)
+
+    def __str__(self):
+        return self.name
+
+
 class Movie(models.Model):
     """Movie object."""
     user = models.ForeignKey(
@@ -19,11 +30,130 @@ class Movie(models.Model):
         on_delete=models.CASCADE,
     )
     title = models.CharField(max_length=255)
+    # Resolved from `title` by movies.titles
+    canonical_title = models.ForeignKey(
+        Title,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='movies',
+    )
     score = models.DecimalField(max_digits=2, decimal_places=1)
     description = models.TextField(blank=True)
     review = models.TextField(blank=True)
     is_private = models.BooleanField(default=True)
     # poster = models.ImageField(null=True, upload_to=poster_file_path)
 
+    class Meta:
+        # Listings page by id. Django filters booleans as `WHERE NOT
+        # is_private`, which SQLite cannot match to an (is_private, id)
+        # index, but uses a partial index with the same condition.
+        indexes = [
+            models.Index(
+                fields=['id'],
+                condition=models.Q(is_private=False),
+                name='movie_public_idx',
+            ),
+            models.Index(
+                fields=['user', 'id'],
+                condition=models.Q(is_private=False),
+                name='movie_user_public_idx',
+            ),
+            models.Index(
+                fields=['user', 'id'],
+                condition=models.Q(is_private=True),
+                name='movie_user_private_idx',
+            ),
+            # Leaderboard refills walk public movies best first
+            models.Index(
+                fields=['-score', 'id'],
+                condition=models.Q(is_private=False),
+                name='movie_public_score_idx',
+            ),
+        ]
+
+    # Fields signal receivers only act on when they changed
+    TRACKED_FIELDS = ('title', 'score', 'is_private')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        movie = super().from_db(db, field_names, values)
+        movie._loaded = {
+            name: value for name, value in zip(field_names, values)
+            if name in cls.TRACKED_FIELDS
+        }
+        return movie
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded = {
+            name: self._value(name) for name in self.TRACKED_FIELDS
+        }
+
+    def _value(self, name: str):
+        # Routes assign scores as floats
+        return self._meta.get_field(name).to_python(getattr(self, name))
+
+    def changed(self, *fields) -> bool:
+        """Whether any of `fields` differs from its value in the DB"""
+        loaded = getattr(self, '_loaded', {})
+        return any(
+            name not in loaded or self._value(name) != loaded[name]
+            for name in fields
+        )
+
     def __str__(self):
         return self.title
+
+
+class UserMovieStats(models.Model):
+    """Per-user movie counters, kept up to date by the movie routes."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='movie_stats',
+    )
+    movie_count = models.PositiveIntegerField(default=0)
+    public_count = models.PositiveIntegerField(default=0)
+    private_count = models.PositiveIntegerField(default=0)
+    score_total = models.DecimalField(
+        max_digits=12, decimal_places=1, default=0)
+    # Movies scored [n, n + 1); bucket_0 and bucket_9 take the tails
+    bucket_0 = models.PositiveIntegerField(default=0)
+    bucket_1 = models.PositiveIntegerField(default=0)
+    bucket_2 = models.PositiveIntegerField(default=0)
+    bucket_3 = models.PositiveIntegerField(default=0)
+    bucket_4 = models.PositiveIntegerField(default=0)
+    bucket_5 = models.PositiveIntegerField(default=0)
+    bucket_6 = models.PositiveIntegerField(default=0)
+    bucket_7 = models.PositiveIntegerField(default=0)
+    bucket_8 = models.PositiveIntegerField(default=0)
+    bucket_9 = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.movie_count} movies'
+
+
+class TopMovie(models.Model):
+    """
+    The LEADERBOARD_SIZE highest scored public movies, maintained by
+    movies.leaderboard.
+    """
+    # No constraint: raw deletes of movies prune the board afterwards
+    movie = models.OneToOneField(
+        Movie,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        primary_key=True,
+        related_name='+',
+    )
+    score = models.DecimalField(max_digits=2, decimal_places=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score', 'movie'], name='top_movie_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.movie_id}: {self.score}'
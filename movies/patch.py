@@ -0,0 +1,52 @@
+from flixapp.page_cache import user_movie_pages
+
+from .models import Movie
+from .signals import bump_public_movies
+from . import leaderboard, stats, titles
+
+
+STATS_FIELDS = {'score', 'is_private'}
+
+
+def patch_movie(user_id: int, movie_id: int, changes: dict) -> bool:
+    """
+    Write `changes` to one of the user's movies with a single UPDATE
+    whose WHERE clause also checks ownership. Returns False if the user
+    has no such movie. Call inside a transaction.
+
+    Changing score or is_private also moves the user's stats, so their
+    old values are read first and matched in the UPDATE: a row changed
+    in between is read again instead of skewing the stats.
+    """
+    movies = Movie.objects.filter(id=movie_id, user_id=user_id)
+    if not changes:
+        return movies.exists()
+    if 'title' in changes:
+        changes = {
+            **changes,
+            'canonical_title_id': titles.resolve(changes['title']),
+        }
+
+    if not STATS_FIELDS & changes.keys():
+        if not movies.update(**changes):
+            return False
+        user_movie_pages.bump(user_id)
+        bump_public_movies()
+        return True
+
+    while True:
+        old = movies.values_list('score', 'is_private').first()
+        if old is None:
+            return False
+        score, is_private = old
+        if movies.filter(score=score, is_private=is_private).update(
+                **changes):
+            break
+
+    new = (changes.get('score', score), changes.get('is_private', is_private))
+    stats.record_updated(user_id, old, new)
+    user_movie_pages.bump(user_id)
+    if not (is_private and new[1]):
+        bump_public_movies()
+        leaderboard.update(movie_id, *new)
+    return True
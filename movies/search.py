@@ -0,0 +1,47 @@
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+import re
+
+from .models import Movie
+
+
+FTS_TABLE = 'movies_movie_fts'
+
+
+def fts_query(text: str) -> str:
+    """Quote each word so user input never reaches the FTS5 query parser"""
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', text))
+
+
+def search_movies(text: str, user_id: int):
+    """
+    Movies matching `text` that `user_id` may see, annotated with their
+    bm25 rank (lower is better).
+
+    The FTS table is joined once, on rowid, so its MATCH both filters
+    the rows and ranks them; the rank is a column of that join, which
+    cursor pages can compare against.
+    """
+    match = fts_query(text)
+    if not match:
+        return Movie.objects.none()
+
+    return Movie.objects.filter(
+        Q(is_private=False) | Q(user_id=user_id),
+    ).extra(
+        tables=[FTS_TABLE],
+        where=[
+            f'{FTS_TABLE}.rowid = movies_movie.id',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[match],
+    ).annotate(
+        rank=RawSQL(f'bm25({FTS_TABLE})', [], output_field=FloatField()),
+    )
+
+
+def rebuild_search_index() -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
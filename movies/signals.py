@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from flixapp.page_cache import user_movie_pages
+from flixapp.response_cache import bump_version
+
+from .models import Movie
+from . import leaderboard, titles
+
+
+PUBLIC_MOVIES = 'public_movies'
+
+
+@receiver(pre_save, sender=Movie)
+def resolve_title(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'title' not in update_fields:
+        return
+    if instance.changed('title') or instance.canonical_title_id is None:
+        instance.canonical_title_id = titles.resolve(instance.title)
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved(sender, instance, created, **kwargs):
+    user_movie_pages.bump(instance.user_id)
+    # An update may have flipped is_private, so only new private rows
+    # are known not to touch the public listing
+    if not (created and instance.is_private):
+        bump_public_movies()
+    if not created:
+        # A text-only edit leaves the board as it is
+        if instance.changed('score', 'is_private'):
+            leaderboard.update(
+                instance.id, instance.score, instance.is_private)
+    elif not instance.is_private:
+        leaderboard.add([(instance.id, instance.score)])
+
+
+@receiver(post_delete, sender=Movie)
+def movie_deleted(sender, instance, **kwargs):
+    user_movie_pages.bump(instance.user_id)
+    if not instance.is_private:
+        bump_public_movies()
+        leaderboard.remove([instance.id])
+
+
+def bump_public_movies():
+    # After commit, so no reader caches pre-commit rows under the new
+    # version
+    transaction.on_commit(lambda: bump_version(PUBLIC_MOVIES))
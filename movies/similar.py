@@ -0,0 +1,240 @@
+"""
+Similar movies from a precomputed TF-IDF index.
+
+`build_index` weighs the words of every public movie's title,
+description and review (sublinear tf, smoothed idf, rows L2 normalized)
+and writes the matrix in term-major (CSC) layout to one file:
+
+    b'FLIXSIM1' | header length (8 bytes) | JSON header | arrays
+
+The header holds the vocabulary (term -> [column, idf]) and where each
+array starts; the arrays are the movie ids of the rows, the column
+pointers, and the row indexes and float32 weights of the non-zeros.
+
+Workers memory-map the file, so the arrays live once in the page cache
+whatever the number of processes, and reopen it when a rebuild replaces
+it. A query vectorizes the movie's current text and adds up, column by
+column, weight times posting weight over only the postings of its terms:
+cosine similarity without touching movies that share no word with it.
+
+Words found in more than SIMILAR_MAX_DF of the movies ("the", "movie")
+say little about any of them and have the longest postings, so they are
+left out of the vocabulary. A query then reads at most
+SIMILAR_MAX_POSTINGS postings, taking its terms by weight and skipping
+those whose postings no longer fit.
+
+Movies written since the last build are missing until the next one
+(`manage.py rebuild_similar_index` or the `movies.rebuild_similar_index`
+job); results are checked against the movies table, so deleted or
+now-private movies never show up.
+"""
+from array import array
+from collections import Counter
+from heapq import nlargest
+from operator import itemgetter
+import json
+import math
+import mmap
+import os
+import re
+import tempfile
+
+from django.conf import settings
+
+from .models import Movie
+
+
+MAGIC = b'FLIXSIM1'
+TEXT_FIELDS = ('title', 'description', 'review')
+WORD = re.compile(r'\w\w+')
+
+
+def tokens(*texts) -> Counter:
+    return Counter(
+        word for text in texts for word in WORD.findall(text.lower()))
+
+
+def vector(counts: Counter, vocabulary: dict) -> dict:
+    """{column: weight} of a document, L2 normalized"""
+    weights = {}
+    for term, count in counts.items():
+        entry = vocabulary.get(term)
+        if entry is not None:
+            column, idf = entry
+            weights[column] = (1 + math.log(count)) * idf
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+    return {column: w / norm for column, w in weights.items()} if norm else {}
+
+
+def build_index(
+    path=None, chunk_size: int = 2000, max_df: float = None,
+) -> int:
+    """
+    Write the index of all public movies to `path`, without the words
+    in more than `max_df` of them; returns its size
+    """
+    path = path or settings.SIMILAR_INDEX_PATH
+    if max_df is None:
+        max_df = settings.SIMILAR_MAX_DF
+    movies = Movie.objects.filter(is_private=False).order_by('id')
+
+    def documents():
+        rows = movies.values_list('id', *TEXT_FIELDS)
+        for movie_id, *texts in rows.iterator(chunk_size=chunk_size):
+            yield movie_id, tokens(*texts)
+
+    # Two passes over the table rather than every document in memory
+    frequencies = Counter()
+    count = 0
+    for _, counts in documents():
+        frequencies.update(counts.keys())
+        count += 1
+    kept = sorted(
+        (term, df) for term, df in frequencies.items()
+        if df <= max_df * count
+    )
+    vocabulary = {
+        term: [column, math.log((1 + count) / (1 + df)) + 1]
+        for column, (term, df) in enumerate(kept)
+    }
+
+    ids = array('q')
+    postings = [([], []) for _ in vocabulary]
+    for row, (movie_id, counts) in enumerate(documents()):
+        ids.append(movie_id)
+        for column, weight in vector(counts, vocabulary).items():
+            postings[column][0].append(row)
+            postings[column][1].append(weight)
+
+    indptr = array('q', [0])
+    rows, weights = array('i'), array('f')
+    for column_rows, column_weights in postings:
+        rows.extend(column_rows)
+        weights.extend(column_weights)
+        indptr.append(len(rows))
+
+    write(path, vocabulary, {
+        'ids': ids, 'indptr': indptr, 'rows': rows, 'weights': weights,
+    })
+    return len(ids)
+
+
+def write(path, vocabulary: dict, arrays: dict) -> None:
+    layout, offset = {}, 0
+    for name, values in arrays.items():
+        layout[name] = [offset, values.typecode, len(values)]
+        offset += align(len(values) * values.itemsize)
+    header = json.dumps({'terms': vocabulary, 'arrays': layout}).encode()
+    start = align(len(MAGIC) + 8 + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # Written aside and renamed, so readers see the old or the new index
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC + len(header).to_bytes(8, 'little') + header)
+            f.write(bytes(start - f.tell()))
+            for values in arrays.values():
+                data = values.tobytes()
+                f.write(data + bytes(align(len(data)) - len(data)))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def align(size: int) -> int:
+    return -(-size // 8) * 8
+
+
+def stamp(stat) -> tuple:
+    # A rebuild renames a new file over the old one
+    return stat.st_ino, stat.st_mtime_ns
+
+
+class SimilarIndex:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.stamp = stamp(os.fstat(f.fileno()))
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a similar movies index')
+        header_start = len(MAGIC) + 8
+        length = int.from_bytes(self._map[len(MAGIC):header_start], 'little')
+        header = json.loads(self._map[header_start:header_start + length])
+        self.vocabulary = header['terms']
+
+        buffer = memoryview(self._map)
+        start = align(header_start + length)
+        for name, (offset, typecode, size) in header['arrays'].items():
+            itemsize = array(typecode).itemsize
+            begin = start + offset
+            setattr(self, name, buffer[
+                begin:begin + size * itemsize].cast(typecode))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query(self, counts: Counter, n: int, max_postings: int = None) -> list:
+        """
+        The `n` best (movie_id, similarity) for a document's tokens,
+        reading at most `max_postings` postings
+        """
+        scores = {}
+        indptr, rows, weights = self.indptr, self.rows, self.weights
+        terms = sorted(
+            vector(counts, self.vocabulary).items(),
+            key=itemgetter(1), reverse=True)
+        budget = len(rows) if max_postings is None else max_postings
+        for column, weight in terms:
+            start, end = indptr[column], indptr[column + 1]
+            if end - start > budget:
+                continue
+            budget -= end - start
+            for row, posting in zip(rows[start:end], weights[start:end]):
+                scores[row] = scores.get(row, 0.0) + weight * posting
+        ids = self.ids
+        return [
+            (ids[row], score)
+            for row, score in nlargest(n, scores.items(), key=itemgetter(1))
+        ]
+
+
+_loaded = None
+
+
+def get_index(path=None) -> SimilarIndex | None:
+    """This process's mapping of the index, reopened after a rebuild"""
+    global _loaded
+    path = path or settings.SIMILAR_INDEX_PATH
+    try:
+        current = stamp(os.stat(path))
+    except FileNotFoundError:
+        return None
+    index = _loaded
+    if index is None or index.path != path or index.stamp != current:
+        index = _loaded = SimilarIndex(path)
+    return index
+
+
+def similar_movies(
+    movie: Movie, n: int, index: SimilarIndex, fields: tuple = None,
+) -> list:
+    """
+    Public movies closest to `movie`, most similar first, with only
+    `fields` loaded if given
+    """
+    counts = tokens(*(getattr(movie, field) for field in TEXT_FIELDS))
+    # Some candidates may have been deleted or made private since
+    ranked = index.query(counts, 2 * n + 1, settings.SIMILAR_MAX_POSTINGS)
+    found = Movie.objects.filter(
+        id__in=[movie_id for movie_id, _ in ranked], is_private=False,
+    ).exclude(id=movie.id)
+    if fields is not None:
+        found = found.only(*fields)
+    found = found.in_bulk()
+    return [
+        found[movie_id] for movie_id, _ in ranked if movie_id in found
+    ][:n]
@@ -0,0 +1,113 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Movie, UserMovieStats
+
+
+BUCKETS = [f'bucket_{n}' for n in range(10)]
+COUNTERS = ['movie_count', 'public_count', 'private_count', 'score_total']
+FIELDS = COUNTERS + BUCKETS
+
+
+def bucket(score) -> str:
+    return BUCKETS[min(max(int(score), 0), 9)]
+
+
+def contribution(score, is_private: bool) -> Counter:
+    """What one movie adds to its owner's row"""
+    score = Decimal(str(score)).quantize(Decimal('0.1'))
+    return Counter({
+        'movie_count': 1,
+        'private_count' if is_private else 'public_count': 1,
+        'score_total': score,
+        bucket(score): 1,
+    })
+
+
+def record_created(user_id: int, score, is_private: bool) -> None:
+    apply_delta(user_id, contribution(score, is_private))
+
+
+def record_deleted(user_id: int, score, is_private: bool) -> None:
+    delta = Counter()
+    delta.subtract(contribution(score, is_private))
+    apply_delta(user_id, delta)
+
+
+def record_updated(user_id: int, old: tuple, new: tuple) -> None:
+    """`old` and `new` are (score, is_private) pairs"""
+    delta = contribution(*new)
+    delta.subtract(contribution(*old))
+    apply_delta(user_id, delta)
+
+
+def apply_delta(user_id: int, delta: Counter) -> None:
+    """
+    Add `delta` to the user's row in one UPDATE. Call inside the
+    transaction that changed the movies.
+    """
+    changes = {
+        field: F(field) + value for field, value in delta.items() if value
+    }
+    if not changes:
+        return
+    if not UserMovieStats.objects.filter(user_id=user_id).update(**changes):
+        # No row yet (or it was lost): count this user's movies instead
+        recompute_user(user_id)
+
+
+def aggregate_stats(movies) -> dict:
+    """{user_id: {field: value}} for a Movie queryset, in one GROUP BY"""
+    rows = movies.values('user_id').annotate(
+        movie_count=Count('id'),
+        public_count=Count('id', filter=Q(is_private=False)),
+        private_count=Count('id', filter=Q(is_private=True)),
+        score_total=Sum('score'),
+        **{
+            name: Count('id', filter=bucket_filter(n))
+            for n, name in enumerate(BUCKETS)
+        },
+    ).order_by()
+    return {row.pop('user_id'): row for row in rows}
+
+
+def bucket_filter(n: int) -> Q:
+    condition = Q()
+    if n > 0:
+        condition &= Q(score__gte=n)
+    if n < 9:
+        condition &= Q(score__lt=n + 1)
+    return condition
+
+
+def recompute_user(user_id: int) -> None:
+    values = aggregate_stats(Movie.objects.filter(user_id=user_id)).get(
+        user_id, dict.fromkeys(FIELDS, 0))
+    try:
+        with transaction.atomic():
+            UserMovieStats.objects.update_or_create(
+                user_id=user_id, defaults=values)
+    except IntegrityError:
+        UserMovieStats.objects.filter(user_id=user_id).update(**values)
+
+
+def stats_payload(stats: UserMovieStats | None, user_id: int) -> dict:
+    values = {
+        field: getattr(stats, field) if stats else 0 for field in FIELDS
+    }
+    count = values['movie_count']
+    return {
+        "user_id": user_id,
+        "movie_count": count,
+        "public_count": values['public_count'],
+        "private_count": values['private_count'],
+        "average_score": (
+            round(float(values['score_total']) / count, 2) if count else None
+        ),
+        "histogram": {
+            str(n): values[name] for n, name in enumerate(BUCKETS)
+        },
+    }
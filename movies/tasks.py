@@ -0,0 +1,49 @@
+from io import StringIO
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+
+from jobs.registry import task
+
+from .export import gzip_stream, movie_rows, render_csv, render_ndjson
+from .search import rebuild_search_index
+from .similar import build_index
+
+
+@task('movies.rebuild_search_index')
+def rebuild_search_index_task():
+    rebuild_search_index()
+
+
+@task('movies.rebuild_similar_index')
+def rebuild_similar_index_task():
+    return {'movies': build_index()}
+
+
+@task('movies.reconcile_stats')
+def reconcile_stats_task():
+    out = StringIO()
+    call_command('reconcile_movie_stats', stdout=out)
+    return {'report': out.getvalue()}
+
+
+@task('movies.export')
+def export_task(user_id: int, format: str, filename: str):
+    """Write a user's movies to a gzipped file under JOB_FILES_DIR"""
+    render = render_csv if format == 'csv' else render_ndjson
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for row in movie_rows(user_id, settings.EXPORT_CHUNK_SIZE):
+            rows += 1
+            yield row
+
+    os.makedirs(settings.JOB_FILES_DIR, exist_ok=True)
+    path = os.path.join(settings.JOB_FILES_DIR, filename)
+    with open(f'{path}.part', 'wb') as f:
+        for chunk in gzip_stream(render(counted())):
+            f.write(chunk)
+    os.replace(f'{path}.part', path)
+    return {'file': filename, 'rows': rows}
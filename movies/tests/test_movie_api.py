@@ -12,7 +12,7 @@ from rest_framework.test import APIClient
 
 # from movie.serializers import MovieSerializer
 
-MOVIES_URL = "http://127.0.0.1:8000/api/movie"
+MOVIES_URL = "/api/movie"
 # TODO: check user creation url and response once it is live in AWS
 
 
@@ -0,0 +1,128 @@
+"""
+Tests for the async API routes served under ASGI.
+"""
+from decimal import Decimal
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TestCase, override_settings
+
+from flixapp.page_cache import user_movie_pages
+from flixapp.urls import AccessToken
+from movies.models import Movie
+from user.cache import user_cache
+
+from rest_framework import status
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_movie(user, **params):
+    """Create and return a sample movie."""
+    defaults = {
+        'title': 'Avatar',
+        'score': Decimal('8.3'),
+        'description': 'Sample description',
+        'review': 'Sample review',
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(user=user, **defaults)
+
+
+@override_settings(ROOT_URLCONF='flixapp.async_urls')
+class AsyncApiTests(TestCase):
+    """Test the async NinjaAPI routes."""
+
+    def setUp(self):
+        user_cache.clear()
+        user_movie_pages.clear()
+        self.user = create_user()
+        token = AccessToken.create(self.user)['access_token']
+        # AsyncClient takes ASGI header names, not WSGI environ keys
+        self.auth = {'AUTHORIZATION': f'Bearer {token}'}
+        self.client = AsyncClient()
+
+    async def test_create_user_and_login(self):
+        """Test signup and login hash passwords off the event loop."""
+        payload = {
+            'email': 'async@example.com',
+            'password': 'Testpassword!',
+        }
+        res = await self.client.post(
+            '/api/create-user', payload, content_type='application/json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = await self.client.post(
+            '/api/login', payload, content_type='application/json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('access_token', res.json())
+
+    async def test_movie_crud(self):
+        """Test create, list and delete through async views."""
+        payload = {
+            'title': 'Jaws',
+            'score': 8.0,
+            'description': '',
+            'review': '',
+            'is_private': True,
+        }
+        res = await self.client.post(
+            '/api/movie', payload, content_type='application/json',
+            **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = await self.client.get(
+            '/api/list_user_movies', {'is_private': True}, **self.auth)
+        items = res.json()['items']
+        self.assertEqual([item['title'] for item in items], ['Jaws'])
+
+        res = await self.client.delete(
+            f"/api/movie/{items[0]['id']}", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(await Movie.objects.aexists())
+
+    async def test_patch_movie_and_user(self):
+        """Test partial updates through async views."""
+        movie = await Movie.objects.acreate(
+            user=self.user, title='Jaws', score=Decimal('8.0'))
+
+        res = await self.client.patch(
+            f'/api/movie/{movie.id}', {'score': 6.5},
+            content_type='application/json', **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        movie = await Movie.objects.aget(id=movie.id)
+        self.assertEqual(movie.score, Decimal('6.5'))
+        self.assertEqual(movie.title, 'Jaws')
+
+        res = await self.client.patch(
+            f'/api/users/{self.user.id}', {'email': 'jaws@example.com'},
+            content_type='application/json', **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        user = await get_user_model().objects.aget(id=self.user.id)
+        self.assertEqual(user.email, 'jaws@example.com')
+
+    async def test_invalid_token_rejected(self):
+        """Test a bad token is a 401 without touching the DB."""
+        res = await self.client.get(
+            '/api/list_user_movies', {'is_private': True},
+            AUTHORIZATION='Bearer nope')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_sync_only_routes_fall_through(self):
+        """Test routes without an async version still resolve."""
+        token = AccessToken.create(self.user)['access_token']
+
+        res = self.client_class().post(
+            '/api/movies/bulk', json.dumps({
+                'title': 'Jaws', 'score': 8, 'description': '',
+                'review': '', 'is_private': False}),
+            content_type='application/x-ndjson',
+            HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
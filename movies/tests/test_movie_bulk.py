@@ -0,0 +1,154 @@
+"""
+Tests for bulk movie import.
+"""
+from io import BytesIO
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from flixapp.urls import AccessToken
+from movies.bulk import iter_json_array, iter_ndjson
+from movies.models import Movie
+from user.cache import user_cache
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+BULK_URL = '/api/movies/bulk'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def movie_payload(**params):
+    """Return a valid MovieSchema payload."""
+    payload = {
+        'title': 'Avatar',
+        'score': 8.3,
+        'description': 'Sample description',
+        'review': 'Sample review',
+        'is_private': True,
+    }
+    payload.update(params)
+    return payload
+
+
+class BulkImportTests(TestCase):
+    """Test POST /movies/bulk."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_ndjson_import_reports_bad_lines(self):
+        """Test valid lines are inserted and bad ones reported."""
+        lines = [
+            json.dumps(movie_payload(title='One')),
+            '{not json',
+            json.dumps(movie_payload(title='Two', score='high')),
+            '',
+            json.dumps(movie_payload(title='Three')),
+        ]
+        res = self.client.post(
+            BULK_URL + '?batch_size=1',
+            '\n'.join(lines),
+            content_type='application/x-ndjson',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        body = res.json()
+        self.assertEqual([e['line'] for e in body['errors']], [2, 3])
+        movies = Movie.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(
+            [m.title for m in movies], ['One', 'Three'])
+        self.assertEqual(body['inserted'], [m.id for m in movies])
+
+    def test_batch_size_bounded(self):
+        """Test batch sizes outside 1..BULK_IMPORT_MAX_BATCH_SIZE fail."""
+        body = json.dumps(movie_payload())
+        for batch_size in (0, -1, settings.BULK_IMPORT_MAX_BATCH_SIZE + 1):
+            res = self.client.post(
+                f'{BULK_URL}?batch_size={batch_size}', body,
+                content_type='application/x-ndjson')
+
+            self.assertEqual(
+                res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(Movie.objects.exists())
+
+    def test_json_array_import(self):
+        """Test a JSON array body is imported."""
+        payload = [movie_payload(title=f'Movie {i}') for i in range(3)]
+        res = self.client.post(
+            BULK_URL, json.dumps(payload), content_type='application/json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.json()['inserted']), 3)
+        self.assertEqual(res.json()['errors'], [])
+
+    def test_nothing_inserted(self):
+        """Test a body with no importable movie is rejected."""
+        for body, content_type in [
+            ('{"a": 1}', 'application/json'),
+            ('', 'application/json'),
+            ('[{"title": "One"}, {"score": 2}]', 'application/json'),
+            ('{not json\n{"title": "One"}', 'application/x-ndjson'),
+        ]:
+            res = self.client.post(BULK_URL, body, content_type=content_type)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(res.json()['inserted'], [])
+            self.assertTrue(res.json()['errors'])
+
+    def test_json_array_parser_reads_in_chunks(self):
+        """Test items split across tiny chunks are decoded."""
+        payload = [{'n': 12345, 's': 'ü ]['}, [1, 2], 67890]
+        stream = BytesIO(json.dumps(payload).encode())
+
+        items = [v for _, v in iter_json_array(stream, chunk_size=3)]
+
+        self.assertEqual(items, payload)
+
+    def test_json_array_parser_rejects_trailing_comma(self):
+        """Test a malformed array raises ValueError."""
+        stream = BytesIO(b'[{"a": 1},]')
+
+        with self.assertRaises(ValueError):
+            list(iter_json_array(stream))
+
+    def test_json_array_parser_stops_at_invalid_item(self):
+        """Test an undecodable item ends the import without reading on."""
+        stream = BytesIO(b'[{"a": 1}, {"a": x}, ' + b'{"a": 1}, ' * 1000)
+
+        items = iter_json_array(stream, chunk_size=16)
+
+        self.assertEqual(next(items), (1, {'a': 1}))
+        with self.assertRaisesRegex(ValueError, 'Item 2'):
+            next(items)
+        self.assertLess(stream.tell(), 64)
+
+    def test_json_array_parser_limits_items(self):
+        """Test an item longer than the limit is not buffered whole."""
+        stream = BytesIO(b'[{"a": "' + b'x' * 1000 + b'"}]')
+
+        with self.assertRaisesRegex(ValueError, 'longer than 100'):
+            list(iter_json_array(stream, chunk_size=16, max_item_size=100))
+        self.assertLess(stream.tell(), 200)
+
+    def test_ndjson_parser_limits_lines(self):
+        """Test a line longer than the limit is not read whole."""
+        stream = BytesIO(b'{"a": 1}\n{"a": "' + b'x' * 1000 + b'"}\n')
+
+        items = iter_ndjson(stream, max_item_size=100)
+
+        self.assertEqual(next(items), (1, {'a': 1}))
+        with self.assertRaisesRegex(ValueError, 'Line 2'):
+            next(items)
+        self.assertLess(stream.tell(), 200)
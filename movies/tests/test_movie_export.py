@@ -0,0 +1,155 @@
+"""
+Tests for streaming movie export.
+"""
+from decimal import Decimal
+import csv
+import gzip
+import json
+
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from flixapp.asgi import application
+from flixapp.urls import AccessToken
+from movies import titles
+from movies.models import Movie
+from user.cache import user_cache
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+EXPORT_URL = '/api/movies/export'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_movie(user, **params):
+    """Create and return a sample movie."""
+    defaults = {
+        'title': 'Avatar',
+        'score': Decimal('8.3'),
+        'description': 'Sample description',
+        'review': 'Sample review',
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(user=user, **defaults)
+
+
+class MovieExportTests(TestCase):
+    """Test GET /movies/export."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        create_movie(self.user, title='Jaws')
+        create_movie(self.user, title='Up, "again"', is_private=False)
+        create_movie(create_user(email='other@example.com'), title='Other')
+
+    def test_export_ndjson(self):
+        """Test NDJSON export streams only the user's movies."""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        rows = [
+            json.loads(line)
+            for line in b''.join(res.streaming_content).splitlines()
+        ]
+        self.assertEqual([r['title'] for r in rows], ['Jaws', 'Up, "again"'])
+        self.assertEqual(rows[0]['score'], 8.3)
+
+    def test_export_csv_gzip(self):
+        """Test CSV export is gzip encoded when accepted."""
+        res = self.client.get(
+            EXPORT_URL, {'format': 'csv'}, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        body = gzip.decompress(b''.join(res.streaming_content)).decode()
+        rows = list(csv.reader(body.splitlines()))
+        self.assertEqual(rows[0][:3], ['id', 'title', 'score'])
+        self.assertEqual([r[1] for r in rows[1:]], ['Jaws', 'Up, "again"'])
+
+    def test_export_rejects_unknown_format(self):
+        """Test only ndjson and csv are accepted."""
+        res = self.client.get(EXPORT_URL, {'format': 'xml'})
+
+        self.assertEqual(res.status_code, 422)
+
+
+@override_settings(ROOT_URLCONF='flixapp.async_urls')
+class AsgiExportTests(TransactionTestCase):
+    """
+    Test the async export through the ASGI application.
+
+    Each request runs its queries in threads of its own, which only
+    see committed rows, so this cannot run inside TestCase's
+    per-test transaction.
+    """
+
+    def setUp(self):
+        user_cache.clear()
+        # Titles committed here are flushed with the test
+        self.addCleanup(titles.index.clear)
+        self.user = create_user()
+        self.token = AccessToken.create(self.user)['access_token']
+        for n in range(5):
+            create_movie(self.user, title=f'Movie {n}')
+
+    async def get(self, query='', headers=()):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': EXPORT_URL,
+            'raw_path': EXPORT_URL.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [
+                (b'authorization', f'Bearer {self.token}'.encode()),
+                *headers,
+            ],
+            'client': ('127.0.0.1', 1234),
+            'server': ('testserver', 80),
+        }
+        communicator = ApplicationCommunicator(application, scope)
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output()
+        body = []
+        while True:
+            message = await communicator.receive_output()
+            body.append(message['body'] if 'body' in message else b'')
+            if not message.get('more_body'):
+                break
+        await communicator.wait()
+        return start, b''.join(body)
+
+    async def test_export_ndjson(self):
+        """Test every row arrives, in chunks of EXPORT_CHUNK_SIZE."""
+        with override_settings(EXPORT_CHUNK_SIZE=2):
+            start, body = await self.get()
+
+        self.assertEqual(start['status'], status.HTTP_200_OK)
+        self.assertEqual(
+            [json.loads(line)['title'] for line in body.splitlines()],
+            [f'Movie {n}' for n in range(5)])
+
+    async def test_export_csv_gzip(self):
+        """Test the gzip encoded CSV decompresses whole."""
+        start, body = await self.get(
+            'format=csv', [(b'accept-encoding', b'gzip')])
+
+        self.assertIn((b'Content-Encoding', b'gzip'), start['headers'])
+        rows = list(csv.reader(gzip.decompress(body).decode().splitlines()))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[-1][1], 'Movie 4')
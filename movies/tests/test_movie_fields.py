@@ -0,0 +1,152 @@
+"""
+Tests for sparse fieldsets on the movie routes.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from flixapp.page_cache import user_movie_pages
+from flixapp.urls import AccessToken
+from movies.models import Movie
+from user.cache import user_cache
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+PUBLIC_MOVIES_URL = '/api/list_all_movies'
+USER_MOVIES_URL = '/api/list_user_movies'
+TOP_URL = '/api/movies/top'
+
+
+def movie_url(movie_id):
+    return f'/api/movie/{movie_id}'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_movie(user, **params):
+    """Create and return a sample movie."""
+    defaults = {
+        'title': 'Avatar',
+        'score': Decimal('8.3'),
+        'description': 'Sample description',
+        'review': 'Sample review',
+        'is_private': False,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(user=user, **defaults)
+
+
+class SparseFieldsTests(TestCase):
+    """Test ?fields= narrows responses and the columns read."""
+
+    def setUp(self):
+        user_cache.clear()
+        user_movie_pages.clear()
+        cache.clear()
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.user = create_user()
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.movies = [
+            create_movie(self.user, title=f'Movie {i}', score=Decimal(score))
+            for i, score in enumerate(['9.0', '7.5', '8.0'])
+        ]
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for query in queries.captured_queries:
+            self.assertNotIn('"description"', query['sql'])
+            self.assertNotIn('"review"', query['sql'])
+        return res.json()
+
+    def test_list(self):
+        """Test list items hold only the requested fields."""
+        page = self.get(PUBLIC_MOVIES_URL, {'fields': 'score,title,id'})
+
+        self.assertEqual(page['items'][0], {
+            'id': self.movies[0].id, 'title': 'Movie 0', 'score': 9.0,
+        })
+
+    def test_cursor_without_id(self):
+        """Test pages still chain when the cursor column is left out."""
+        params = {'fields': 'title', 'limit': 2}
+        first = self.get(PUBLIC_MOVIES_URL, params)
+        last = self.get(
+            PUBLIC_MOVIES_URL, {**params, 'cursor': first['next']})
+
+        self.assertEqual(
+            first['items'] + last['items'],
+            [{'title': f'Movie {i}'} for i in range(3)])
+
+    def test_user_list_cached_per_fieldset(self):
+        """Test cached user pages are kept apart by fields."""
+        full = self.client.get(USER_MOVIES_URL, {'is_private': False})
+        sparse = self.get(
+            USER_MOVIES_URL, {'is_private': False, 'fields': 'id'})
+
+        self.assertIn('review', full.json()['items'][0])
+        self.assertEqual(sparse['items'][0], {'id': self.movies[0].id})
+
+    def test_unknown_field(self):
+        """Test unknown fields are rejected."""
+        res = self.client.get(PUBLIC_MOVIES_URL, {'fields': 'title,user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_detail(self):
+        """Test one movie, whole or narrowed."""
+        movie = self.movies[1]
+        res = self.client.get(movie_url(movie.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['review'], 'Sample review')
+        self.assertEqual(
+            self.get(movie_url(movie.id), {'fields': 'title,score'}),
+            {'title': 'Movie 1', 'score': 7.5})
+
+    def test_detail_private(self):
+        """Test other users' private movies are not found."""
+        other = create_user('other@example.com')
+        hidden = create_movie(other, is_private=True)
+        own = create_movie(self.user, is_private=True)
+
+        res = self.client.get(movie_url(hidden.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.get(movie_url(own.id)).status_code,
+            status.HTTP_200_OK)
+
+    def test_top(self):
+        """Test the leaderboard narrows its joined movie columns."""
+        with self.assertNumQueries(1):
+            top = self.get(TOP_URL, {'n': 2, 'fields': 'id,score'})
+
+        self.assertEqual(top, [
+            {'id': self.movies[0].id, 'score': 9.0},
+            {'id': self.movies[2].id, 'score': 8.0},
+        ])
+
+    @override_settings(ROOT_URLCONF='flixapp.async_urls')
+    async def test_async_detail(self):
+        """Test the async detail route narrows fields too."""
+        token = AccessToken.create(self.user)['access_token']
+        res = await AsyncClient().get(
+            movie_url(self.movies[0].id), {'fields': 'title'},
+            AUTHORIZATION=f'Bearer {token}')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {'title': 'Movie 0'})
@@ -0,0 +1,83 @@
+"""
+Tests for the query plans of the movie list endpoints.
+"""
+from decimal import Decimal
+from inspect import unwrap
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from flixapp import urls
+from flixapp.pagination import CursorPagination
+from movies.leaderboard import ranked_after
+from movies.models import TopMovie
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+class QueryPlanTests(TestCase):
+    """Test the list querysets are answered from indexes."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.request = SimpleNamespace(auth=self.user)
+        self.paginator = CursorPagination()
+
+    def assertIndexed(self, queryset):
+        """Run EXPLAIN QUERY PLAN on every page shape of `queryset`."""
+        cursor = CursorPagination.encode_cursor([1])
+        for pagination in (
+            CursorPagination.Input(limit=20),
+            CursorPagination.Input(limit=20, cursor=cursor),
+            CursorPagination.Input(limit=20, offset=20),
+        ):
+            plan = self.paginator._ordered(queryset, pagination).explain()
+            with self.subTest(pagination=pagination):
+                self.assertNoTableScan(plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def assertNoTableScan(self, plan):
+        """Walking a partial index in id order is fine, the table is not."""
+        for line in plan.splitlines():
+            if 'SCAN' in line:
+                self.assertIn('USING', line)
+
+    def test_public_movies(self):
+        """Test public listings search movie_public_idx."""
+        queryset = urls.get_public_movies.__wrapped__(self.request)
+
+        self.assertIndexed(queryset)
+        self.assertIn('movie_public_idx', queryset.order_by('id').explain())
+
+    def test_user_movies(self):
+        """Test per-user listings search the user's partial index."""
+        for is_private, index in (
+            (True, 'movie_user_private_idx'),
+            (False, 'movie_user_public_idx'),
+        ):
+            queryset = unwrap(urls.get_user_movies)(
+                self.request, is_private=is_private)
+
+            self.assertIndexed(queryset)
+            self.assertIn(index, queryset.order_by('id').explain())
+
+    def test_public_count(self):
+        """Test the listing count walks an index of public movies."""
+        queryset = urls.get_public_movies.__wrapped__(self.request)
+        plan = queryset.order_by().values('id').explain()
+
+        self.assertNoTableScan(plan)
+        self.assertIn('USING INDEX', plan)
+
+    def test_leaderboard_refill(self):
+        """Test refills read public movies best first from an index."""
+        for last in (None, TopMovie(movie_id=5, score=Decimal('7.0'))):
+            plan = ranked_after(last).values_list('id', 'score')[:10].explain()
+            with self.subTest(last=last):
+                self.assertNoTableScan(plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+                self.assertIn('movie_public_score_idx', plan)
@@ -0,0 +1,182 @@
+"""
+Tests for the top rated movies leaderboard.
+"""
+from decimal import Decimal
+from io import StringIO
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from flixapp.urls import AccessToken
+from movies.models import Movie, TopMovie
+from user.cache import user_cache
+from user.deletion import purge, request_deletion
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+TOP_URL = '/api/movies/top'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_movie(user, **params):
+    """Create and return a sample movie."""
+    defaults = {
+        'title': 'Avatar',
+        'score': Decimal('8.3'),
+        'description': 'Sample description',
+        'review': 'Sample review',
+        'is_private': False,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(user=user, **defaults)
+
+
+@override_settings(LEADERBOARD_SIZE=3)
+class LeaderboardTests(TestCase):
+    """Test the board stays the exact top public movies."""
+
+    def setUp(self):
+        user_cache.clear()
+        cache.clear()
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.user = create_user()
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.movies = [
+            create_movie(self.user, title=f'Movie {i}', score=Decimal(score))
+            for i, score in enumerate(['5.0', '9.0', '7.0', '9.0', '3.0'])
+        ]
+
+    def assertExact(self):
+        best = Movie.objects.filter(is_private=False).order_by('-score', 'id')
+        self.assertEqual(
+            list(TopMovie.objects.order_by('-score', 'movie_id').values_list(
+                'movie_id', flat=True)),
+            list(best.values_list('id', flat=True)[:3]),
+        )
+
+    def test_top_movies(self):
+        """Test the endpoint lists the best movies, older first on ties."""
+        with self.assertNumQueries(1):
+            res = self.client.get(TOP_URL, {'n': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [movie['id'] for movie in res.json()],
+            [self.movies[1].id, self.movies[3].id],
+        )
+        self.assertEqual(res.json()[0]['score'], 9.0)
+
+    def test_invalid_n(self):
+        """Test n must be positive."""
+        res = self.client.get(TOP_URL, {'n': 0})
+
+        self.assertEqual(res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_create(self):
+        """Test better new movies push out the last one, others do not."""
+        create_movie(self.user, score=Decimal('8.0'))
+        self.assertExact()
+        create_movie(self.user, score=Decimal('1.0'))
+        create_movie(self.user, score=Decimal('9.9'), is_private=True)
+        self.assertExact()
+
+    def test_rescore_and_privacy(self):
+        """Test leaving the board refills it from the next best movie."""
+        movie = self.movies[1]
+        movie.score = Decimal('1.0')
+        movie.save()
+        self.assertExact()
+
+        movie = self.movies[3]
+        movie.is_private = True
+        movie.save()
+        self.assertExact()
+
+        movie.is_private = False
+        movie.save()
+        self.assertExact()
+
+    def test_rescore_in_place(self):
+        """Test a board movie keeps its row unless it falls off."""
+        movie = self.movies[2]
+        movie.score = Decimal('9.5')
+        movie.save()
+        self.assertExact()
+
+        movie.score = Decimal('4.5')
+        movie.save()
+        self.assertExact()
+
+    def test_text_edit_skips_board(self):
+        """Test saves that keep score and privacy leave the board alone."""
+        movie = Movie.objects.get(id=self.movies[1].id)
+        movie.description = 'Edited'
+        movie.score = 9.0
+
+        with CaptureQueriesContext(connection) as queries:
+            movie.save()
+
+        tables = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('movies_topmovie', tables)
+
+    def test_delete(self):
+        """Test deleting a board movie refills it."""
+        self.movies[1].delete()
+
+        self.assertExact()
+
+    def test_patch(self):
+        """Test PATCH rescoring moves the movie on the board."""
+        movie = self.movies[4]
+        res = self.client.patch(
+            f'/api/movie/{movie.id}', {'score': 9.5}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertExact()
+
+    def test_bulk_import(self):
+        """Test imported movies are merged into the board."""
+        body = '\n'.join(json.dumps({
+            'title': 'Imported',
+            'score': score,
+            'description': '',
+            'review': '',
+            'is_private': False,
+        }) for score in (9.5, 2.0, 8.0))
+        res = self.client.post(
+            '/api/movies/bulk', body, content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertExact()
+
+    def test_purge(self):
+        """Test movies deleted in batches leave the board."""
+        other = create_user('other@example.com')
+        create_movie(other, score=Decimal('6.0'))
+        deletion = request_deletion(self.user)
+        purge(deletion.id, batch_size=2)
+
+        self.assertExact()
+
+    def test_rebuild(self):
+        """Test the rebuild command recomputes a drifted board."""
+        TopMovie.objects.all().delete()
+        TopMovie.objects.create(movie=self.movies[4], score=Decimal('3.0'))
+
+        call_command('rebuild_leaderboard', stdout=StringIO())
+
+        self.assertExact()
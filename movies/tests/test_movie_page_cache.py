@@ -0,0 +1,223 @@
+"""
+Tests for the per-user movie list page cache.
+"""
+from decimal import Decimal
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TestCase, override_settings
+
+from flixapp.page_cache import UserPageCache, user_movie_pages
+from flixapp.urls import AccessToken
+from movies.models import Movie
+from user.cache import user_cache
+from user.deletion import purge, request_deletion
+from user.models import VersionStamp
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+USER_MOVIES_URL = '/api/list_user_movies'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_movie(user, **params):
+    """Create and return a sample movie."""
+    defaults = {
+        'title': 'Avatar',
+        'score': Decimal('8.3'),
+        'description': 'Sample description',
+        'review': 'Sample review',
+        'is_private': False,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(user=user, **defaults)
+
+
+def movie_payload(**params):
+    """Return a valid MovieSchema payload."""
+    payload = {
+        'title': 'Avatar',
+        'score': 8.3,
+        'description': 'Sample description',
+        'review': 'Sample review',
+        'is_private': False,
+    }
+    payload.update(params)
+    return payload
+
+
+class UserPageCacheTests(TestCase):
+    """Test /list_user_movies pages are cached per user and version."""
+
+    def setUp(self):
+        user_cache.clear()
+        user_movie_pages.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.movie = create_movie(self.user, title='Jaws')
+
+    def titles(self, **params):
+        res = self.client.get(USER_MOVIES_URL, {'is_private': False, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [movie['title'] for movie in res.json()['items']]
+
+    def test_hit_reads_only_version(self):
+        """Test a repeated page costs the version lookup alone."""
+        self.addCleanup(
+            setattr, user_cache, 'stamp_interval', user_cache.stamp_interval)
+        user_cache.stamp_interval = 60
+        first = self.client.get(USER_MOVIES_URL, {'is_private': False})
+
+        with self.assertNumQueries(1):
+            second = self.client.get(USER_MOVIES_URL, {'is_private': False})
+
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Content-Type'], 'application/json')
+        self.assertEqual(user_movie_pages.stats()['hits'], 1)
+
+    def test_keyed_by_filter_and_page(self):
+        """Test private listings and other pages are cached apart."""
+        create_movie(self.user, title='Alien')
+        create_movie(self.user, title='Heat', is_private=True)
+
+        self.assertEqual(self.titles(limit=1), ['Jaws'])
+        self.assertEqual(self.titles(limit=2), ['Jaws', 'Alien'])
+        self.assertEqual(self.titles(is_private=True), ['Heat'])
+        self.assertEqual(user_movie_pages.stats()['size'], 3)
+
+    def test_other_users_pages(self):
+        """Test users never see each other's cached pages."""
+        self.titles()
+        other = create_user('other@example.com')
+        token = AccessToken.create(other)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        self.assertEqual(self.titles(), [])
+
+    def test_writes_invalidate(self):
+        """Test create, update, patch and delete retire cached pages."""
+        self.titles()
+        res = self.client.post(
+            '/api/movie', movie_payload(title='Alien'), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.titles(), ['Jaws', 'Alien'])
+
+        res = self.client.put(
+            f'/api/movie/{self.movie.id}', movie_payload(title='Heat'),
+            format='json')
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.titles(), ['Heat', 'Alien'])
+
+        res = self.client.patch(
+            f'/api/movie/{self.movie.id}', {'is_private': True},
+            format='json')
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.titles(), ['Alien'])
+        self.assertEqual(self.titles(is_private=True), ['Heat'])
+
+        res = self.client.delete(f'/api/movie/{self.movie.id}')
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.titles(is_private=True), [])
+
+    def test_bulk_import_invalidates(self):
+        """Test imported movies show up on a cached listing."""
+        self.titles()
+        body = '\n'.join(
+            json.dumps(movie_payload(title=title))
+            for title in ['Alien', 'Heat'])
+        res = self.client.post(
+            '/api/movies/bulk', body, content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.titles(), ['Jaws', 'Alien', 'Heat'])
+
+    def test_version_bumped_elsewhere(self):
+        """Test a bump from another worker retires this worker's pages."""
+        self.titles()
+        Movie.objects.filter(id=self.movie.id).update(title='Heat')
+        self.assertEqual(self.titles(), ['Jaws'])
+
+        VersionStamp.bump(user_movie_pages.stamp(self.user.id))
+
+        self.assertEqual(self.titles(), ['Heat'])
+
+    def test_purge(self):
+        """Test the purge drops the user's version stamp."""
+        self.titles()
+        deletion = request_deletion(self.user, deactivate=False)
+        purge(deletion.id)
+
+        self.assertFalse(VersionStamp.objects.filter(
+            name=user_movie_pages.stamp(self.user.id)).exists())
+
+    def test_disabled(self):
+        """Test no page is kept when a limit is zero."""
+        self.addCleanup(
+            setattr, user_movie_pages, 'max_entries',
+            user_movie_pages.max_entries)
+        user_movie_pages.max_entries = 0
+
+        self.titles()
+
+        self.assertEqual(user_movie_pages.stats()['size'], 0)
+
+    @override_settings(ROOT_URLCONF='flixapp.async_urls')
+    async def test_async_route(self):
+        """Test the async listing shares the cache and its invalidation."""
+        client = AsyncClient()
+        token = AccessToken.create(self.user)['access_token']
+        auth = {'AUTHORIZATION': f'Bearer {token}'}
+
+        await client.get(USER_MOVIES_URL, {'is_private': False}, **auth)
+        await client.post(
+            '/api/movie', movie_payload(title='Alien'),
+            content_type='application/json', **auth)
+        res = await client.get(USER_MOVIES_URL, {'is_private': False}, **auth)
+
+        self.assertEqual(
+            [movie['title'] for movie in res.json()['items']],
+            ['Jaws', 'Alien'])
+        self.assertEqual(user_movie_pages.stats()['misses'], 2)
+
+
+class UserPageCacheLimitTests(TestCase):
+    """Test the cache stays within its entry and byte limits."""
+
+    def test_max_entries(self):
+        """Test the least recently used page is evicted first."""
+        pages = UserPageCache('test', max_entries=2, max_bytes=100)
+        pages.set((1, 'a'), 0, b'a')
+        pages.set((1, 'b'), 0, b'b')
+        pages.get((1, 'a'), 0)
+        pages.set((1, 'c'), 0, b'c')
+
+        self.assertEqual(pages.get((1, 'a'), 0), b'a')
+        self.assertIsNone(pages.get((1, 'b'), 0))
+
+    def test_max_bytes(self):
+        """Test pages are evicted to fit the byte limit."""
+        pages = UserPageCache('test', max_entries=10, max_bytes=10)
+        pages.set((1, 'a'), 0, b'x' * 6)
+        pages.set((1, 'b'), 0, b'x' * 6)
+        pages.set((1, 'c'), 0, b'x' * 11)
+
+        self.assertIsNone(pages.get((1, 'a'), 0))
+        self.assertIsNone(pages.get((1, 'c'), 0))
+        self.assertEqual(pages.stats()['bytes'], 6)
+
+    def test_old_version_dropped(self):
+        """Test a page stored under an older version is a miss."""
+        pages = UserPageCache('test', max_entries=10, max_bytes=100)
+        pages.set((1, 'a'), 0, b'a')
+
+        self.assertIsNone(pages.get((1, 'a'), 1))
+        self.assertEqual(pages.stats()['size'], 0)
@@ -0,0 +1,214 @@
+"""
+Tests for cursor pagination of list endpoints.
+"""
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import TestCase
+from ninja import Schema
+
+from movies.models import Movie
+from flixapp.pagination import CursorPagination
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+PUBLIC_MOVIES_URL = '/api/list_all_movies'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_movie(user, **params):
+    """Create and return a sample movie."""
+    defaults = {
+        'title': 'Avatar',
+        'score': Decimal('8.3'),
+        'description': 'Sample description',
+        'review': 'Sample review',
+        'is_private': False,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(user=user, **defaults)
+
+
+class CursorPaginationTests(TestCase):
+    """Test keyset pagination."""
+
+    def setUp(self):
+        cache.clear()
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.movies = [
+            create_movie(self.user, title=f'Movie {i}') for i in range(5)
+        ]
+
+    def test_walks_all_pages_without_count(self):
+        """Test following next cursors returns every row once."""
+        seen = []
+        res = self.client.get(PUBLIC_MOVIES_URL, {'limit': 2})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertIsNone(res.json()['count'])
+            seen += [item['id'] for item in res.json()['items']]
+            cursor = res.json()['next']
+            if cursor is None:
+                break
+            res = self.client.get(
+                PUBLIC_MOVIES_URL, {'limit': 2, 'cursor': cursor})
+
+        self.assertEqual(seen, [movie.id for movie in self.movies])
+
+    def test_offset_mode_still_available(self):
+        """Test passing offset falls back to limit/offset with a count."""
+        res = self.client.get(PUBLIC_MOVIES_URL, {'limit': 2, 'offset': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['count'], 5)
+        self.assertEqual(
+            [item['id'] for item in res.json()['items']],
+            [movie.id for movie in self.movies[2:4]],
+        )
+
+    def test_invalid_cursor(self):
+        """Test a garbled cursor is rejected."""
+        res = self.client.get(PUBLIC_MOVIES_URL, {'cursor': '!!'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_values_checked(self):
+        """Test cursor values not of their column's type are rejected."""
+        for position in (['abc'], [[1]], [{'a': 1}], [None]):
+            cursor = CursorPagination.encode_cursor(position)
+            res = self.client.get(PUBLIC_MOVIES_URL, {'cursor': cursor})
+
+            self.assertEqual(
+                res.status_code, status.HTTP_400_BAD_REQUEST, position)
+            self.assertEqual(res.json(), {'detail': 'Invalid cursor'})
+
+    def test_score_ordering(self):
+        """Test (score, id) keyset handles ties on score."""
+        Movie.objects.all().delete()
+        for score in ['9.0', '7.5', '9.0', '7.5', '8.0']:
+            create_movie(self.user, score=Decimal(score))
+        expected = list(
+            Movie.objects.order_by('-score', '-id').values_list('id', flat=True)
+        )
+        paginator = CursorPagination(ordering=('-score',))
+
+        seen, cursor = [], None
+        while True:
+            page = paginator.paginate_queryset(
+                Movie.objects.all(),
+                CursorPagination.Input(limit=2, cursor=cursor),
+            )
+            seen += [movie.id for movie in page['items']]
+            cursor = page['next']
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, expected)
+
+
+class CountModeTests(TestCase):
+    """Test exact, cached and count-free offset pages."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        for i in range(3):
+            create_movie(self.user, title=f'Movie {i}')
+
+    def page(self, count, **params):
+        paginator = CursorPagination(count=count)
+        page = paginator.paginate_queryset(
+            Movie.objects.all(), CursorPagination.Input(**params))
+        page['items'] = list(page['items'])
+        return page
+
+    def test_exact_count(self):
+        """Test exact mode counts every time."""
+        with self.assertNumQueries(2):
+            page = self.page('exact', limit=2, offset=0)
+
+        self.assertEqual(page['count'], 3)
+        self.assertTrue(page['has_next'])
+
+    def test_cached_count(self):
+        """Test cached mode reuses the count for the same filter."""
+        self.page('cached', limit=2, offset=0)
+        create_movie(self.user)
+
+        with self.assertNumQueries(1):
+            page = self.page('cached', limit=2, offset=2)
+
+        self.assertEqual(page['count'], 3)
+        self.assertFalse(page['has_next'])
+
+    def test_no_count(self):
+        """Test none mode uses one query and an extra row for has_next."""
+        with self.assertNumQueries(1):
+            first = self.page('none', limit=2, offset=0)
+        last = self.page('none', limit=2, offset=2)
+
+        self.assertIsNone(first['count'])
+        self.assertEqual(len(first['items']), 2)
+        self.assertTrue(first['has_next'])
+        self.assertEqual(len(last['items']), 1)
+        self.assertFalse(last['has_next'])
+
+
+class ProjectionTests(TestCase):
+    """Test pages fetched with values() for a schema."""
+
+    def setUp(self):
+        cache.clear()
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.user = create_user()
+        for i, score in enumerate(['9.0', '7.5', '9.0', '7.5', '8.0']):
+            create_movie(self.user, title=f'Movie {i}', score=Decimal(score))
+
+    def test_items_match_schema(self):
+        """Test items hold the schema's fields, with scores as floats."""
+        res = self.client.get(PUBLIC_MOVIES_URL, {'limit': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        item = res.json()['items'][0]
+        self.assertEqual(set(item), {
+            'id', 'title', 'score', 'description', 'review', 'is_private',
+        })
+        self.assertEqual(item['score'], 9.0)
+        self.assertIsInstance(item['score'], float)
+
+    def test_cursor_on_unprojected_column(self):
+        """Test ordering columns outside the schema still drive the cursor."""
+        schema = type('TitleSchema', (Schema,), {'__annotations__': {
+            'title': str,
+        }})
+        paginator = CursorPagination(ordering=('-score',), schema=schema)
+        expected = list(
+            Movie.objects.order_by('-score', '-id').values_list(
+                'title', flat=True)
+        )
+
+        seen, cursor = [], None
+        while True:
+            page = paginator.paginate_queryset(
+                Movie.objects.all(),
+                CursorPagination.Input(limit=2, cursor=cursor),
+            )
+            self.assertTrue(all(set(item) == {'title'}
+                                for item in page['items']))
+            seen += [item['title'] for item in page['items']]
+            cursor = page['next']
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, expected)
@@ -0,0 +1,119 @@
+"""
+Tests for partial movie updates.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from flixapp.urls import AccessToken
+from movies.models import Movie, UserMovieStats
+from user.cache import user_cache
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+def movie_url(movie_id):
+    return f'/api/movie/{movie_id}'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def movie_payload(**params):
+    """Return a valid MovieSchema payload."""
+    payload = {
+        'title': 'Avatar',
+        'score': 8.3,
+        'description': 'Sample description',
+        'review': 'Sample review',
+        'is_private': True,
+    }
+    payload.update(params)
+    return payload
+
+
+def movie_queries(queries):
+    """SQL run against the movies table."""
+    return [
+        q['sql'].split()[0] for q in queries if '"movies_movie"' in q['sql']
+    ]
+
+
+class MoviePatchTests(TestCase):
+    """Test PATCH /movie/{id}."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        res = self.client.post('/api/movie', movie_payload(), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.movie = Movie.objects.get()
+
+    def test_patch_text_field(self):
+        """Test a text field is written by a single UPDATE."""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(
+                movie_url(self.movie.id), {'title': 'Aliens'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(movie_queries(queries), ['UPDATE'])
+        update = next(
+            q['sql'] for q in queries if q['sql'].startswith('UPDATE'))
+        self.assertNotIn('"review"', update)
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.title, 'Aliens')
+        self.assertEqual(self.movie.review, 'Sample review')
+
+    def test_patch_score_updates_stats(self):
+        """Test changing score and visibility moves the stats."""
+        res = self.client.patch(
+            movie_url(self.movie.id),
+            {'score': 2.5, 'is_private': False},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.score, Decimal('2.5'))
+        stats = UserMovieStats.objects.get(user=self.user)
+        self.assertEqual(stats.public_count, 1)
+        self.assertEqual(stats.private_count, 0)
+        self.assertEqual(stats.score_total, Decimal('2.5'))
+        self.assertEqual(stats.bucket_2, 1)
+        self.assertEqual(stats.bucket_8, 0)
+
+    def test_patch_other_users_movie(self):
+        """Test a movie of another user is left untouched."""
+        other = create_user(email='other@example.com')
+        movie = Movie.objects.create(user=other, **movie_payload())
+
+        res = self.client.patch(
+            movie_url(movie.id), {'title': 'Mine now'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        movie.refresh_from_db()
+        self.assertEqual(movie.title, 'Avatar')
+
+    def test_patch_missing_movie(self):
+        """Test patching an unknown movie is rejected."""
+        res = self.client.patch(
+            movie_url(self.movie.id + 1), {'score': 1}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_patch_nothing(self):
+        """Test an empty body changes nothing."""
+        res = self.client.patch(movie_url(self.movie.id), {}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.title, 'Avatar')
@@ -0,0 +1,137 @@
+"""
+Tests for the cached public movie listing.
+"""
+from decimal import Decimal
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import AsyncClient, TestCase, override_settings
+
+from movies import titles
+from movies.models import Movie
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+PUBLIC_MOVIES_URL = '/api/list_all_movies'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_movie(user, **params):
+    """Create and return a sample movie."""
+    defaults = {
+        'title': 'Avatar',
+        'score': Decimal('8.3'),
+        'description': 'Sample description',
+        'review': 'Sample review',
+        'is_private': False,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+    """Test ResponseCacheMiddleware on /list_all_movies."""
+
+    def setUp(self):
+        caches['responses'].clear()
+        # Titles committed below are rolled back with the test
+        self.addCleanup(titles.index.clear)
+        self.client = APIClient()
+        self.user = create_user()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_movie(self.user, title='Jaws')
+
+    def test_hit_skips_database(self):
+        """Test a repeated request is served without queries."""
+        first = self.client.get(PUBLIC_MOVIES_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(PUBLIC_MOVIES_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_etag_revalidation(self):
+        """Test If-None-Match with the current ETag is a 304."""
+        etag = self.client.get(PUBLIC_MOVIES_URL)['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(PUBLIC_MOVIES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_query_params_are_part_of_the_key(self):
+        """Test different pages get different entries and ETags."""
+        create_movie(self.user, title='Up')
+
+        one = self.client.get(PUBLIC_MOVIES_URL, {'limit': 1})
+        two = self.client.get(PUBLIC_MOVIES_URL, {'limit': 2})
+
+        self.assertNotEqual(one['ETag'], two['ETag'])
+        self.assertEqual(len(two.json()['items']), 2)
+
+    def test_movie_changes_invalidate(self):
+        """Test saving or deleting a public movie changes the listing."""
+        etag = self.client.get(PUBLIC_MOVIES_URL)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            movie = create_movie(self.user, title='Up')
+
+        res = self.client.get(PUBLIC_MOVIES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.json()['items']), 2)
+
+        movie.is_private = True
+        with self.captureOnCommitCallbacks(execute=True):
+            movie.save()
+        res = self.client.get(PUBLIC_MOVIES_URL)
+        self.assertEqual(len(res.json()['items']), 1)
+
+    def test_new_private_movie_keeps_cache(self):
+        """Test adding a private movie does not retire the ETag."""
+        etag = self.client.get(PUBLIC_MOVIES_URL)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            create_movie(self.user, is_private=True)
+
+        res = self.client.get(PUBLIC_MOVIES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_file_backend(self):
+        """Test the file based backend can hold responses."""
+        with tempfile.TemporaryDirectory() as location:
+            backend = {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }
+            with override_settings(CACHES={
+                    'default': backend, 'responses': backend}):
+                self.client.get(PUBLIC_MOVIES_URL)
+                with self.assertNumQueries(0):
+                    res = self.client.get(PUBLIC_MOVIES_URL)
+
+        self.assertEqual(res.json()['items'][0]['title'], 'Jaws')
+
+    @override_settings(ROOT_URLCONF='flixapp.async_urls')
+    async def test_async_route(self):
+        """Test the async listing is cached and revalidated alike."""
+        client = AsyncClient()
+        first = await client.get(PUBLIC_MOVIES_URL)
+        # Bypasses the signals, so only a cache miss would show it
+        await Movie.objects.aupdate(title='Heat')
+
+        second = await client.get(PUBLIC_MOVIES_URL)
+        res = await client.get(
+            PUBLIC_MOVIES_URL, IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
@@ -0,0 +1,124 @@
+"""
+Tests for full-text movie search.
+"""
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from flixapp.urls import AccessToken
+from movies.models import Movie
+from user.cache import user_cache
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+SEARCH_URL = '/api/movies/search'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_movie(user, **params):
+    """Create and return a sample movie."""
+    defaults = {
+        'title': 'Avatar',
+        'score': Decimal('8.3'),
+        'description': 'Sample description',
+        'review': 'Sample review',
+        'is_private': False,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(user=user, **defaults)
+
+
+class MovieSearchTests(TestCase):
+    """Test the FTS5 backed search endpoint."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.other = create_user(email='other@example.com')
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def search(self, q, **params):
+        res = self.client.get(SEARCH_URL, {'q': q, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.json()
+
+    def test_search_respects_privacy(self):
+        """Test other users' private movies are not returned."""
+        own = create_movie(self.user, title='Pirate island', is_private=True)
+        public = create_movie(self.other, title='Pirate ship')
+        create_movie(self.other, title='Pirate cove', is_private=True)
+
+        ids = {item['id'] for item in self.search('pirate')['items']}
+
+        self.assertEqual(ids, {own.id, public.id})
+
+    def test_search_ranked_and_paginated(self):
+        """Test results are bm25 ranked and follow the cursor."""
+        weak = create_movie(
+            self.user, title='Heist', description='a pirate appears once')
+        strong = create_movie(
+            self.user, title='Pirate pirate', review='pirate pirate')
+
+        page = self.search('pirate', limit=1)
+        self.assertEqual(page['items'][0]['id'], strong.id)
+
+        page = self.search('pirate', limit=1, cursor=page['next'])
+        self.assertEqual(page['items'][0]['id'], weak.id)
+        self.assertIsNone(page['next'])
+
+    def test_index_matched_once(self):
+        """Test one MATCH both filters and ranks the page."""
+        create_movie(self.user, title='Pirate ship')
+        create_movie(self.user, title='Pirate cove')
+        page = self.search('pirate', limit=1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.search('pirate', limit=1, cursor=page['next'])
+
+        sql = queries.captured_queries[-1]['sql']
+        self.assertEqual(sql.count('MATCH'), 1)
+        self.assertNotIn('SELECT rowid', sql)
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test triggers keep the index in sync."""
+        movie = create_movie(self.user, title='Titanic')
+        movie.title = 'Iceberg'
+        movie.save()
+
+        self.assertEqual(self.search('titanic')['items'], [])
+        self.assertEqual(len(self.search('iceberg')['items']), 1)
+
+        movie.delete()
+        self.assertEqual(self.search('iceberg')['items'], [])
+
+    def test_query_syntax_is_escaped(self):
+        """Test FTS operators in the query do not raise."""
+        create_movie(self.user, title='Up')
+
+        self.assertEqual(len(self.search('up" (*')['items']), 1)
+
+    def test_rebuild_command(self):
+        """Test the rebuild command repopulates a wiped index."""
+        create_movie(self.user, title='Jaws')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO movies_movie_fts(movies_movie_fts) "
+                "VALUES ('delete-all')")
+        self.assertEqual(self.search('jaws')['items'], [])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+
+        self.assertEqual(len(self.search('jaws')['items']), 1)
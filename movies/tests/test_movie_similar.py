@@ -0,0 +1,185 @@
+"""
+Tests for similar movie recommendations.
+"""
+from decimal import Decimal
+from io import StringIO
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from flixapp.urls import AccessToken
+from movies.models import Movie
+from movies.similar import build_index, get_index, tokens
+from user.cache import user_cache
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+def similar_url(movie_id):
+    return f'/api/movie/{movie_id}/similar'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_movie(user, **params):
+    """Create and return a sample movie."""
+    defaults = {
+        'title': 'Avatar',
+        'score': Decimal('8.3'),
+        'description': 'Sample description',
+        'review': 'Sample review',
+        'is_private': False,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(user=user, **defaults)
+
+
+class SimilarMoviesTests(TestCase):
+    """Test GET /movie/{id}/similar."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'similar.idx')
+        # Four movies share most of their words; the document frequency
+        # cutoff has tests of its own
+        settings = override_settings(
+            SIMILAR_INDEX_PATH=self.path, SIMILAR_MAX_DF=1.0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.space = create_movie(
+            self.user, title='Space pirates',
+            description='Pirates raid ships in deep space')
+        self.pirates = create_movie(
+            self.user, title='Pirates of the sea',
+            description='Pirates sail the sea')
+        self.station = create_movie(
+            self.user, title='Space station',
+            description='Life on a space station in deep space')
+        self.cooking = create_movie(
+            self.user, title='Cooking show',
+            description='Recipes for the kitchen', review='Tasty')
+
+    def ids(self, res):
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [movie['id'] for movie in res.json()]
+
+    def test_most_similar_first(self):
+        """Test movies sharing more weighted words rank first."""
+        build_index()
+
+        res = self.client.get(similar_url(self.space.id))
+
+        self.assertEqual(
+            self.ids(res)[:2], [self.station.id, self.pirates.id])
+        self.assertNotIn(self.space.id, self.ids(res))
+
+    def test_limit(self):
+        """Test n bounds the number of results."""
+        build_index()
+
+        res = self.client.get(similar_url(self.space.id), {'n': 1})
+
+        self.assertEqual(self.ids(res), [self.station.id])
+
+    def test_results_checked_against_table(self):
+        """Test movies made private after the build are left out."""
+        build_index()
+        Movie.objects.filter(id=self.station.id).update(is_private=True)
+
+        res = self.client.get(similar_url(self.space.id))
+
+        self.assertNotIn(self.station.id, self.ids(res))
+
+    def test_rebuild_picked_up(self):
+        """Test a rebuilt index replaces the mapped one."""
+        build_index()
+        before = get_index()
+        newer = create_movie(
+            self.user, title='Space pirates return',
+            description='More pirates in deep space')
+
+        self.assertNotIn(
+            newer.id, self.ids(self.client.get(similar_url(self.space.id))))
+        build_index()
+
+        self.assertIsNot(get_index(), before)
+        self.assertEqual(
+            self.ids(self.client.get(similar_url(self.space.id)))[0],
+            newer.id)
+
+    def test_other_users_private_movie(self):
+        """Test private movies of other users are not found."""
+        build_index()
+        other = create_user('other@example.com')
+        hidden = create_movie(other, title='Space', is_private=True)
+
+        res = self.client.get(similar_url(hidden.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_index_not_built(self):
+        """Test a missing index is reported."""
+        res = self.client.get(similar_url(self.space.id))
+
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_identical_text(self):
+        """Test a document is fully similar to itself."""
+        build_index()
+        index = get_index()
+        counts = tokens(
+            self.cooking.title, self.cooking.description,
+            self.cooking.review)
+
+        movie_id, similarity = index.query(counts, 1)[0]
+
+        self.assertEqual(movie_id, self.cooking.id)
+        self.assertAlmostEqual(similarity, 1.0, places=5)
+
+    def test_common_words_skipped(self):
+        """Test words in more than the max share of movies are dropped."""
+        build_index(max_df=0.5)
+        index = get_index()
+
+        # In three of the four reviews
+        self.assertNotIn('sample', index.vocabulary)
+        self.assertIn('space', index.vocabulary)
+        self.assertEqual(index.query(tokens('Sample review'), 3), [])
+
+    def test_postings_bounded(self):
+        """Test a query skips terms whose postings exceed its budget."""
+        build_index()
+        index = get_index()
+        counts = tokens('space kitchen')
+
+        bounded = index.query(counts, 3, max_postings=1)
+
+        self.assertEqual(len(index.query(counts, 3)), 3)
+        self.assertEqual(
+            [movie_id for movie_id, _ in bounded], [self.cooking.id])
+        self.assertEqual(index.query(counts, 3, max_postings=0), [])
+
+    def test_command(self):
+        """Test the command writes the index."""
+        out = StringIO()
+        call_command('rebuild_similar_index', stdout=out)
+
+        self.assertIn('4 movies', out.getvalue())
+        self.assertEqual(len(get_index()), 4)
@@ -0,0 +1,131 @@
+"""
+Tests for the per-user movie statistics.
+"""
+from decimal import Decimal
+from io import StringIO
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from flixapp.urls import AccessToken
+from movies.models import Movie, UserMovieStats
+from user.cache import user_cache
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+MOVIE_URL = '/api/movie'
+
+
+def stats_url(user_id):
+    return f'/api/users/{user_id}/stats'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def movie_payload(**params):
+    """Return a valid MovieSchema payload."""
+    payload = {
+        'title': 'Avatar',
+        'score': 8.3,
+        'description': 'Sample description',
+        'review': 'Sample review',
+        'is_private': True,
+    }
+    payload.update(params)
+    return payload
+
+
+class UserMovieStatsTests(TestCase):
+    """Test stats are maintained by the movie routes."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def stats(self):
+        with self.assertNumQueries(1):
+            res = self.client.get(stats_url(self.user.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.json()
+
+    def test_routes_maintain_stats(self):
+        """Test create, update and delete keep the row in step."""
+        self.client.post(
+            MOVIE_URL, movie_payload(score=8.5), format='json')
+        self.client.post(
+            MOVIE_URL, movie_payload(score=6.0, is_private=False),
+            format='json')
+        movie = Movie.objects.get(score=Decimal('8.5'))
+
+        stats = self.stats()
+        self.assertEqual(stats['movie_count'], 2)
+        self.assertEqual(stats['private_count'], 1)
+        self.assertEqual(stats['public_count'], 1)
+        self.assertEqual(stats['average_score'], 7.25)
+        self.assertEqual(stats['histogram']['8'], 1)
+        self.assertEqual(stats['histogram']['6'], 1)
+
+        self.client.put(
+            f'{MOVIE_URL}/{movie.id}',
+            movie_payload(score=9.9, is_private=False),
+            format='json',
+        )
+        stats = self.stats()
+        self.assertEqual(stats['public_count'], 2)
+        self.assertEqual(stats['histogram']['8'], 0)
+        self.assertEqual(stats['histogram']['9'], 1)
+
+        self.client.delete(f'{MOVIE_URL}/{movie.id}')
+        stats = self.stats()
+        self.assertEqual(stats['movie_count'], 1)
+        self.assertEqual(stats['average_score'], 6.0)
+
+    def test_bulk_import_updates_stats(self):
+        """Test bulk inserted movies are counted."""
+        self.client.post(
+            '/api/movies/bulk',
+            json.dumps([movie_payload(score=s) for s in (1.0, 2.0, 3.0)]),
+            content_type='application/json',
+        )
+
+        stats = self.stats()
+        self.assertEqual(stats['movie_count'], 3)
+        self.assertEqual(stats['average_score'], 2.0)
+
+    def test_empty_and_unknown_users(self):
+        """Test users without movies get zeros, unknown users a 404."""
+        self.assertEqual(self.client.get(stats_url(self.user.id)).json()[
+            'movie_count'], 0)
+
+        res = self.client.get(stats_url(self.user.id + 100))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reconcile_fixes_drift(self):
+        """Test the reconcile command reports and repairs drift."""
+        for score in ('2.0', '4.0'):
+            Movie.objects.create(
+                user=self.user, title='Raw insert', score=Decimal(score))
+        out = StringIO()
+
+        call_command('reconcile_movie_stats', stdout=out)
+
+        self.assertIn('1 missing', out.getvalue())
+        stats = UserMovieStats.objects.get(user=self.user)
+        self.assertEqual(stats.movie_count, 2)
+        self.assertEqual(stats.score_total, Decimal('6.0'))
+
+        UserMovieStats.objects.filter(user=self.user).update(movie_count=7)
+        out = StringIO()
+        call_command('reconcile_movie_stats', '--dry-run', stdout=out)
+        self.assertIn('1 drifted', out.getvalue())
+        self.assertIn('movie_count: 1 users', out.getvalue())
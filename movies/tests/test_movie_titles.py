@@ -0,0 +1,209 @@
+"""
+Tests for the canonical title catalog.
+"""
+from decimal import Decimal
+from io import StringIO
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from flixapp.urls import AccessToken
+from movies import titles
+from movies.models import Movie, Title
+from user.cache import user_cache
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+MOVIES_URL = '/api/movie'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_movie(user, **params):
+    """Create and return a sample movie."""
+    defaults = {
+        'title': 'Avatar',
+        'score': Decimal('8.3'),
+        'description': 'Sample description',
+        'review': 'Sample review',
+        'is_private': False,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(user=user, **defaults)
+
+
+def movie_payload(**params):
+    """Return a valid MovieSchema payload."""
+    payload = {
+        'title': 'Avatar',
+        'score': 8.3,
+        'description': 'Sample description',
+        'review': 'Sample review',
+        'is_private': False,
+    }
+    payload.update(params)
+    return payload
+
+
+class NormalizeTests(TestCase):
+    """Test title keys."""
+
+    def test_spellings_share_a_key(self):
+        """Test case, spacing, accents, punctuation and year are ignored."""
+        for title in ['avatar ', 'Avatar (2009)', 'AVATAR!', 'Avatár']:
+            self.assertEqual(titles.normalize(title), 'avatar')
+
+    def test_inner_numbers_kept(self):
+        """Test only a trailing year in brackets is dropped."""
+        self.assertEqual(titles.normalize('Blade Runner 2049'),
+                         'blade runner 2049')
+
+
+class ResolveTests(TestCase):
+    """Test linking movies to catalog titles."""
+
+    def setUp(self):
+        titles.index.clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_create_links_spellings(self):
+        """Test movies of different users share one title."""
+        other = create_user('other@example.com')
+        for title in ['Avatar', 'avatar ', 'Avatar (2009)']:
+            res = self.client.post(
+                MOVIES_URL, movie_payload(title=title), format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        create_movie(other, title='AVATAR')
+
+        self.assertEqual(Title.objects.count(), 1)
+        title = Title.objects.get()
+        self.assertEqual(title.name, 'Avatar')
+        self.assertEqual(title.movies.count(), 4)
+
+    def test_fuzzy_match(self):
+        """Test a misspelled title joins the close one."""
+        original = create_movie(self.user, title='The Shawshank Redemption')
+        typo = create_movie(self.user, title='The Shawshank Redemtion')
+
+        self.assertEqual(typo.canonical_title_id,
+                         original.canonical_title_id)
+
+    def test_numbers_must_agree(self):
+        """Test sequels get their own title."""
+        first = create_movie(self.user, title='Toy Story 2')
+        second = create_movie(self.user, title='Toy Story 3')
+
+        self.assertNotEqual(first.canonical_title_id,
+                            second.canonical_title_id)
+
+    def test_unrelated_titles(self):
+        """Test different films get different titles."""
+        create_movie(self.user, title='Alien')
+        create_movie(self.user, title='Aliens')
+
+        self.assertEqual(Title.objects.count(), 2)
+
+    def test_titles_from_other_processes(self):
+        """Test titles missing from the index are found on a miss."""
+        Title.objects.create(key='the lord of the rings',
+                             name='The Lord of the Rings')
+
+        movie = create_movie(self.user, title='The Lord of teh Rings')
+
+        self.assertEqual(movie.canonical_title.key, 'the lord of the rings')
+
+    def test_committed_title_from_index(self):
+        """Test a committed title is resolved without a query."""
+        self.addCleanup(titles.index.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            movie = create_movie(self.user)
+
+        with self.assertNumQueries(0):
+            title_id = titles.resolve('Avatar (2009)')
+
+        self.assertEqual(title_id, movie.canonical_title_id)
+
+    def test_resolve_many_batched(self):
+        """Test a batch costs one read, one insert and one id lookup."""
+        names = [f'Movie {n}' for n in range(20)] + ['movie 0']
+
+        with self.assertNumQueries(3):
+            ids = titles.resolve_many(names)
+
+        self.assertEqual(Title.objects.count(), 20)
+        self.assertEqual(ids[-1], ids[0])
+        self.assertNotIn(None, ids)
+
+    def test_pending_titles_matched(self):
+        """Test later batches of a transaction see the earlier ones."""
+        pending = titles.TitleIndex()
+        first = titles.resolve_many(['The Shawshank Redemption'], pending)
+
+        second = titles.resolve_many(['The Shawshank Redemtion'], pending)
+
+        self.assertEqual(second, first)
+        self.assertEqual(Title.objects.count(), 1)
+
+    def test_text_edit_keeps_title(self):
+        """Test a save without a title change resolves nothing."""
+        movie = create_movie(self.user)
+        movie.review = 'Changed'
+
+        with CaptureQueriesContext(connection) as queries:
+            movie.save()
+
+        for query in queries.captured_queries:
+            self.assertNotIn('movies_title', query['sql'])
+
+    def test_patch_title_relinks(self):
+        """Test changing the title moves the movie to another title."""
+        movie = create_movie(self.user)
+        res = self.client.patch(
+            f'{MOVIES_URL}/{movie.id}', {'title': 'Alien'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        movie.refresh_from_db()
+        self.assertEqual(movie.canonical_title.key, 'alien')
+
+    def test_bulk_import(self):
+        """Test imported movies are linked too."""
+        body = '\n'.join(
+            json.dumps(movie_payload(title=title))
+            for title in ['Avatar', 'avatar (2009)', 'Alien'])
+        res = self.client.post(
+            '/api/movies/bulk', body, content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(
+            Movie.objects.filter(canonical_title__isnull=True).exists())
+        self.assertEqual(Title.objects.count(), 2)
+
+    def test_backfill(self):
+        """Test the backfill command links existing movies in batches."""
+        for title in ['Avatar', 'avatar', 'Alien', 'The Godfather']:
+            create_movie(self.user, title=title)
+        Movie.objects.update(canonical_title=None)
+        Title.objects.all().delete()
+        titles.index.clear()
+
+        out = StringIO()
+        call_command('backfill_titles', batch_size=3, stdout=out)
+
+        self.assertIn('4 movies linked', out.getvalue())
+        self.assertEqual(Title.objects.count(), 3)
+        self.assertFalse(
+            Movie.objects.filter(canonical_title__isnull=True).exists())
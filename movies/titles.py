@@ -0,0 +1,178 @@
+"""
+Canonical movie titles.
+
+Movies keep the title their user typed; `resolve` links it to the Title
+shared by every spelling of the same film. Titles are normalized first
+(case, accents, punctuation, whitespace and a trailing "(year)"), then
+matched against the catalog by trigram similarity, the share of common
+three-character sequences as pg_trgm computes it, of at least
+TITLE_MATCH_THRESHOLD. Numbers must agree, so sequels stay apart.
+
+Each process keeps the trigram index in memory, with the id of each
+key, loaded on first use and topped up with titles other processes
+added when nothing matches. Entries only join it once their transaction
+commits, so a hit is answered without a query; until then a
+resolve_many call (one bulk import) tracks the titles it read or
+created in its own `pending` index. Titles are never deleted by the
+app: after removing rows by hand, call `index.clear()`.
+"""
+from collections import Counter
+from functools import partial
+from threading import RLock
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Title
+
+
+YEAR = re.compile(r'\s*[(\[]\d{4}[)\]]$')
+NUMBER = re.compile(r'\d+')
+
+
+def normalize(title: str) -> str:
+    title = unicodedata.normalize('NFKD', title.strip())
+    title = ''.join(c for c in title if not unicodedata.combining(c))
+    title = YEAR.sub('', title).lower()
+    return ' '.join(re.sub(r'[\W_]+', ' ', title).split())
+
+
+def trigrams(key: str) -> set:
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    def __init__(self):
+        # Reentrant: on_commit callbacks run at once outside transactions
+        self.lock = RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.ids = {}
+        self.sizes = {}
+        self.postings = {}
+        self.last_id = 0
+
+    def add(self, key: str, title_id: int | None) -> None:
+        if key in self.sizes:
+            return
+        grams = trigrams(key)
+        self.ids[key] = title_id
+        self.sizes[key] = len(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(key)
+
+    def extend(self, rows, last_id: int = None) -> None:
+        """Add (key, id) rows, from a transaction that committed"""
+        with self.lock:
+            for key, title_id in rows:
+                self.add(key, title_id)
+            if last_id is not None:
+                self.last_id = max(self.last_id, last_id)
+
+    def match(self, key: str, threshold: float) -> str | None:
+        """The indexed key most similar to `key`, if similar enough"""
+        if key in self.sizes:
+            return key
+        grams = trigrams(key)
+        numbers = NUMBER.findall(key)
+        shared = Counter(
+            other for gram in grams for other in self.postings.get(gram, ()))
+        best, best_score = None, threshold
+        for other, common in shared.items():
+            score = common / (len(grams) + self.sizes[other] - common)
+            if score >= best_score and NUMBER.findall(other) == numbers:
+                best, best_score = other, score
+        return best
+
+
+index = TitleIndex()
+
+
+def title_key(title: str) -> str:
+    return normalize(title)[:Title._meta.get_field('key').max_length]
+
+
+def resolve(title: str) -> int | None:
+    """Id of the catalog Title for `title`, created if none matches"""
+    return resolve_many([title])[0]
+
+
+def resolve_many(titles: list, pending: TitleIndex = None) -> list:
+    """
+    Ids of the catalog Titles for `titles`, creating the missing ones
+    with one bulk INSERT. Pass the same `pending` index to every call
+    of one transaction, so its uncommitted titles are matched too.
+    """
+    pending = pending if pending is not None else TitleIndex()
+    threshold = settings.TITLE_MATCH_THRESHOLD
+    names = {}
+    for title in titles:
+        key = title_key(title)
+        if key:
+            names.setdefault(key, ' '.join(title.split()))
+
+    def lookup(key):
+        for keys in (index, pending):
+            found = keys.match(key, threshold)
+            if found is not None:
+                return keys.ids[found], found
+        return None, None
+
+    ids = {}
+    with index.lock:
+        misses = []
+        for key in names:
+            ids[key], _ = lookup(key)
+            if ids[key] is None:
+                misses.append(key)
+        if not misses:
+            return [ids.get(title_key(title)) for title in titles]
+        refresh(pending)
+
+        # Misses may match titles just read, or each other
+        aliases = {}
+        for key in misses:
+            ids[key], found = lookup(key)
+            if ids[key] is not None:
+                continue
+            if found is not None:
+                aliases[key] = found
+            else:
+                pending.add(key, None)
+        new = [
+            key for key in misses if ids[key] is None and key not in aliases
+        ]
+        if new:
+            Title.objects.bulk_create(
+                [Title(key=key, name=names[key]) for key in new],
+                ignore_conflicts=True,
+            )
+            # Including keys another process created meanwhile
+            rows = list(Title.objects.filter(key__in=new).values_list(
+                'key', 'id'))
+            for key, title_id in rows:
+                pending.ids[key] = ids[key] = title_id
+            transaction.on_commit(partial(index.extend, rows))
+        for key, found in aliases.items():
+            ids[key] = pending.ids[found]
+
+    return [ids.get(title_key(title)) for title in titles]
+
+
+def refresh(pending: TitleIndex) -> None:
+    """Read the titles created since the index was last topped up"""
+    rows = list(Title.objects.filter(
+        id__gt=max(index.last_id, pending.last_id),
+    ).order_by('id').values_list('key', 'id'))
+    if not rows:
+        return
+    last_id = rows[-1][1]
+    for key, title_id in rows:
+        pending.add(key, title_id)
+    pending.last_id = last_id
+    # Rows read in a transaction may be its own, not yet committed
+    transaction.on_commit(partial(index.extend, rows, last_id))
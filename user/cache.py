@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+import time
+
+from django.conf import settings
+
+from .models import VersionStamp
+
+
+AUTH_STAMP = 'auth_users'
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """What routes need from the authenticated user, without the row"""
+    id: int
+    email: str
+    is_active: bool
+
+    @property
+    def pk(self):
+        return self.id
+
+
+class UserCache:
+    """
+    In-process LRU of token subject -> CachedUser with a TTL.
+
+    Other workers learn about changes through the shared AUTH_STAMP
+    version, which is read at most once every `stamp_interval` seconds;
+    when it moves the whole local cache is dropped.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, stamp_interval: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stamp_interval = stamp_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._stamp = None
+        self._stamp_checked = 0.0
+
+    def get(self, subject: str) -> CachedUser | None:
+        now = time.monotonic()
+        if self._stamp_due(now):
+            self._apply_stamp(VersionStamp.current(AUTH_STAMP), now)
+        return self._lookup(subject, now)
+
+    async def aget(self, subject: str) -> CachedUser | None:
+        now = time.monotonic()
+        if self._stamp_due(now):
+            self._apply_stamp(await VersionStamp.acurrent(AUTH_STAMP), now)
+        return self._lookup(subject, now)
+
+    def _lookup(self, subject: str, now: float) -> CachedUser | None:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or entry[0] < now:
+                self._entries.pop(subject, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(subject)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, subject: str, user: CachedUser) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *subjects: str) -> None:
+        """Drop subjects here and tell the other workers"""
+        self._evict(subjects)
+        VersionStamp.bump(AUTH_STAMP)
+
+    async def ainvalidate(self, *subjects: str) -> None:
+        self._evict(subjects)
+        await VersionStamp.abump(AUTH_STAMP)
+
+    def _evict(self, subjects) -> None:
+        with self._lock:
+            for subject in subjects:
+                self._entries.pop(subject, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._stamp = None
+            self._stamp_checked = 0.0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+    def _stamp_due(self, now: float) -> bool:
+        return now - self._stamp_checked >= self.stamp_interval
+
+    def _apply_stamp(self, stamp: int, now: float) -> None:
+        with self._lock:
+            if stamp != self._stamp:
+                self._entries.clear()
+                self._stamp = stamp
+            self._stamp_checked = now
+
+
+user_cache = UserCache(
+    maxsize=getattr(settings, 'AUTH_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'AUTH_CACHE_TTL', 300),
+    stamp_interval=getattr(settings, 'AUTH_CACHE_STAMP_INTERVAL', 1),
+)
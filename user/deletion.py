@@ -0,0 +1,103 @@
+"""
+Deleting users with large movie libraries.
+
+`user.delete()` makes Django's collector load every related movie before
+deleting, all inside one long write transaction. Instead, a deletion is
+recorded (optionally marking the user inactive so it can no longer log
+in or authenticate), and `purge` removes the movies with raw DELETEs of
+at most USER_PURGE_BATCH_SIZE rows, one short transaction per batch,
+before deleting the now small user row.
+
+The purge runs as a `user.purge` background job; `manage.py
+purge_deleted_users` finishes any that were cut short.
+"""
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from flixapp.page_cache import user_movie_pages
+from jobs.registry import enqueue
+from movies import leaderboard
+from movies.models import Movie
+from movies.signals import bump_public_movies
+
+from .cache import user_cache
+from .models import AccountDeletion, User, VersionStamp
+
+
+def request_deletion(user: User, deactivate: bool = True) -> AccountDeletion:
+    """
+    Record the deletion and schedule the purge. Idempotent per user.
+    Returns the deletion as stored once this transaction commits.
+    """
+    with transaction.atomic():
+        deletion, created = AccountDeletion.objects.get_or_create(
+            user_id=user.id,
+            defaults={'email': user.email, 'deactivated': deactivate},
+        )
+        if created and deactivate:
+            User.objects.filter(id=user.id).update(is_active=False)
+            user_cache.invalidate(user.email)
+        if created:
+            job = enqueue(
+                'user.purge', {'deletion_id': deletion.id}, user_id=user.id)
+            AccountDeletion.objects.filter(id=deletion.id).update(
+                job_id=job.id)
+            deletion.job_id = job.id
+    if created and settings.JOBS_EAGER:
+        # The purge already ran, unless an outer transaction is open
+        deletion.refresh_from_db()
+    return deletion
+
+
+def purge(deletion_id: int, batch_size: int = None) -> AccountDeletion:
+    """Delete the user's movies in batches, then the user"""
+    batch_size = batch_size or settings.USER_PURGE_BATCH_SIZE
+    deletion = AccountDeletion.objects.get(id=deletion_id)
+    if deletion.state == AccountDeletion.DONE:
+        return deletion
+    AccountDeletion.objects.filter(id=deletion_id).update(
+        state=AccountDeletion.RUNNING, error='')
+
+    table = connection.ops.quote_name(Movie._meta.db_table)
+    sql = (
+        f'DELETE FROM {table} WHERE id IN '
+        f'(SELECT id FROM {table} WHERE user_id = %s LIMIT %s)'
+    )
+    try:
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, [deletion.user_id, batch_size])
+                deleted = cursor.rowcount
+                AccountDeletion.objects.filter(id=deletion_id).update(
+                    movies_deleted=F('movies_deleted') + deleted)
+                if deleted:
+                    # Raw SQL sends no post_delete
+                    user_movie_pages.bump(deletion.user_id)
+                    bump_public_movies()
+                    leaderboard.prune()
+            if deleted < batch_size:
+                break
+            # Let other writers take the SQLite lock between batches
+            time.sleep(settings.USER_PURGE_PAUSE)
+
+        with transaction.atomic():
+            # Only stats and permission rows are left to cascade
+            User.objects.filter(id=deletion.user_id).delete()
+            VersionStamp.objects.filter(
+                name=user_movie_pages.stamp(deletion.user_id)).delete()
+            AccountDeletion.objects.filter(id=deletion_id).update(
+                state=AccountDeletion.DONE, finished_at=timezone.now())
+        if not deletion.deactivated:
+            user_cache.invalidate(deletion.email)
+
+    except Exception as e:
+        AccountDeletion.objects.filter(id=deletion_id).update(
+            state=AccountDeletion.FAILED, error=str(e))
+        raise
+
+    deletion.refresh_from_db()
+    return deletion
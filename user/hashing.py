@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    check_password, get_hasher, identify_hasher, make_password,
+)
+
+
+# PBKDF2 holds a core for tens of milliseconds; keep it off the event
+# loop, and cap how many hashes can run at once.
+password_pool = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'PASSWORD_HASH_WORKERS', 2),
+    thread_name_prefix='password-hash',
+)
+
+
+async def amake_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_pool, make_password, password)
+
+
+async def acheck_password(password: str, encoded: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_pool, check_password, password, encoded)
+
+
+def needs_rehash(encoded: str) -> bool:
+    """Whether check_password would ask its setter to upgrade `encoded`"""
+    preferred = get_hasher()
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    return (
+        hasher.algorithm != preferred.algorithm
+        or preferred.must_update(encoded)
+    )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from user.throttle import prune
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete auth throttle buckets that have refilled since their last '
+        'use (e.g. from cron)'
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune()
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted} throttle buckets pruned'))
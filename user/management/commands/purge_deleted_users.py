@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from user.deletion import purge
+from user.models import AccountDeletion
+
+
+class Command(BaseCommand):
+    help = (
+        'Finish user deletions whose background purge was interrupted, '
+        'deleting their movies in batches'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Movies per DELETE (default USER_PURGE_BATCH_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        unfinished = AccountDeletion.objects.exclude(
+            state=AccountDeletion.DONE).order_by('id')
+        for deletion in unfinished:
+            deletion = purge(deletion.id, options['batch_size'])
+            self.stdout.write(
+                f'{deletion.email}: {deletion.movies_deleted} movies deleted')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(unfinished)} deletions finished'))
@@ -1,7 +1,10 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.auth.hashers import make_password
 from django.utils.translation import gettext_lazy as _
 import re
 
+from .hashing import amake_password
+
 
 class CustomUserManager(BaseUserManager):
     """
@@ -12,9 +15,36 @@ class CustomUserManager(BaseUserManager):
         """
         Create and save a User with the given email and password.
         """
+        email = self.validate_credentials(email, password)
+        user = self.model(email=email)
+        user.set_password(password)
+        user.save()
+
+        return user
+
+    async def acreate_user(self, email, password):
+        """
+        Async create_user, hashing the password in the hasher pool.
+        """
+        email = self.validate_credentials(email, password)
+        return await self.acreate(
+            email=email,
+            password=await amake_password(password),
+        )
 
+    def validate_credentials(self, email, password):
+        """
+        Check email and password rules, return the normalized email.
+        """
+        email = self.validate_email(email)
+        self.validate_password(password)
+        return email
+
+    def validate_email(self, email):
+        """
+        Check the email rules, return the normalized email.
+        """
         e = r'([A-Za-z0-9]+[.-_])*[A-Za-z0-9]+@[A-Za-z0-9-]+(\.[A-Z|a-z]{2,})+'
-        p = r'^(?=.*?[A-Z])(?=.*?[a-z])(?=.*?[!@#?\]]).{10,}$'
 
         if not email:
             raise ValueError(_('Enter email'))
@@ -22,15 +52,41 @@ class CustomUserManager(BaseUserManager):
         if not re.fullmatch(e, email):
             raise ValueError(_('Invalid email'))
 
+        return self.normalize_email(email)
+
+    def validate_password(self, password):
+        """
+        Check the password rules.
+        """
+        p = r'^(?=.*?[A-Z])(?=.*?[a-z])(?=.*?[!@#?\]]).{10,}$'
+
         if not password:
             raise ValueError(_('Enter password'))
 
         if not re.fullmatch(p, password):
             raise ValueError(_('Password does not comply with requirements'))
 
-        email = self.normalize_email(email)
-        user = self.model(email=email)
-        user.set_password(password)
-        user.save()
+    def prepare_changes(self, email=None, password=None):
+        """
+        Validate a partial update and return the columns to write, with
+        the password hashed once.
+        """
+        changes = {}
+        if email is not None:
+            changes['email'] = self.validate_email(email)
+        if password is not None:
+            self.validate_password(password)
+            changes['password'] = make_password(password)
+        return changes
 
-        return user
+    async def aprepare_changes(self, email=None, password=None):
+        """
+        Async prepare_changes, hashing the password in the hasher pool.
+        """
+        changes = {}
+        if email is not None:
+            changes['email'] = self.validate_email(email)
+        if password is not None:
+            self.validate_password(password)
+            changes['password'] = await amake_password(password)
+        return changes
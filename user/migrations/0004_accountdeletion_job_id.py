@@ -0,0 +1,18 @@
+# Generated by Django 4.1.5 on 2026-10-18 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_accountdeletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accountdeletion',
+            name='job_id',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+    ]
@@ -1,5 +1,10 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
-from django.db.models import EmailField, BooleanField
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    EmailField, BooleanField, CharField, DateTimeField, FloatField, Model,
+    PositiveBigIntegerField, TextField, F,
+)
 from .managers import CustomUserManager
 
 
@@ -13,3 +18,75 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return self.email
+
+
+class VersionStamp(Model):
+    """Named counter shared by every worker process through the DB"""
+    name = CharField(max_length=100, unique=True)
+    version = PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def current(cls, name: str) -> int:
+        version = cls.objects.filter(name=name).values_list(
+            'version', flat=True).first()
+        return version or 0
+
+    @classmethod
+    def bump(cls, name: str) -> None:
+        # One UPDATE once the row exists; writes bump on every change
+        stamps = cls.objects.filter(name=name)
+        if stamps.update(version=F('version') + 1):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(name=name, version=1)
+        except IntegrityError:
+            stamps.update(version=F('version') + 1)
+
+    @classmethod
+    async def acurrent(cls, name: str) -> int:
+        version = await cls.objects.filter(name=name).values_list(
+            'version', flat=True).afirst()
+        return version or 0
+
+    @classmethod
+    async def abump(cls, name: str) -> None:
+        stamps = cls.objects.filter(name=name)
+        if not await stamps.aupdate(version=F('version') + 1):
+            await sync_to_async(cls.bump)(name)
+
+    def __str__(self):
+        return f'{self.name}={self.version}'
+
+
+class AccountDeletion(Model):
+    """Progress of a user's deletion; outlives the user row"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATES = [(s, s) for s in (PENDING, RUNNING, DONE, FAILED)]
+
+    user_id = PositiveBigIntegerField(unique=True)
+    email = EmailField(max_length=255)
+    state = CharField(max_length=10, choices=STATES, default=PENDING)
+    deactivated = BooleanField(default=True)
+    movies_deleted = PositiveBigIntegerField(default=0)
+    job_id = PositiveBigIntegerField(null=True)
+    error = TextField(blank=True)
+    requested_at = DateTimeField(auto_now_add=True)
+    finished_at = DateTimeField(null=True)
+
+    def __str__(self):
+        return f'{self.email}: {self.state}'
+
+
+class ThrottleBucket(Model):
+    """Token bucket shared by every worker process through the DB"""
+    key = CharField(max_length=300, primary_key=True)
+    tokens = FloatField()
+    # time.time() of the last token taken
+    updated = FloatField()
+
+    def __str__(self):
+        return f'{self.key}: {self.tokens:.2f}'
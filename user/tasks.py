@@ -0,0 +1,9 @@
+from jobs.registry import task
+
+from .deletion import purge
+
+
+@task('user.purge')
+def purge_task(deletion_id: int):
+    deletion = purge(deletion_id)
+    return {'movies_deleted': deletion.movies_deleted}
@@ -0,0 +1,67 @@
+"""
+Tests for the authenticated user cache.
+"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from flixapp.page_cache import user_movie_pages
+from flixapp.urls import AccessToken
+from user.cache import user_cache
+from user.models import VersionStamp
+
+
+USER_MOVIES_URL = '/api/list_user_movies'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+class AuthCacheTests(TestCase):
+    """Test AuthBearer serves users from the cache."""
+
+    def setUp(self):
+        user_cache.clear()
+        user_movie_pages.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_second_request_skips_user_lookup(self):
+        """Test only the first request looks the user up."""
+        self.addCleanup(
+            setattr, user_cache, 'stamp_interval', user_cache.stamp_interval)
+        user_cache.stamp_interval = 60
+        self.client.get(USER_MOVIES_URL, {'is_private': True})
+
+        with self.assertNumQueries(1):
+            res = self.client.get(USER_MOVIES_URL, {'is_private': True})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(user_cache.stats()['hits'], 1)
+        self.assertEqual(user_cache.stats()['misses'], 1)
+
+    def test_delete_user_invalidates(self):
+        """Test a deleted user is not served from the cache."""
+        self.client.get(USER_MOVIES_URL, {'is_private': True})
+        self.client.delete(f'/api/users/{self.user.id}')
+
+        res = self.client.get(USER_MOVIES_URL, {'is_private': True})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(VersionStamp.current('auth_users'), 1)
+
+    def test_stamp_change_clears_other_workers(self):
+        """Test a version bump from another process drops the cache."""
+        user_cache.get('nobody@example.com')
+        self.client.get(USER_MOVIES_URL, {'is_private': True})
+        self.assertEqual(user_cache.stats()['size'], 1)
+
+        VersionStamp.bump('auth_users')
+        user_cache._stamp_checked = 0.0
+
+        self.assertIsNone(user_cache.get(self.user.email))
@@ -0,0 +1,143 @@
+"""
+Tests for batched user deletion.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from flixapp.urls import AccessToken
+from movies.models import Movie, UserMovieStats
+from user.cache import user_cache
+from user.deletion import purge
+from user.models import AccountDeletion
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+def user_url(user_id):
+    return f'/api/users/{user_id}'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_movies(user, count):
+    Movie.objects.bulk_create(
+        Movie(user=user, title=f'Movie {i}', score=Decimal('5.0'),
+              is_private=False)
+        for i in range(count)
+    )
+
+
+@override_settings(JOBS_EAGER=True, USER_PURGE_PAUSE=0)
+class UserDeletionTests(TestCase):
+    """Test DELETE /users/{id} and its status resource."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        create_movies(self.user, 7)
+        call_command('reconcile_movie_stats', stdout=StringIO())
+        self.other = create_user(email='other@example.com')
+        create_movies(self.other, 2)
+
+    def test_delete_user(self):
+        """Test movies go in batches and the status is reported."""
+        with override_settings(USER_PURGE_BATCH_SIZE=3), \
+                self.captureOnCommitCallbacks(execute=True):
+            res = self.client.delete(user_url(self.user.id))
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        status_url = res.json()['status']
+        self.assertEqual(status_url, f'/api/users/{self.user.id}/deletion')
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists())
+        self.assertFalse(UserMovieStats.objects.filter(
+            user_id=self.user.id).exists())
+        self.assertEqual(Movie.objects.filter(user=self.other).count(), 2)
+
+        res = self.client.get(status_url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['state'], 'done')
+        self.assertEqual(res.json()['movies_deleted'], 7)
+        self.assertIsNotNone(res.json()['finished_at'])
+
+    def test_deactivated_before_purge(self):
+        """Test the user cannot log in or authenticate once accepted."""
+        token = AccessToken.create(self.user)['access_token']
+
+        res = self.client.delete(user_url(self.user.id))
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.json()['state'], 'pending')
+        res = self.client.post(
+            '/api/login',
+            {'email': 'user@example.com', 'password': 'Testpassword!'},
+            format='json',
+        )
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        res = self.client.get('/api/auth/cache')
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_without_deactivation(self):
+        """Test the user stays active until purged when asked to."""
+        res = self.client.delete(
+            f'{user_url(self.user.id)}?deactivate=false')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active)
+
+    def test_repeat_delete_is_idempotent(self):
+        """Test deleting again returns the existing deletion."""
+        self.client.delete(user_url(self.user.id))
+        res = self.client.delete(user_url(self.user.id))
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(AccountDeletion.objects.count(), 1)
+
+    def test_purge_command_resumes(self):
+        """Test interrupted deletions are finished by the command."""
+        self.client.delete(user_url(self.user.id))
+        deletion = AccountDeletion.objects.get()
+        deletion.state = AccountDeletion.RUNNING
+        deletion.save()
+
+        out = StringIO()
+        call_command('purge_deleted_users', batch_size=2, stdout=out)
+
+        self.assertIn('7 movies deleted', out.getvalue())
+        self.assertEqual(
+            AccountDeletion.objects.get().state, AccountDeletion.DONE)
+        self.assertEqual(Movie.objects.count(), 2)
+
+    def test_purge_batches(self):
+        """Test each batch is bounded by the batch size."""
+        self.client.delete(user_url(self.user.id))
+        deletion = AccountDeletion.objects.get()
+
+        with CaptureQueriesContext(connection) as queries:
+            purge(deletion.id, batch_size=3)
+
+        batches = [
+            q['sql'] for q in queries
+            if q['sql'].startswith('DELETE FROM "movies_movie"')
+        ]
+        self.assertEqual(len(batches), 3)
+        self.assertTrue(all('LIMIT 3' in sql for sql in batches))
+
+    def test_status_unknown_user(self):
+        """Test there is no status for a user never deleted."""
+        res = self.client.get(f'{user_url(self.other.id)}/deletion')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
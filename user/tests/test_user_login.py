@@ -0,0 +1,106 @@
+"""
+Tests for login and token refresh.
+"""
+from datetime import datetime
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+from jwt import decode
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from flixapp.page_cache import user_movie_pages
+from user.cache import user_cache
+
+
+LOGIN_URL = '/api/login'
+REFRESH_URL = '/api/token/refresh'
+USER_MOVIES_URL = '/api/list_user_movies'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+class LoginTests(TestCase):
+    """Test the login pipeline."""
+
+    def setUp(self):
+        user_cache.clear()
+        user_movie_pages.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.credentials = {
+            'email': 'user@example.com',
+            'password': 'Testpassword!',
+        }
+
+    def login(self):
+        res = self.client.post(LOGIN_URL, self.credentials, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.json()
+
+    # The throttle's bucket writes are covered in test_user_throttle
+    @override_settings(AUTH_THROTTLE=False)
+    def test_login_does_not_write(self):
+        """Test a login with an up to date hash is a single SELECT."""
+        with self.assertNumQueries(1):
+            self.login()
+
+    @override_settings(AUTH_THROTTLE=False)
+    def test_login_upgrades_outdated_hash(self):
+        """Test an outdated hash is rewritten once."""
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password=make_password('Testpassword!', hasher='pbkdf2_sha1'))
+
+        with self.assertNumQueries(2):
+            self.login()
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+    def test_tokens_are_short_lived(self):
+        """Test the access token expires after ACCESS_TOKEN_LIFETIME."""
+        tokens = self.login()
+
+        payload = decode(
+            tokens['access_token'], settings.SECRET_KEY, algorithms=['HS256'])
+        lifetime = datetime.utcfromtimestamp(payload['exp']) - \
+            datetime.utcnow()
+        self.assertLessEqual(lifetime, settings.ACCESS_TOKEN_LIFETIME)
+        self.assertEqual(
+            tokens['expires_in'],
+            settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+
+    def test_refresh_issues_access_token(self):
+        """Test a refresh token buys a working access token."""
+        tokens = self.login()
+
+        with self.assertNumQueries(0):
+            res = self.client.post(
+                REFRESH_URL,
+                {'refresh_token': tokens['refresh_token']},
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {res.json()['access_token']}")
+        res = self.client.get(USER_MOVIES_URL, {'is_private': True})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_token_types_are_not_interchangeable(self):
+        """Test refresh tokens do not authenticate and vice versa."""
+        tokens = self.login()
+
+        res = self.client.post(
+            REFRESH_URL, {'refresh_token': tokens['access_token']},
+            format='json')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {tokens['refresh_token']}")
+        res = self.client.get(USER_MOVIES_URL, {'is_private': True})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
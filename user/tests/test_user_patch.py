@@ -0,0 +1,115 @@
+"""
+Tests for partial user updates.
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TestCase, override_settings
+
+from flixapp.urls import AccessToken
+from user.cache import user_cache
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+def user_url(user_id):
+    return f'/api/users/{user_id}'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+class UserPatchTests(TestCase):
+    """Test PATCH /users/{id}."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        token = AccessToken.create(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_patch_password_hashes_once(self):
+        """Test the password is hashed once and the email is kept."""
+        with mock.patch(
+            'user.managers.make_password', return_value='hashed',
+        ) as make_password:
+            res = self.client.patch(
+                user_url(self.user.id),
+                {'password': 'Newpassword!'},
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        make_password.assert_called_once_with('Newpassword!')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, 'hashed')
+        self.assertEqual(self.user.email, 'user@example.com')
+
+    def test_patch_email(self):
+        """Test the email changes and the old token stops working."""
+        res = self.client.patch(
+            user_url(self.user.id),
+            {'email': 'new@example.com'},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'new@example.com')
+        self.assertTrue(self.user.check_password('Testpassword!'))
+        res = self.client.get('/api/auth/cache')
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_patch_other_user(self):
+        """Test another user's row does not match the UPDATE."""
+        other = create_user(email='other@example.com')
+
+        res = self.client.patch(
+            user_url(other.id), {'email': 'hijack@example.com'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        other.refresh_from_db()
+        self.assertEqual(other.email, 'other@example.com')
+
+    def test_patch_taken_email(self):
+        """Test switching to a registered email is a conflict."""
+        create_user(email='other@example.com')
+
+        res = self.client.patch(
+            user_url(self.user.id),
+            {'email': 'other@example.com'},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    def test_patch_weak_password(self):
+        """Test password rules apply to partial updates."""
+        res = self.client.patch(
+            user_url(self.user.id), {'password': 'short'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(ROOT_URLCONF='flixapp.async_urls')
+    async def test_async_patch_inactive(self):
+        """Test a deactivated account cannot change itself under ASGI."""
+        token = AccessToken.create(self.user)['access_token']
+        await get_user_model().objects.filter(
+            id=self.user.id).aupdate(is_active=False)
+        client = AsyncClient()
+        auth = {'AUTHORIZATION': f'Bearer {token}'}
+
+        res = await client.patch(
+            user_url(self.user.id), {'email': 'new@example.com'},
+            content_type='application/json', **auth)
+        stats = await client.get('/api/auth/cache', **auth)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(stats.status_code, status.HTTP_404_NOT_FOUND)
+        email = await get_user_model().objects.values_list(
+            'email', flat=True).aget(id=self.user.id)
+        self.assertEqual(email, 'user@example.com')
@@ -0,0 +1,191 @@
+"""
+Tests for the token-bucket throttles on password hashing routes.
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from flixapp import metrics
+from user.models import ThrottleBucket
+from user.throttle import prune, take
+
+
+LOGIN_URL = '/api/login'
+CREATE_USER_URL = '/api/create-user'
+
+
+def create_user(email='user@example.com', password='Testpassword!'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+class TokenBucketTests(TestCase):
+    """Test taking tokens from a bucket."""
+
+    def test_burst_then_refill(self):
+        """Test a bucket allows `burst` takes, then one per 1/rate s."""
+        for _ in range(3):
+            self.assertEqual(take('key', 3, 0.5, now=100.0), 0)
+
+        self.assertAlmostEqual(take('key', 3, 0.5, now=100.0), 2.0)
+        self.assertAlmostEqual(take('key', 3, 0.5, now=101.0), 1.0)
+        self.assertEqual(take('key', 3, 0.5, now=102.0), 0)
+        self.assertGreater(take('key', 3, 0.5, now=102.0), 0)
+
+    def test_refill_capped_at_burst(self):
+        """Test an idle bucket holds no more than `burst` tokens."""
+        take('key', 2, 1, now=0.0)
+        for _ in range(2):
+            self.assertEqual(take('key', 2, 1, now=1000.0), 0)
+
+        self.assertGreater(take('key', 2, 1, now=1000.0), 0)
+
+    def test_denied_take_does_not_write(self):
+        """Test an empty bucket is only read."""
+        take('key', 1, 1, now=0.0)
+
+        with self.assertNumQueries(2):
+            take('key', 1, 1, now=0.0)
+        self.assertEqual(ThrottleBucket.objects.get().updated, 0.0)
+
+    def test_prune(self):
+        """Test buckets that refilled since their last use are deleted."""
+        take('old', 1, 1, now=0.0)
+        take('new', 1, 1, now=10_000.0)
+
+        with override_settings(
+            AUTH_THROTTLE_PER_IP=(20, 0.5),
+            AUTH_THROTTLE_PER_EMAIL=(5, 0.05),
+        ):
+            self.assertEqual(prune(now=10_050.0), 1)
+        self.assertTrue(ThrottleBucket.objects.filter(key='new').exists())
+
+
+@override_settings(
+    AUTH_THROTTLE=True,
+    AUTH_THROTTLE_PER_IP=(5, 0.01),
+    AUTH_THROTTLE_PER_EMAIL=(2, 0.01),
+)
+class AuthThrottleTests(TestCase):
+    """Test /login and /create-user answer 429 before hashing."""
+
+    def setUp(self):
+        metrics.reset()
+        self.client = APIClient()
+        self.credentials = {
+            'email': 'user@example.com',
+            'password': 'Testpassword!',
+        }
+        create_user()
+
+    def login(self, ip='10.0.0.1', forwarded=None, **credentials):
+        headers = {'REMOTE_ADDR': ip}
+        if forwarded is not None:
+            headers['HTTP_X_FORWARDED_FOR'] = forwarded
+        return self.client.post(
+            LOGIN_URL, {**self.credentials, **credentials}, format='json',
+            **headers)
+
+    def test_per_email(self):
+        """Test one email is throttled whatever the client IP."""
+        for n in range(2):
+            self.assertEqual(
+                self.login(ip=f'10.0.0.{n}').status_code,
+                status.HTTP_200_OK)
+
+        with mock.patch('django.contrib.auth.base_user.check_password') as c:
+            res = self.login(ip='10.0.0.9')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '100')
+        c.assert_not_called()
+
+    def test_per_ip(self):
+        """Test one client IP is throttled whatever the email."""
+        for n in range(5):
+            self.login(email=f'user{n}@example.com')
+
+        res = self.login(email='user9@example.com')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(
+            self.login(ip='10.0.0.2', email='user9@example.com').status_code,
+            status.HTTP_404_NOT_FOUND)
+
+    def test_forwarded_ip_from_trusted_proxy(self):
+        """Test X-Forwarded-For names the client behind a trusted proxy."""
+        emails = (f'user{n}@example.com' for n in range(10))
+
+        def forwarded(client, peer='127.0.0.1'):
+            return self.login(
+                ip=peer, email=next(emails),
+                forwarded=f'{client}, 10.1.0.5')
+
+        with override_settings(
+                THROTTLE_TRUSTED_PROXIES=('127.0.0.1', '10.1.0.0/16')):
+            for n in range(5):
+                forwarded('203.0.113.7')
+            denied = forwarded('203.0.113.7')
+            other = forwarded('203.0.113.8')
+            spoofed = forwarded('203.0.113.9', peer='198.51.100.1')
+
+        self.assertEqual(
+            denied.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(spoofed.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(ThrottleBucket.objects.filter(
+            key='login:ip:198.51.100.1').exists())
+
+    def test_forwarded_ip_ignored_from_clients(self):
+        """Test clients cannot pick their bucket with the header."""
+        for n in range(5):
+            self.login(
+                email=f'user{n}@example.com', forwarded=f'203.0.113.{n}')
+
+        res = self.login(email='user9@example.com', forwarded='203.0.113.9')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_email_spellings_share_a_bucket(self):
+        """Test case and spaces do not get a fresh bucket."""
+        self.login()
+        self.login(email='USER@example.com ')
+
+        res = self.login(email=' user@EXAMPLE.com')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_create_user(self):
+        """Test sign ups are throttled without hashing."""
+        payload = {'email': 'new@example.com', 'password': 'Testpass123!'}
+        for _ in range(2):
+            take('create-user:email:new@example.com', 2, 0.01)
+
+        with mock.patch('user.managers.make_password') as hashed:
+            res = self.client.post(CREATE_USER_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        hashed.assert_not_called()
+
+    def test_counters_exposed(self):
+        """Test throttle decisions are counted in /metrics."""
+        for _ in range(3):
+            self.login()
+
+        body = self.client.get('/api/metrics').content.decode()
+
+        self.assertIn(
+            'flixfix_throttle_decisions_total'
+            '{route="login",scope="email",outcome="allowed"} 2', body)
+        self.assertIn(
+            'flixfix_throttle_decisions_total'
+            '{route="login",scope="email",outcome="denied"} 1', body)
+
+    @override_settings(AUTH_THROTTLE=False)
+    def test_disabled(self):
+        """Test AUTH_THROTTLE=False lets every attempt through."""
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
@@ -0,0 +1,143 @@
+"""
+Token-bucket throttles for the routes that hash passwords.
+
+Each client IP and each email gets a bucket of `burst` tokens refilled
+at `rate` tokens per second (AUTH_THROTTLE_PER_IP and
+AUTH_THROTTLE_PER_EMAIL). /login and /create-user take a token from
+both before hashing anything and answer 429 when either is empty.
+
+The client IP is REMOTE_ADDR. Behind a reverse proxy listed in
+THROTTLE_TRUSTED_PROXIES (addresses or networks), it is the rightmost
+X-Forwarded-For entry not added by a trusted proxy; the header is
+ignored from any other peer, as clients can send whatever they like.
+
+Buckets are ThrottleBucket rows, so every worker draws from the same
+ones. A token is taken with one conditional UPDATE that refills and
+decrements the bucket only if a token is left, so concurrent requests
+can never overdraw it; an empty bucket is only read.
+"""
+from functools import lru_cache
+import ipaddress
+import math
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Least
+
+from flixapp.metrics import THROTTLE_DECISIONS
+
+from .models import ThrottleBucket
+
+
+def take(key: str, burst: float, rate: float, now: float = None) -> float:
+    """
+    Take a token from bucket `key`. Returns 0 if one was taken, else the
+    seconds until one is available.
+    """
+    now = time.time() if now is None else now
+    level = Least(
+        Value(float(burst)),
+        F('tokens') + (Value(now) - F('updated')) * Value(float(rate)),
+        output_field=FloatField(),
+    )
+    bucket = ThrottleBucket.objects.filter(key=key)
+    while True:
+        if bucket.alias(level=level).filter(level__gte=1).update(
+                tokens=level - 1, updated=now):
+            return 0.0
+
+        current = bucket.values_list('tokens', 'updated').first()
+        if current is None:
+            try:
+                with transaction.atomic():
+                    ThrottleBucket.objects.create(
+                        key=key, tokens=burst - 1, updated=now)
+                return 0.0
+            except IntegrityError:
+                # Created by a concurrent request
+                continue
+
+        tokens, updated = current
+        available = min(burst, tokens + (now - updated) * rate)
+        if available < 1:
+            return (1 - available) / rate
+
+
+@lru_cache(maxsize=None)
+def trusted_networks(proxies: tuple) -> tuple:
+    return tuple(
+        ipaddress.ip_network(proxy, strict=False) for proxy in proxies)
+
+
+def is_trusted(ip: str) -> bool:
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(
+        address in network
+        for network in trusted_networks(settings.THROTTLE_TRUSTED_PROXIES))
+
+
+def client_ip(request) -> str:
+    """The address of the client, past any trusted proxies"""
+    ip = request.META.get('REMOTE_ADDR', '')
+    if not is_trusted(ip):
+        return ip
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    for hop in reversed([hop.strip() for hop in forwarded.split(',')]):
+        if not hop:
+            break
+        ip = hop
+        if not is_trusted(hop):
+            break
+    return ip
+
+
+def check(request, route: str, email: str) -> float:
+    """
+    Take a token for the client's IP and for `email`. Returns 0 if the
+    request may go on, else the seconds to wait.
+    """
+    if not settings.AUTH_THROTTLE:
+        return 0.0
+    ip = client_ip(request)
+    buckets = [
+        ('ip', f'{route}:ip:{ip}', settings.AUTH_THROTTLE_PER_IP),
+        ('email', f'{route}:email:{email.strip().lower()}',
+         settings.AUTH_THROTTLE_PER_EMAIL),
+    ]
+    for scope, key, (burst, rate) in buckets:
+        wait = take(key, burst, rate)
+        THROTTLE_DECISIONS.inc(route, scope, 'denied' if wait else 'allowed')
+        if wait:
+            return wait
+    return 0.0
+
+
+async def acheck(request, route: str, email: str) -> float:
+    return await sync_to_async(check)(request, route, email)
+
+
+def too_many_requests(api, request, wait: float):
+    response = api.create_response(
+        request,
+        {"error": "Too many attempts, try again later"},
+        status=429)
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def prune(now: float = None) -> int:
+    """Delete buckets that have refilled completely since their last use"""
+    now = time.time() if now is None else now
+    refill = max(
+        burst / rate
+        for burst, rate in (
+            settings.AUTH_THROTTLE_PER_IP, settings.AUTH_THROTTLE_PER_EMAIL)
+    )
+    return ThrottleBucket.objects.filter(
+        updated__lt=now - refill).delete()[0]